@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+匹配流水线基准测试
+使用合成的多显示器截图（与 capture_screenshot 输出结构相同），
+把 backend/uploads 中的模板按已知位置和尺度放入截图，
+统计各流水线配置的延迟分位数、吞吐量和命中准确率，结果保存为 JSON 便于发现性能回退
+
+用法:
+    python benchmark.py --resolutions 1080p 4k --monitors 1 3 --rounds 20 --output bench.json
+    python benchmark.py --compare bench_old.json --output bench_new.json
+"""
+
+import argparse
+import glob
+import json
+import os
+import platform
+import random
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+import image_matcher
+from template_cache import template_registry
+
+# 常用分辨率
+RESOLUTIONS = {
+    "1080p": (1920, 1080),
+    "1440p": (2560, 1440),
+    "4k": (3840, 2160),
+}
+
+# 默认模板目录（与 AppConfig.UPLOAD_DIR 一致）
+DEFAULT_TEMPLATE_DIR = os.path.join("backend", "uploads")
+
+
+# ==============================
+# 合成数据
+# ==============================
+def synthetic_desktop(width: int, height: int, rng: np.random.Generator) -> np.ndarray:
+    """生成类似桌面的合成背景：渐变底色 + 随机窗口块 + 轻微噪声"""
+    gradient = np.linspace(40, 200, width, dtype=np.float32)
+    base = np.repeat(gradient[np.newaxis, :], height, axis=0)
+    img = cv2.merge([base, base * 0.9, base * 0.8]).astype(np.uint8)
+    for _ in range(12):
+        x0, y0 = int(rng.integers(0, width - 50)), int(rng.integers(0, height - 50))
+        x1, y1 = x0 + int(rng.integers(50, width // 3)), y0 + int(rng.integers(50, height // 3))
+        color = tuple(int(c) for c in rng.integers(0, 255, 3))
+        cv2.rectangle(img, (x0, y0), (x1, y1), color, -1)
+    noise = rng.integers(0, 8, img.shape, dtype=np.uint8)
+    return cv2.add(img, noise)
+
+
+def build_screenshots(resolution: Tuple[int, int], monitors: int, rng: np.random.Generator) -> List[Dict]:
+    """构建横向排列的多显示器截图列表"""
+    width, height = resolution
+    screenshots = []
+    for i in range(monitors):
+        monitor = {"left": i * width, "top": 0, "width": width, "height": height}
+        screenshots.append({
+            "monitor_id": i + 1,
+            "image": synthetic_desktop(width, height, rng),
+            "offset_x": monitor["left"],
+            "offset_y": monitor["top"],
+            "width": width,
+            "height": height,
+            "monitor_info": monitor
+        })
+    return screenshots
+
+
+def plant_template(
+    screenshots: List[Dict],
+    template: np.ndarray,
+    scale: float,
+    rng: np.random.Generator
+) -> Dict:
+    """
+    把（缩放后的）模板放到随机显示器的随机位置
+    :return: 真实位置 {"x", "y", "monitor_id", "scale"}（全局中心坐标）
+    """
+    if scale != 1.0:
+        template = cv2.resize(template, None, fx=scale, fy=scale)
+    height, width = template.shape[:2]
+    screen = screenshots[int(rng.integers(0, len(screenshots)))]
+    x = int(rng.integers(0, screen["width"] - width))
+    y = int(rng.integers(0, screen["height"] - height))
+    screen["image"][y:y + height, x:x + width] = template
+    return {
+        "x": screen["offset_x"] + x + width // 2,
+        "y": screen["offset_y"] + y + height // 2,
+        "monitor_id": screen["monitor_id"],
+        "scale": scale
+    }
+
+
+def load_templates(template_dir: str, limit: int) -> List[str]:
+    """读取模板目录中的图片路径（去掉内容重复的文件和调试图）"""
+    paths = sorted(glob.glob(os.path.join(template_dir, "*.png")))
+    unique = {}
+    for path in paths:
+        if os.path.basename(path).startswith("debug_"):
+            continue
+        cached = template_registry.load(path)
+        if cached is not None and cached.template_id not in unique:
+            unique[cached.template_id] = path
+    return list(unique.values())[:limit]
+
+
+# ==============================
+# 流水线配置
+# ==============================
+def image_matcher_pipeline(screenshots: List[Dict], template_path: str, confidence: float):
+    """image_matcher 模块：增强 + 多算法 + 多尺度回退"""
+    return image_matcher.find_image_on_screen_multi_monitor(screenshots, template_path, confidence)
+
+
+def load_pipelines() -> Dict[str, Callable]:
+    """
+    收集可用的流水线配置
+    main.py 依赖 pyautogui 等桌面环境，无法导入时只测试 image_matcher 流水线
+    """
+    pipelines = {"image_matcher": image_matcher_pipeline}
+    try:
+        import main
+    except Exception as e:
+        print(f"⚠️  无法导入 main.py，跳过内置匹配流水线: {e}")
+        return pipelines
+
+    def main_pipeline(**options):
+        def run(screenshots, template_path, confidence):
+            return main.find_image_on_screen_multi_monitor(
+                screenshots, template_path, confidence, **options
+            )
+        return run
+
+    pipelines.update({
+        "main_full_bgr": main_pipeline(search_mode="full", color_mode="bgr", parallel=False),
+        "main_full_gray": main_pipeline(search_mode="full", color_mode="gray", parallel=False),
+        "main_pyramid_bgr": main_pipeline(search_mode="pyramid", color_mode="bgr", parallel=False),
+        "main_pyramid_gray": main_pipeline(search_mode="pyramid", color_mode="gray", parallel=False),
+        "main_full_bgr_parallel": main_pipeline(search_mode="full", color_mode="bgr", parallel=True),
+    })
+    return pipelines
+
+
+# ==============================
+# 统计
+# ==============================
+def summarize(latencies_ms: List[float], hits: int, total: int) -> Dict:
+    """计算延迟分位数、吞吐量和命中率"""
+    values = np.array(latencies_ms, dtype=np.float64)
+    return {
+        "runs": total,
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p90_ms": round(float(np.percentile(values, 90)), 3),
+        "p99_ms": round(float(np.percentile(values, 99)), 3),
+        "mean_ms": round(float(values.mean()), 3),
+        "throughput_per_s": round(1000.0 / float(values.mean()), 3) if values.mean() > 0 else None,
+        "accuracy": round(hits / total, 4) if total else None
+    }
+
+
+def is_hit(found: bool, location: Optional[Dict], truth: Dict, tolerance: int) -> bool:
+    """判断匹配结果是否落在真实位置附近"""
+    if not found or not location:
+        return False
+    return abs(location["x"] - truth["x"]) <= tolerance and abs(location["y"] - truth["y"]) <= tolerance
+
+
+def bench_pipeline(
+    run: Callable,
+    scenarios: List[Tuple[List[Dict], str, Dict]],
+    confidence: float,
+    tolerance: int,
+    warmup: int
+) -> Dict:
+    """对一个流水线运行所有场景"""
+    for screenshots, template_path, _ in scenarios[:warmup]:
+        run(screenshots, template_path, confidence)
+
+    latencies = []
+    hits = 0
+    for screenshots, template_path, truth in scenarios:
+        start = time.perf_counter()
+        found, location, _, _ = run(screenshots, template_path, confidence)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += is_hit(found, location, truth, tolerance)
+    return summarize(latencies, hits, len(scenarios))
+
+
+def bench_stage(fn: Callable, rounds: int) -> Dict:
+    """对单个处理阶段计时"""
+    latencies = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return summarize(latencies, 0, rounds)
+
+
+def compare_results(baseline: Dict, current: Dict, threshold: float) -> List[str]:
+    """
+    与基线结果比较，返回延迟变慢或准确率下降的条目
+    :param threshold: 允许的 p50 延迟增长比例
+    """
+    regressions = []
+    for case, pipelines in current["cases"].items():
+        for name, stats in pipelines.items():
+            old = baseline.get("cases", {}).get(case, {}).get(name)
+            if not old:
+                continue
+            if old["p50_ms"] and stats["p50_ms"] > old["p50_ms"] * (1 + threshold):
+                regressions.append(f"{case}/{name}: p50 {old['p50_ms']}ms -> {stats['p50_ms']}ms")
+            if old.get("accuracy") is not None and stats.get("accuracy") is not None \
+                    and stats["accuracy"] < old["accuracy"]:
+                regressions.append(f"{case}/{name}: accuracy {old['accuracy']} -> {stats['accuracy']}")
+    return regressions
+
+
+# ==============================
+# 入口
+# ==============================
+def run_benchmark(args) -> Dict:
+    """按命令行参数运行基准测试"""
+    rng = np.random.default_rng(args.seed)
+    random.seed(args.seed)
+    templates = load_templates(args.template_dir, args.templates)
+    if not templates:
+        raise SystemExit(f"模板目录中没有可用的 PNG 模板: {args.template_dir}")
+
+    pipelines = load_pipelines()
+    if args.pipelines:
+        pipelines = {name: fn for name, fn in pipelines.items() if name in args.pipelines}
+
+    results = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "platform": platform.platform(),
+        "opencv": cv2.__version__,
+        "params": {
+            "rounds": args.rounds,
+            "confidence": args.confidence,
+            "scales": args.scales,
+            "templates": [os.path.basename(p) for p in templates],
+            "seed": args.seed
+        },
+        "cases": {},
+        "stages": {}
+    }
+
+    for resolution_name in args.resolutions:
+        for monitors in args.monitors:
+            case = f"{resolution_name}x{monitors}"
+            base = build_screenshots(RESOLUTIONS[resolution_name], monitors, rng)
+
+            # 每轮复制一份截图并放入一个模板
+            scenarios = []
+            for i in range(args.rounds):
+                screenshots = [{**screen, "image": screen["image"].copy()} for screen in base]
+                template_path = templates[i % len(templates)]
+                scale = args.scales[i % len(args.scales)]
+                truth = plant_template(screenshots, template_registry.load(template_path).image, scale, rng)
+                scenarios.append((screenshots, template_path, truth))
+
+            results["cases"][case] = {}
+            for name, run in pipelines.items():
+                stats = bench_pipeline(run, scenarios, args.confidence, args.tolerance, args.warmup)
+                results["cases"][case][name] = stats
+                print(f"{case:<10} {name:<26} p50={stats['p50_ms']:>9.2f}ms "
+                      f"p90={stats['p90_ms']:>9.2f}ms acc={stats['accuracy']:.2%}")
+
+            # 单阶段计时：增强与多尺度匹配
+            frame = base[0]["image"]
+            template_gray = image_matcher.enhance_gray(template_registry.load(templates[0]).image)
+            frame_gray = image_matcher.enhance_gray(frame)
+            results["stages"][case] = {
+                "enhance_image": bench_stage(lambda: image_matcher.enhance_image(frame), args.rounds),
+                "match_template_multi_scale": bench_stage(
+                    lambda: image_matcher.match_template_multi_scale(frame_gray, template_gray, 0.6),
+                    args.rounds
+                )
+            }
+    return results
+
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="py-picToWork 匹配流水线基准测试")
+    parser.add_argument("--resolutions", nargs="+", default=["1080p", "1440p", "4k"], choices=list(RESOLUTIONS))
+    parser.add_argument("--monitors", nargs="+", type=int, default=[1, 2, 3, 4])
+    parser.add_argument("--rounds", type=int, default=10, help="每个场景的测量次数")
+    parser.add_argument("--warmup", type=int, default=2, help="预热次数（不计入统计）")
+    parser.add_argument("--scales", nargs="+", type=float, default=[1.0], help="放置模板时使用的缩放比例")
+    parser.add_argument("--confidence", type=float, default=0.8)
+    parser.add_argument("--tolerance", type=int, default=4, help="命中判定允许的中心点偏差（像素）")
+    parser.add_argument("--templates", type=int, default=5, help="最多使用的模板数量")
+    parser.add_argument("--template-dir", default=DEFAULT_TEMPLATE_DIR)
+    parser.add_argument("--pipelines", nargs="*", help="只运行指定的流水线")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark_results.json", help="结果 JSON 路径")
+    parser.add_argument("--compare", help="与之前的结果 JSON 比较")
+    parser.add_argument("--regression-threshold", type=float, default=0.1, help="p50 允许增长的比例")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    results = run_benchmark(args)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"📄 结果已保存: {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_results(baseline, results, args.regression_threshold)
+        if regressions:
+            print("❌ 发现性能回退:")
+            for line in regressions:
+                print(f"  - {line}")
+            return 1
+        print("✅ 未发现性能回退")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
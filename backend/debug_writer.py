@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+调试图片写入模块 - 在后台线程中标注、编码并保存匹配结果图
+调用方只复制匹配位置附近的区域（或整帧）后放入有界队列就返回，队列满时直接丢弃；
+绘制、缩放、编码和落盘都在后台完成，并按总大小和保存时长清理输出目录
+"""
+
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from latency_metrics import latency_metrics
+
+# 支持的输出格式
+DEBUG_FORMATS = ("png", "jpg")
+
+# 调试图片文件名前缀（清理时只处理带该前缀的文件）
+DEBUG_PREFIX = "debug_match_"
+
+
+class DebugImageWriter:
+    """
+    后台调试图片写入器
+    crop_margin > 0 时只保存匹配框外扩该边距的区域，否则保存整帧并缩放到 max_width 以内
+    """
+
+    def __init__(
+        self,
+        directory: str = "backend/debug",
+        queue_size: int = 8,
+        crop_margin: int = 200,
+        max_width: int = 1280,
+        image_format: str = "png",
+        png_compression: int = 1,
+        jpeg_quality: int = 85,
+        max_bytes: int = 200 * 1024 * 1024,
+        max_age: float = 3 * 24 * 3600
+    ):
+        """
+        :param directory: 输出目录
+        :param queue_size: 待写入队列长度上限
+        :param crop_margin: 匹配框四周保留的边距（像素），0 表示保存整帧
+        :param max_width: 保存整帧时的最大宽度（像素）
+        :param image_format: png 或 jpg
+        :param png_compression: PNG 压缩级别（0-9，越小越快）
+        :param jpeg_quality: JPEG 质量（0-100）
+        :param max_bytes: 输出目录中调试图片的总大小上限（字节）
+        :param max_age: 调试图片的最长保存时间（秒）
+        """
+        self.directory = directory
+        self.crop_margin = crop_margin
+        self.max_width = max_width
+        self.image_format = image_format
+        self.png_compression = png_compression
+        self.jpeg_quality = jpeg_quality
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._queue: "queue.Queue[Optional[Dict]]" = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._sequence = 0
+        self.stats = {"queued": 0, "written": 0, "dropped": 0, "failed": 0, "removed": 0}
+
+    def configure(self, **options) -> None:
+        """
+        更新配置（参数同构造函数）
+        queue_size 只能在写入线程启动前修改
+        """
+        image_format = options.get("image_format", self.image_format)
+        if image_format not in DEBUG_FORMATS:
+            raise ValueError(f"不支持的调试图片格式: {image_format}")
+        with self._lock:
+            queue_size = options.pop("queue_size", None)
+            if queue_size is not None and self._thread is None:
+                self._queue = queue.Queue(maxsize=queue_size)
+            for name, value in options.items():
+                if not hasattr(self, name):
+                    raise ValueError(f"未知的调试图片写入配置: {name}")
+                setattr(self, name, value)
+
+    def submit(
+        self,
+        frame: np.ndarray,
+        box: Tuple[int, int, int, int],
+        label: str = ""
+    ) -> Optional[str]:
+        """
+        提交一张调试图片（只在调用线程中复制像素）
+        :param frame: 显示器截图（调用方之后可以复用该缓冲区）
+        :param box: 匹配框 (x, y, 宽, 高)，截图坐标
+        :param label: 标注文字
+        :return: 将要写入的文件路径，队列已满时返回 None
+        """
+        x, y, width, height = box
+        if self.crop_margin > 0:
+            frame_height, frame_width = frame.shape[:2]
+            left = max(0, x - self.crop_margin)
+            top = max(0, y - self.crop_margin)
+            right = min(frame_width, x + width + self.crop_margin)
+            bottom = min(frame_height, y + height + self.crop_margin)
+            image = frame[top:bottom, left:right].copy()
+            box = (x - left, y - top, width, height)
+        else:
+            image = frame.copy()
+
+        with self._lock:
+            self._sequence += 1
+            sequence = self._sequence
+            self._ensure_thread()
+        name = f"{DEBUG_PREFIX}{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{sequence}.{self.image_format}"
+        path = os.path.join(self.directory, name)
+        try:
+            self._queue.put_nowait({"image": image, "box": box, "label": label, "path": path})
+        except queue.Full:
+            with self._lock:
+                self.stats["dropped"] += 1
+            return None
+        with self._lock:
+            self.stats["queued"] += 1
+        return path
+
+    def _ensure_thread(self) -> None:
+        """按需启动写入线程（调用方持有锁）"""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="debug-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        """写入线程主循环"""
+        while True:
+            job = self._queue.get()
+            if job is None:
+                self._queue.task_done()
+                return
+            try:
+                with latency_metrics.stage("debug_encode"):
+                    written = self._write(job)
+                with self._lock:
+                    self.stats["written" if written else "failed"] += 1
+                if written:
+                    self.enforce_retention()
+            finally:
+                self._queue.task_done()
+
+    def _write(self, job: Dict) -> bool:
+        """标注、缩放、编码并原子地写入一张图片"""
+        image = job["image"]
+        if image.ndim == 2:
+            image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+        x, y, width, height = job["box"]
+        cv2.rectangle(image, (x, y), (x + width, y + height), (0, 255, 0), 3)
+        if job["label"]:
+            cv2.putText(image, job["label"], (x, max(20, y - 10)), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+
+        if self.crop_margin <= 0 and self.max_width > 0 and image.shape[1] > self.max_width:
+            scale = self.max_width / image.shape[1]
+            image = cv2.resize(image, (self.max_width, int(image.shape[0] * scale)), interpolation=cv2.INTER_AREA)
+
+        if self.image_format == "jpg":
+            params = [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality]
+        else:
+            params = [cv2.IMWRITE_PNG_COMPRESSION, self.png_compression]
+        ok, encoded = cv2.imencode(f".{self.image_format}", image, params)
+        if not ok:
+            return False
+
+        path = job["path"]
+        temp_path = f"{path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(temp_path, "wb") as f:
+                f.write(encoded.tobytes())
+            os.replace(temp_path, path)
+        except OSError:
+            return False
+        return True
+
+    def enforce_retention(self) -> int:
+        """
+        清理输出目录：删除超过保存时长的调试图片，再从最旧的开始删除直到总大小不超过上限
+        :return: 删除的文件数量
+        """
+        try:
+            entries = [entry for entry in os.scandir(self.directory) if entry.name.startswith(DEBUG_PREFIX)]
+        except OSError:
+            return 0
+        files: List[Tuple[float, int, str]] = []
+        for entry in entries:
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+        files.sort()
+
+        now = time.time()
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        for mtime, size, path in files:
+            if now - mtime <= self.max_age and total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        with self._lock:
+            self.stats["removed"] += removed
+        return removed
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """等待队列中的图片全部写完（用于关闭服务和测试）"""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def shutdown(self) -> None:
+        """停止写入线程（队列中剩余的图片写完后退出）"""
+        with self._lock:
+            thread = self._thread
+        if thread is not None and thread.is_alive():
+            try:
+                self._queue.put(None, timeout=5.0)
+            except queue.Full:
+                return
+            thread.join(timeout=5.0)
+
+
+# 全局调试图片写入器
+debug_writer = DebugImageWriter()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+特征点匹配模块 - ORB 关键点 + LSH 索引匹配 + 单应性校验
+模板的关键点与描述子预先计算并缓存在模板注册表中；截图每帧只提取一次特征并建立索引，
+同一帧上的多个模板共用。匹配代价取决于特征点数量，与尺度个数和像素数无关，
+可以识别任意缩放（以及轻微旋转、透视）后的目标
+"""
+
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+# FLANN 的 LSH 索引参数（适用于 ORB 的二进制描述子）
+FLANN_INDEX_LSH = 6
+LSH_INDEX_PARAMS = {"algorithm": FLANN_INDEX_LSH, "table_number": 6, "key_size": 12, "multi_probe_level": 1}
+LSH_SEARCH_PARAMS = {"checks": 50}
+
+# ORB 描述子采样区域边长；模板四周补边后再检测，保证靠近边缘的关键点也有描述子
+ORB_PATCH_SIZE = 31
+
+
+class TemplateFeatures:
+    """模板的关键点坐标与描述子"""
+
+    def __init__(self, points: np.ndarray, descriptors: Optional[np.ndarray], width: int, height: int):
+        """
+        :param points: (N, 2) 关键点坐标（模板坐标系）
+        :param descriptors: (N, 32) ORB 描述子，没有关键点时为 None
+        :param width: 模板宽度
+        :param height: 模板高度
+        """
+        self.points = points
+        self.descriptors = descriptors
+        self.width = width
+        self.height = height
+
+    @property
+    def nbytes(self) -> int:
+        """占用字节数（计入模板缓存上限）"""
+        return self.points.nbytes + (self.descriptors.nbytes if self.descriptors is not None else 0)
+
+
+def extract_template_features(gray: np.ndarray, max_features: int = 500) -> TemplateFeatures:
+    """
+    提取模板特征
+    :param gray: 灰度模板
+    :param max_features: 最多保留的关键点数量
+    """
+    height, width = gray.shape[:2]
+    border = ORB_PATCH_SIZE
+    padded = cv2.copyMakeBorder(gray, border, border, border, border, cv2.BORDER_REPLICATE)
+    orb = cv2.ORB_create(nfeatures=max_features, patchSize=ORB_PATCH_SIZE, edgeThreshold=ORB_PATCH_SIZE)
+    keypoints, descriptors = orb.detectAndCompute(padded, None)
+
+    points = np.array([kp.pt for kp in keypoints], np.float32).reshape(-1, 2) - border
+    # 只保留落在模板内部的关键点（补边区域是复制出来的像素）
+    inside = (points[:, 0] >= 0) & (points[:, 0] < width) & (points[:, 1] >= 0) & (points[:, 1] < height)
+    if descriptors is None or not inside.any():
+        return TemplateFeatures(np.zeros((0, 2), np.float32), None, width, height)
+    return TemplateFeatures(points[inside], descriptors[inside], width, height)
+
+
+class ScreenFeatures:
+    """
+    单帧截图（或分块）的特征与 LSH 索引
+    索引在第一次匹配时建立，之后同一帧上的所有模板复用
+    """
+
+    def __init__(self, gray: np.ndarray, max_features: int = 5000):
+        """
+        :param gray: 灰度截图
+        :param max_features: 最多提取的关键点数量
+        """
+        orb = cv2.ORB_create(nfeatures=max_features, patchSize=ORB_PATCH_SIZE, edgeThreshold=ORB_PATCH_SIZE)
+        keypoints, descriptors = orb.detectAndCompute(gray, None)
+        self.points = np.array([kp.pt for kp in keypoints], np.float32).reshape(-1, 2)
+        self.descriptors = descriptors
+        self._matcher: Optional[cv2.FlannBasedMatcher] = None
+        self._lock = threading.Lock()
+
+    def _get_matcher(self) -> cv2.FlannBasedMatcher:
+        """建立（或复用）截图描述子的 LSH 索引"""
+        with self._lock:
+            if self._matcher is None:
+                matcher = cv2.FlannBasedMatcher(LSH_INDEX_PARAMS, LSH_SEARCH_PARAMS)
+                matcher.add([self.descriptors])
+                matcher.train()
+                self._matcher = matcher
+            return self._matcher
+
+    def match(self, template: TemplateFeatures, ratio: float) -> List[Tuple[int, int]]:
+        """
+        模板描述子在截图索引中做 2 近邻查询，并用比值检验过滤
+        :param ratio: 最近邻与次近邻距离之比的上限
+        :return: [(模板关键点序号, 截图关键点序号)]
+        """
+        if template.descriptors is None or self.descriptors is None or len(self.descriptors) < 2:
+            return []
+        matcher = self._get_matcher()
+        with self._lock:
+            knn = matcher.knnMatch(template.descriptors, k=2)
+        pairs = []
+        for neighbors in knn:
+            # LSH 可能返回不足 2 个近邻
+            if len(neighbors) == 2 and neighbors[0].distance < ratio * neighbors[1].distance:
+                pairs.append((neighbors[0].queryIdx, neighbors[0].trainIdx))
+        return pairs
+
+
+def locate_template(
+    template: TemplateFeatures,
+    screen: ScreenFeatures,
+    ratio: float = 0.75,
+    min_inliers: int = 8,
+    reproj_threshold: float = 5.0
+) -> Dict:
+    """
+    在截图中定位模板
+    :param ratio: 比值检验阈值
+    :param min_inliers: 单应性内点数下限
+    :param reproj_threshold: RANSAC 重投影误差阈值（像素）
+    :return: {"confidence", "inliers", "matches", "corners", "bbox"}；
+             未通过校验时 corners/bbox 为 None，confidence 为 0
+    """
+    pairs = screen.match(template, ratio)
+    result = {"confidence": 0.0, "inliers": 0, "matches": len(pairs), "corners": None, "bbox": None}
+    if len(pairs) < max(4, min_inliers):
+        return result
+
+    template_idx, screen_idx = np.array(pairs).T
+    src = template.points[template_idx].reshape(-1, 1, 2)
+    dst = screen.points[screen_idx].reshape(-1, 1, 2)
+    homography, mask = cv2.findHomography(src, dst, cv2.RANSAC, reproj_threshold)
+    if homography is None:
+        return result
+    inliers = int(mask.sum())
+    result["inliers"] = inliers
+    if inliers < min_inliers:
+        return result
+
+    corners = np.array(
+        [[0, 0], [template.width, 0], [template.width, template.height], [0, template.height]], np.float32
+    ).reshape(-1, 1, 2)
+    projected = cv2.perspectiveTransform(corners, homography).reshape(-1, 2)
+    # 投影结果必须是面积合理的凸四边形，否则视为误匹配
+    area = cv2.contourArea(projected)
+    template_area = float(template.width * template.height)
+    if not cv2.isContourConvex(projected) or not 1 / 25 <= area / template_area <= 25:
+        return result
+
+    left, top = np.floor(projected.min(axis=0)).astype(int)
+    right, bottom = np.ceil(projected.max(axis=0)).astype(int)
+    result.update(
+        confidence=inliers / len(pairs),
+        corners=[(float(x), float(y)) for x, y in projected],
+        bbox=(int(left), int(top), int(right - left), int(bottom - top))
+    )
+    return result
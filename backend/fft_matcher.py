@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+频域匹配模块 - 基于 DFT 的归一化互相关
+空域 matchTemplate 的代价随模板面积增长，整块对话框这类大模板在全屏上很慢；
+频域相关的代价只与截图尺寸有关。截图频谱按帧缓存，填充尺寸只取决于截图，
+同一帧上的所有模板（批量匹配、级联的各阶段）共用同一份频谱和窗口统计
+"""
+
+import threading
+from typing import Dict, Hashable, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+# 频域引擎支持的算法（结果与 cv2.matchTemplate 一致，允许浮点舍入误差）
+FFT_METHODS = (cv2.TM_CCOEFF_NORMED, cv2.TM_CCORR_NORMED, cv2.TM_SQDIFF_NORMED)
+
+# 匹配引擎：spatial 为 cv2.matchTemplate，fft 为频域相关，auto 按模板面积自动选择
+ENGINES = ("spatial", "fft", "auto")
+
+
+class ScreenSpectrum:
+    """
+    单帧截图（或分块）的频域数据
+    保存去均值后各通道的频谱；按模板尺寸缓存窗口统计，按模板缓存最近一次的相关结果
+    """
+
+    def __init__(self, image: np.ndarray):
+        """
+        :param image: 单通道或三通道截图
+        """
+        self.height, self.width = image.shape[:2]
+        # 只取不回绕的有效区域，填充到不小于截图尺寸即可，与模板尺寸无关
+        self.padded_shape = (cv2.getOptimalDFTSize(self.height), cv2.getOptimalDFTSize(self.width))
+        self.channels: List[np.ndarray] = cv2.split(image) if image.ndim == 3 else [image]
+        self.ndim = image.ndim
+
+        self.spectra: List[np.ndarray] = []
+        for channel in self.channels:
+            padded = np.zeros(self.padded_shape, np.float32)
+            # 去掉全局均值降低频谱动态范围；与零均值模板的相关结果不受影响
+            np.subtract(channel, float(channel.mean()), out=padded[:self.height, :self.width], dtype=np.float32)
+            self.spectra.append(cv2.dft(padded))
+
+        self._integrals: Optional[List[Tuple[np.ndarray, np.ndarray]]] = None
+        self._windows: Dict[Tuple[int, int], Dict[str, np.ndarray]] = {}
+        self._correlation: Optional[Tuple[np.ndarray, np.ndarray, List[float]]] = None
+        self._lock = threading.Lock()
+
+    def windows(self, template_height: int, template_width: int) -> Dict[str, np.ndarray]:
+        """
+        每个候选位置上模板窗口的统计量（按模板尺寸缓存）
+        :return: {"sums": 逐通道像素和, "sq_sum": 各通道平方和之和, "var": 各通道离差平方和之和}
+        """
+        key = (template_height, template_width)
+        with self._lock:
+            cached = self._windows.get(key)
+            if cached is not None:
+                return cached
+            if self._integrals is None:
+                self._integrals = [
+                    cv2.integral2(channel, sdepth=cv2.CV_64F, sqdepth=cv2.CV_64F)
+                    for channel in self.channels
+                ]
+            integrals = self._integrals
+
+        rows = self.height - template_height + 1
+        cols = self.width - template_width + 1
+        area = float(template_height * template_width)
+
+        def box(integral: np.ndarray) -> np.ndarray:
+            return (
+                integral[template_height:template_height + rows, template_width:template_width + cols]
+                - integral[:rows, template_width:template_width + cols]
+                - integral[template_height:template_height + rows, :cols]
+                + integral[:rows, :cols]
+            )
+
+        sums = []
+        sq_sum = np.zeros((rows, cols), np.float64)
+        var = np.zeros((rows, cols), np.float64)
+        for window_integral, window_sq_integral in integrals:
+            window_sum = box(window_integral)
+            window_sq_sum = box(window_sq_integral)
+            sums.append(window_sum.astype(np.float32))
+            sq_sum += window_sq_sum
+            # 方差需要在双精度下相减，避免大数相消
+            var += window_sq_sum - window_sum * window_sum / area
+        stats = {
+            "sums": sums,
+            "sq_sum": sq_sum.astype(np.float32),
+            "var": np.maximum(var, 0.0).astype(np.float32)
+        }
+        with self._lock:
+            self._windows[key] = stats
+        return stats
+
+    def correlate(self, template: np.ndarray) -> Tuple[np.ndarray, List[float]]:
+        """
+        截图与零均值模板的互相关（各通道之和），同一模板连续调用时复用结果
+        :return: (有效区域的相关图, 模板各通道均值)
+        """
+        with self._lock:
+            if self._correlation is not None and self._correlation[0] is template:
+                return self._correlation[1], self._correlation[2]
+
+        template_height, template_width = template.shape[:2]
+        rows = self.height - template_height + 1
+        cols = self.width - template_width + 1
+        template_channels = cv2.split(template) if template.ndim == 3 else [template]
+
+        total = np.zeros((rows, cols), np.float32)
+        means = []
+        for channel, screen_spectrum in zip(template_channels, self.spectra):
+            mean = float(channel.mean())
+            means.append(mean)
+            padded = np.zeros(self.padded_shape, np.float32)
+            np.subtract(channel, mean, out=padded[:template_height, :template_width], dtype=np.float32)
+            product = cv2.mulSpectrums(screen_spectrum, cv2.dft(padded), 0, conjB=True)
+            correlation = cv2.idft(product, flags=cv2.DFT_REAL_OUTPUT | cv2.DFT_SCALE)
+            total += correlation[:rows, :cols]
+
+        with self._lock:
+            self._correlation = (template, total, means)
+        return total, means
+
+
+def get_spectrum(screen_img: np.ndarray, cache: Optional[Dict], key: Hashable) -> ScreenSpectrum:
+    """
+    获取截图频谱
+    :param screen_img: 截图
+    :param cache: 频谱缓存字典（通常挂在截图字典上，同一帧的分块共用）；None 时不缓存
+    :param key: 截图在帧内的几何位置等能唯一确定像素内容的键
+    """
+    if cache is None:
+        return ScreenSpectrum(screen_img)
+    spectrum = cache.get(key)
+    if spectrum is None:
+        spectrum = cache[key] = ScreenSpectrum(screen_img)
+    return spectrum
+
+
+def match_template_fft(
+    screen_img: np.ndarray,
+    template: np.ndarray,
+    method: int,
+    spectrum: Optional[ScreenSpectrum] = None
+) -> np.ndarray:
+    """
+    频域模板匹配，返回与 cv2.matchTemplate 相同形状和含义的结果图
+    :param screen_img: 截图
+    :param template: 模板（通道数与截图一致）
+    :param method: TM_CCOEFF_NORMED / TM_CCORR_NORMED / TM_SQDIFF_NORMED
+    :param spectrum: 可选的截图频谱（同一帧复用）
+    :return: 匹配结果图
+    """
+    if method not in FFT_METHODS:
+        raise ValueError(f"频域引擎不支持该算法: {method}")
+    if template.ndim != screen_img.ndim:
+        raise ValueError("模板与截图的通道数不一致")
+    template_height, template_width = template.shape[:2]
+    if template_height > screen_img.shape[0] or template_width > screen_img.shape[1]:
+        raise ValueError("模板尺寸大于截图尺寸")
+
+    if spectrum is None:
+        spectrum = ScreenSpectrum(screen_img)
+    windows = spectrum.windows(template_height, template_width)
+    correlation, means = spectrum.correlate(template)
+
+    template_f = template.astype(np.float64)
+    template_sq_sum = float((template_f * template_f).sum())
+
+    if method == cv2.TM_CCOEFF_NORMED:
+        template_var = template_sq_sum - sum(
+            mean * mean for mean in means
+        ) * template_height * template_width
+        denominator = np.sqrt(windows["var"] * np.float32(max(template_var, 0.0)))
+        return _normalize(correlation, denominator, method)
+
+    # 原始互相关 = 零均值互相关 + 模板均值 × 窗口像素和
+    raw = correlation.copy()
+    for mean, window_sum in zip(means, windows["sums"]):
+        raw += np.float32(mean) * window_sum
+    denominator = np.sqrt(windows["sq_sum"] * np.float32(template_sq_sum))
+    if method == cv2.TM_SQDIFF_NORMED:
+        raw = windows["sq_sum"] + np.float32(template_sq_sum) - 2 * raw
+    return _normalize(raw, denominator, method)
+
+
+def _normalize(numerator: np.ndarray, denominator: np.ndarray, method: int) -> np.ndarray:
+    """
+    归一化，并按 OpenCV 的约定处理分母接近 0 的平坦窗口
+    （CCOEFF/CCORR 记 0，SQDIFF 记 1；浮点误差导致越界时截断）
+    """
+    eps = np.finfo(np.float32).eps
+    valid = denominator > eps * np.abs(numerator) + eps
+    result = np.zeros(numerator.shape, np.float32)
+    np.divide(numerator, denominator, out=result, where=valid)
+    if method == cv2.TM_SQDIFF_NORMED:
+        result[~valid] = 1.0
+        np.clip(result, 0.0, 1.0, out=result)
+    else:
+        np.clip(result, -1.0, 1.0, out=result)
+    return result
+
+
+def choose_engine(engine: str, template: np.ndarray, method: int, min_area: int) -> str:
+    """
+    选择匹配引擎
+    :param engine: spatial / fft / auto
+    :param min_area: auto 模式下改用频域引擎的最小模板面积
+    :return: spatial 或 fft
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"不支持的匹配引擎: {engine}")
+    if method not in FFT_METHODS:
+        return "spatial"
+    if engine == "auto":
+        return "fft" if template.shape[0] * template.shape[1] >= min_area else "spatial"
+    return "fft" if engine == "fft" else "spatial"
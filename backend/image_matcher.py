@@ -3,8 +3,18 @@
 """
 import cv2
 import numpy as np
-from datetime import datetime
-import os
+
+from template_cache import template_registry
+from parallel_matcher import map_screens
+from scale_search import default_scale_search, scale_memory, screen_dpi_key
+from incremental_enhance import IncrementalEnhancer
+from fft_matcher import choose_engine, get_spectrum, match_template_fft
+from latency_metrics import latency_metrics
+from debug_writer import debug_writer
+from pyramid_matcher import VERIFY_METHOD, window_score
+
+# 默认的增量增强器（按显示器缓存上一帧的增强结果）
+incremental_enhancer = IncrementalEnhancer()
 
 
 def enhance_image(img):
@@ -20,11 +30,50 @@ def enhance_image(img):
         return img
 
 
-def match_template_multi_method(screenshot_gray, template_gray):
+def enhance_gray(img):
+    """增强对比度后转换为灰度"""
+    return cv2.cvtColor(enhance_image(img), cv2.COLOR_BGR2GRAY)
+
+
+def match_template(screenshot_gray, template_gray, method, engine="auto", min_area=128 * 128, spectra=None):
+    """
+    执行单个算法的模板匹配，大模板改用频域相关
+    spectra: 截图频谱缓存字典，同一截图上的多个算法共用
+    """
+    if choose_engine(engine, template_gray, method, min_area) == "fft":
+        spectrum = get_spectrum(screenshot_gray, spectra, "screen")
+        return match_template_fft(screenshot_gray, template_gray, method, spectrum)
+    return cv2.matchTemplate(screenshot_gray, template_gray, method)
+
+
+def match_template_multi_method(screenshot_gray, template_gray, cascade=None, target=None, engine="auto"):
     """
     使用多种算法进行模板匹配
+    cascade: 可选的 MatchCascade，提供时按级联顺序匹配并在达到 target 后提前结束
+    engine: 匹配引擎（spatial/fft/auto）
     返回: (best_match_loc, best_confidence, best_method, all_results)
     """
+    spectra = {}
+    if cascade is not None:
+        def match_fn(method):
+            result = match_template(screenshot_gray, template_gray, method, engine, spectra=spectra)
+            min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
+            if method == cv2.TM_SQDIFF_NORMED:
+                return 1 - min_val, min_loc
+            return max_val, max_loc
+        
+        cascade_result = cascade.run(
+            match_fn,
+            target if target is not None else 1.0,
+            lambda top_left: window_score(screenshot_gray, template_gray, top_left, VERIFY_METHOD)
+        )
+        return (
+            cascade_result["top_left"],
+            cascade_result["confidence"],
+            cascade_result["method"],
+            cascade_result["stages"]
+        )
+    
     best_match = None
     best_confidence = 0.0
     best_method = None
@@ -38,7 +87,7 @@ def match_template_multi_method(screenshot_gray, template_gray):
     
     for method_name, method in methods:
         try:
-            result = cv2.matchTemplate(screenshot_gray, template_gray, method)
+            result = match_template(screenshot_gray, template_gray, method, engine, spectra=spectra)
             
             if method == cv2.TM_SQDIFF_NORMED:
                 min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
@@ -67,60 +116,127 @@ def match_template_multi_method(screenshot_gray, template_gray):
     return best_match, best_confidence, best_method, all_results
 
 
-def match_template_multi_scale(screenshot_gray, template_gray, base_confidence):
+def match_template_multi_scale(screenshot_gray, template_gray, base_confidence, cached_template=None,
+                               target=None, memory_key=None, scale_search=None):
     """
-    多尺度模板匹配
-    返回: (best_match_loc, best_confidence, best_method, scale_results)
+    多尺度模板匹配（由粗到精 + 黄金分割细化，记住每个模板在每种 DPI 下的最佳尺度）
+    cached_template: 可选的 CachedTemplate，提供时复用其缓存的缩放模板
+    target: 置信度目标，达到后停止搜索
+    memory_key: 尺度记忆键 (模板 ID, 显示器 DPI 键)，提供时读取并更新最佳尺度
+    返回: (best_match_loc, best_confidence, best_method, scale_results, best_template)
     """
-    best_match = None
-    best_confidence = base_confidence
-    best_method = None
-    scale_results = []
-    best_template = template_gray
+    engine = scale_search or default_scale_search
     
-    scales = [0.7, 0.8, 0.9, 1.1, 1.2, 1.3]
+    if cached_template is not None:
+        def get_scaled(scale):
+            return cached_template.scaled(scale, "enhanced_gray", enhance_gray)
+    else:
+        local_cache = {}
+        
+        def get_scaled(scale):
+            if scale not in local_cache:
+                width = int(template_gray.shape[1] * scale)
+                height = int(template_gray.shape[0] * scale)
+                local_cache[scale] = cv2.resize(template_gray, (width, height))
+            return local_cache[scale]
     
-    for scale in scales:
-        try:
-            width = int(template_gray.shape[1] * scale)
-            height = int(template_gray.shape[0] * scale)
-            
-            if width < 10 or height < 10 or width > screenshot_gray.shape[1] or height > screenshot_gray.shape[0]:
-                continue
-            
-            template_scaled = cv2.resize(template_gray, (width, height))
-            result = cv2.matchTemplate(screenshot_gray, template_scaled, cv2.TM_CCOEFF_NORMED)
-            min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
-            
-            scale_results.append({
-                "scale": scale,
-                "confidence": float(max_val)
-            })
-            
-            if max_val > best_confidence:
-                best_confidence = max_val
-                best_match = max_loc
-                best_method = f"Multi-scale ({scale}x)"
-                best_template = template_scaled
-        except Exception as e:
-            scale_results.append({
-                "scale": scale,
-                "error": str(e)
-            })
+    remembered = scale_memory.get(memory_key) if memory_key else None
+    result = engine.search(
+        screenshot_gray,
+        get_scaled,
+        template_gray.shape[:2],
+        base_confidence,
+        target if target is not None else 1.0,
+        remembered
+    )
+    
+    if result["template"] is None:
+        return None, base_confidence, None, result["tried"], template_gray
+    
+    if memory_key:
+        scale_memory.remember(memory_key, result["scale"])
+    return (
+        result["top_left"],
+        result["confidence"],
+        f"Multi-scale ({result['scale']}x)",
+        result["tried"],
+        result["template"]
+    )
+
+
+def match_single_monitor(screen_data, template_gray, confidence, cascade=None, cached_template=None,
+                         enhancer=None):
+    """
+    在单个显示器上查找图片（增强 + 多算法 + 多尺度回退）
+    enhancer: 可选的 IncrementalEnhancer，提供时只对变化区域重新增强
+    返回: (match_loc, match_conf, match_method, monitor_result, template_size)
+    """
+    screenshot = screen_data["image"]
+    monitor_id = screen_data["monitor_id"]
+    offset_x = screen_data["offset_x"]
+    offset_y = screen_data["offset_y"]
+    timings = {}
+    
+    # 预处理屏幕截图
+    with latency_metrics.stage("preprocess", timings):
+        if enhancer is not None:
+            screenshot_enhanced = enhancer.enhance((monitor_id, offset_x, offset_y), screenshot)
+        else:
+            screenshot_enhanced = enhance_image(screenshot)
+        screenshot_gray = cv2.cvtColor(screenshot_enhanced, cv2.COLOR_BGR2GRAY)
+    
+    # 使用多算法匹配
+    with latency_metrics.stage("match", timings):
+        match_loc, match_conf, match_method, method_results = match_template_multi_method(
+            screenshot_gray, template_gray, cascade, confidence
+        )
+    
+    monitor_result = {
+        "monitor_id": monitor_id,
+        "monitor_size": f"{screen_data['width']}x{screen_data['height']}",
+        "offset": f"({offset_x}, {offset_y})",
+        "methods_tried": method_results,
+        "best_confidence": float(match_conf),
+        "timings": timings
+    }
+    
+    # 如果置信度不够，尝试多尺度匹配
+    final_template = template_gray
+    if match_conf < confidence and match_conf > 0.5:
+        memory_key = (cached_template.template_id, screen_dpi_key(screen_data)) if cached_template else None
+        with latency_metrics.stage("multi_scale", timings):
+            scale_match, scale_conf, scale_method, scale_results, scaled_template = match_template_multi_scale(
+                screenshot_gray, template_gray, match_conf, cached_template, confidence, memory_key
+            )
+        
+        monitor_result["multi_scale_tried"] = scale_results
+        
+        if scale_conf > match_conf:
+            match_loc = scale_match
+            match_conf = scale_conf
+            match_method = scale_method
+            final_template = scaled_template
+            monitor_result["best_confidence"] = float(scale_conf)
     
-    return best_match, best_confidence, best_method, scale_results, best_template
+    monitor_result["best_method"] = match_method
+    return match_loc, match_conf, match_method, monitor_result, (final_template.shape[1], final_template.shape[0])
 
 
-def find_image_on_screen_multi_monitor(screenshots, template_path, confidence=0.8, enable_debug=False):
+def find_image_on_screen_multi_monitor(screenshots, template_path, confidence=0.8, enable_debug=False, cascade=None,
+                                       executor=None, enhancer=incremental_enhancer):
     """
     在多个显示器上查找图片
     screenshots: 显示器截图列表
+    cascade: 可选的 MatchCascade，提供时各显示器按级联顺序匹配
+    executor: 可选的工作池，提供时各显示器并行匹配
+    enhancer: 增量增强器，默认复用模块级实例；传 None 时每次整帧增强
     返回: (found, location, match_confidence, match_info)
     """
-    # 加载模板图片
-    template = cv2.imread(template_path)
-    if template is None:
+    # 加载模板图片（命中缓存时跳过读盘和解码）
+    cached_template = template_registry.load(template_path)
+    if cached_template is None:
         return False, None, 0.0, {"error": "无法加载模板图片"}
+    template = cached_template.image
     
     # 初始化匹配信息
     match_info = {
@@ -136,51 +252,15 @@ def find_image_on_screen_multi_monitor(screenshots, template_path, confidence=0.
     global_best_method = None
     global_template_size = None
     
-    # 预处理模板
-    template_enhanced = enhance_image(template)
-    template_gray = cv2.cvtColor(template_enhanced, cv2.COLOR_BGR2GRAY)
+    # 预处理模板（增强 + 灰度结果缓存在模板注册表中）
+    template_gray = cached_template.variant("enhanced_gray", enhance_gray)
     
-    # 遍历所有显示器
-    for screen_data in screenshots:
-        screenshot = screen_data["image"]
-        monitor_id = screen_data["monitor_id"]
-        offset_x = screen_data["offset_x"]
-        offset_y = screen_data["offset_y"]
-        
-        # 预处理屏幕截图
-        screenshot_enhanced = enhance_image(screenshot)
-        screenshot_gray = cv2.cvtColor(screenshot_enhanced, cv2.COLOR_BGR2GRAY)
-        
-        # 使用多算法匹配
-        match_loc, match_conf, match_method, method_results = match_template_multi_method(
-            screenshot_gray, template_gray
-        )
-        
-        monitor_result = {
-            "monitor_id": monitor_id,
-            "monitor_size": f"{screen_data['width']}x{screen_data['height']}",
-            "offset": f"({offset_x}, {offset_y})",
-            "methods_tried": method_results,
-            "best_confidence": float(match_conf)
-        }
-        
-        # 如果置信度不够，尝试多尺度匹配
-        final_template = template_gray
-        if match_conf < confidence and match_conf > 0.5:
-            scale_match, scale_conf, scale_method, scale_results, scaled_template = match_template_multi_scale(
-                screenshot_gray, template_gray, match_conf
-            )
-            
-            monitor_result["multi_scale_tried"] = scale_results
-            
-            if scale_conf > match_conf:
-                match_loc = scale_match
-                match_conf = scale_conf
-                match_method = scale_method
-                final_template = scaled_template
-                monitor_result["best_confidence"] = float(scale_conf)
-        
-        monitor_result["best_method"] = match_method
+    # 遍历所有显示器（提供工作池时并行处理）
+    monitor_matches = map_screens(
+        executor, match_single_monitor, screenshots, template_gray, confidence, cascade, cached_template, enhancer
+    )
+    
+    for screen_data, (match_loc, match_conf, match_method, monitor_result, final_size) in zip(screenshots, monitor_matches):
         match_info["monitor_results"].append(monitor_result)
         
         # 更新全局最佳匹配
@@ -189,7 +269,7 @@ def find_image_on_screen_multi_monitor(screenshots, template_path, confidence=0.
             global_best_match = match_loc
             global_best_monitor = screen_data
             global_best_method = match_method
-            global_template_size = (final_template.shape[1], final_template.shape[0])
+            global_template_size = final_size
     
     # 设置全局匹配信息
     match_info["best_confidence"] = float(global_best_confidence)
@@ -197,7 +277,7 @@ def find_image_on_screen_multi_monitor(screenshots, template_path, confidence=0.
     
     # 判断是否找到
     if global_best_match and global_best_confidence >= confidence:
-        h, w = global_template_size
+        w, h = global_template_size
         
         # 计算绝对屏幕坐标（考虑显示器偏移）
         absolute_x = global_best_match[0] + global_best_monitor["offset_x"] + w // 2
@@ -222,28 +302,16 @@ def find_image_on_screen_multi_monitor(screenshots, template_path, confidence=0.
             }
         }
         
-        # 调试模式：保存匹配结果
+        # 调试模式：交给后台写入器标注并保存匹配结果（队列满时丢弃）
         if enable_debug:
-            try:
-                debug_img = global_best_monitor["image"].copy()
-                cv2.rectangle(
-                    debug_img,
-                    (global_best_match[0], global_best_match[1]),
-                    (global_best_match[0] + w, global_best_match[1] + h),
-                    (0, 255, 0), 3
-                )
-                cv2.putText(
-                    debug_img,
-                    f"Monitor {global_best_monitor['monitor_id']}: {global_best_confidence:.2%}",
-                    (global_best_match[0], global_best_match[1] - 10),
-                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2
+            with latency_metrics.stage("debug_submit", match_info.setdefault("timings", {})):
+                debug_path = debug_writer.submit(
+                    global_best_monitor["image"],
+                    (int(global_best_match[0]), int(global_best_match[1]), int(w), int(h)),
+                    f"Monitor {global_best_monitor['monitor_id']}: {global_best_confidence:.2%}"
                 )
-                debug_path = os.path.join("backend/uploads", 
-                                        f"debug_match_{datetime.now().strftime('%H%M%S')}.png")
-                cv2.imwrite(debug_path, debug_img)
+            if debug_path:
                 match_info["debug_image"] = debug_path
-            except:
-                pass
         
         return True, location, float(global_best_confidence), match_info
     
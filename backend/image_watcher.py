@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+等待图片出现模块 - 基于帧差分的服务端轮询
+按固定频率截图，逐块比较与上一帧的差异，只有变化区域可能容纳模板时才重新匹配，
+且只在各处变化区域（外扩模板尺寸）内分别匹配，避免每次轮询都做全屏搜索
+"""
+
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from search_hints import crop_screenshots
+
+# 匹配函数：输入截图列表，返回 (是否找到, 位置信息, 匹配度, 匹配详情)
+MatchFn = Callable[[List[Dict]], Tuple[bool, Optional[Dict], float, Dict]]
+
+
+def changed_tiles(previous: np.ndarray, current: np.ndarray, tile_size: int, threshold: int = 0) -> np.ndarray:
+    """
+    逐块比较两帧
+    :param tile_size: 分块边长（像素），最后一行/列分块可以不足该尺寸
+    :param threshold: 像素差超过该值才视为变化
+    :return: (行, 列) 的变化分块掩码
+    """
+    height, width = current.shape[:2]
+    channels = current.shape[2] if current.ndim == 3 else 1
+    diff = cv2.absdiff(previous, current).reshape(height, width * channels)
+    row_starts = np.arange(0, height, tile_size)
+    col_starts = np.arange(0, width, tile_size) * channels
+    block_max = np.maximum.reduceat(np.maximum.reduceat(diff, row_starts, axis=0), col_starts, axis=1)
+    return block_max > threshold
+
+
+def dirty_regions(
+    screen: Dict,
+    mask: np.ndarray,
+    tile_size: int,
+    template_size: Tuple[int, int],
+    full_ratio: float = 0.5
+) -> List[Dict]:
+    """
+    由变化分块生成需要重新匹配的全局区域
+    相连的变化分块为一组，模板只要与组内任一分块相交就可能是新出现的目标，因此每组外包矩形
+    四周扩展模板尺寸；扩展后重叠的区域合并，总面积超过 full_ratio 时直接返回整个显示器
+    :param template_size: (宽, 高)
+    :param full_ratio: 区域总面积占显示器面积的比例上限
+    :return: 全局区域列表，放不下模板的区域不返回
+    """
+    if not mask.any():
+        return []
+    template_width, template_height = template_size
+    count, _, stats, _ = cv2.connectedComponentsWithStats(mask.astype(np.uint8), connectivity=8)
+    boxes = []
+    for label in range(1, count):
+        x, y, width, height = stats[label][:4]
+        boxes.append([
+            max(0, x * tile_size - (template_width - 1)),
+            max(0, y * tile_size - (template_height - 1)),
+            min(screen["width"], (x + width) * tile_size + (template_width - 1)),
+            min(screen["height"], (y + height) * tile_size + (template_height - 1))
+        ])
+
+    # 合并重叠的区域，避免重复匹配同一片像素
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(boxes)):
+            for j in range(i + 1, len(boxes)):
+                a, b = boxes[i], boxes[j]
+                if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                    boxes[i] = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+                    del boxes[j]
+                    merged = True
+                    break
+            if merged:
+                break
+
+    boxes = [box for box in boxes if box[2] - box[0] >= template_width and box[3] - box[1] >= template_height]
+    area = sum((right - left) * (bottom - top) for left, top, right, bottom in boxes)
+    if area > screen["width"] * screen["height"] * full_ratio:
+        boxes = [[0, 0, screen["width"], screen["height"]]]
+    return [
+        {
+            "x": int(screen["offset_x"] + left),
+            "y": int(screen["offset_y"] + top),
+            "width": int(right - left),
+            "height": int(bottom - top)
+        }
+        for left, top, right, bottom in boxes
+    ]
+
+
+def wait_for_image(
+    capture_fn: Callable[[], List[Dict]],
+    release_fn: Callable[[List[Dict]], None],
+    match_fn: MatchFn,
+    template_size: Tuple[int, int],
+    timeout: float = 30.0,
+    interval: float = 0.5,
+    tile_size: int = 64,
+    threshold: int = 0,
+    cancel_event: Optional[threading.Event] = None,
+    full_ratio: float = 0.5
+) -> Tuple[bool, Optional[Dict], float, Dict]:
+    """
+    等待图片出现在屏幕上
+    :param capture_fn: 截图函数
+    :param release_fn: 截图用完后的归还函数
+    :param match_fn: 在截图列表上执行匹配的函数
+    :param template_size: 模板 (宽, 高)
+    :param timeout: 超时时间（秒）
+    :param interval: 轮询间隔（秒）
+    :param tile_size: 帧差分分块边长（像素）
+    :param threshold: 像素差阈值
+    :param cancel_event: 可选的取消事件
+    :param full_ratio: 变化区域总面积超过显示器面积的该比例时整屏匹配
+    :return: (是否找到, 位置信息, 最佳匹配度, 匹配详情)，匹配详情中附带 watch 统计
+    """
+    start = time.monotonic()
+    deadline = start + timeout
+    previous: Dict[int, np.ndarray] = {}
+    stats = {"polls": 0, "full_scans": 0, "partial_scans": 0, "skipped": 0, "regions": 0}
+    best_confidence = 0.0
+    match_info: Dict = {}
+
+    while True:
+        stats["polls"] += 1
+        screenshots = capture_fn()
+        try:
+            regions = []
+            rescan_all = False
+            for screen in screenshots:
+                frame = screen["image"]
+                last = previous.get(screen["monitor_id"])
+                if last is None or last.shape != frame.shape:
+                    rescan_all = True
+                    previous[screen["monitor_id"]] = frame.copy()
+                    continue
+                mask = changed_tiles(last, frame, tile_size, threshold)
+                for region in dirty_regions(screen, mask, tile_size, template_size, full_ratio):
+                    regions.append((screen, region))
+                np.copyto(last, frame)
+
+            if rescan_all:
+                stats["full_scans"] += 1
+                result = match_fn(screenshots)
+            elif regions:
+                stats["partial_scans"] += 1
+                stats["regions"] += len(regions)
+                cropped = []
+                for screen, region in regions:
+                    cropped.extend(crop_screenshots([screen], region))
+                result = match_fn(cropped)
+            else:
+                stats["skipped"] += 1
+                result = None
+        finally:
+            release_fn(screenshots)
+
+        if result is not None:
+            found, location, confidence, match_info = result
+            best_confidence = max(best_confidence, confidence)
+            if found:
+                match_info["watch"] = {**stats, "elapsed": round(time.monotonic() - start, 3)}
+                return True, location, confidence, match_info
+
+        now = time.monotonic()
+        if now >= deadline or (cancel_event is not None and cancel_event.is_set()):
+            break
+        wait = min(interval, deadline - now)
+        if cancel_event is not None:
+            if cancel_event.wait(wait):
+                break
+        else:
+            time.sleep(wait)
+
+    match_info["watch"] = {
+        **stats,
+        "elapsed": round(time.monotonic() - start, 3),
+        "timed_out": not (cancel_event is not None and cancel_event.is_set()),
+        "cancelled": cancel_event is not None and cancel_event.is_set()
+    }
+    return False, None, best_confidence, match_info
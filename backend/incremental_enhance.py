@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+增量对比度增强模块 - 只对发生变化的屏幕区域重新做 CLAHE
+按 CLAHE 的分块网格比较新旧截图，相连的变化分块各自成组，仅对每组及其插值影响范围重新计算，
+其余区域直接复用上一帧的增强结果；静态桌面重复增强几乎没有开销。
+更新时写入新的数组，已返回给调用方的结果不会被修改
+"""
+
+import threading
+from typing import Dict, Hashable, Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+def enhance_region(img: np.ndarray, clip_limit: float, grid: Tuple[int, int]) -> np.ndarray:
+    """对整幅图像做 LAB 空间的 CLAHE 增强（与 image_matcher.enhance_image 相同）"""
+    lab = cv2.cvtColor(img, cv2.COLOR_BGR2LAB)
+    l, a, b = cv2.split(lab)
+    clahe = cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=grid)
+    l = clahe.apply(l)
+    return cv2.cvtColor(cv2.merge([l, a, b]), cv2.COLOR_LAB2BGR)
+
+
+class IncrementalEnhancer:
+    """
+    增量 CLAHE 增强器
+    每个显示器保存上一帧原图和增强结果；CLAHE 每个像素由相邻 2x2 个分块的映射插值得到，
+    因此变化分块向外扩展一块即为需要更新的区域，再向外扩展一块作为计算上下文，
+    保证更新区域的结果与整帧增强一致（仅有不超过 1 级亮度的插值舍入差异）
+    """
+
+    def __init__(self, clip_limit: float = 2.0, grid: Tuple[int, int] = (8, 8), full_ratio: float = 0.75):
+        """
+        :param clip_limit: CLAHE 对比度限制
+        :param grid: CLAHE 分块网格 (列, 行)
+        :param full_ratio: 各组需要重算的面积之和超过该比例时直接整帧增强
+        """
+        self.clip_limit = clip_limit
+        self.grid = grid
+        self.full_ratio = full_ratio
+        self._states: Dict[Hashable, Dict[str, np.ndarray]] = {}
+        self._key_locks: Dict[Hashable, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.stats = {"full": 0, "incremental": 0, "unchanged": 0}
+
+    def _dirty_tiles(self, previous: np.ndarray, current: np.ndarray) -> np.ndarray:
+        """按 CLAHE 网格比较两帧，返回 (行, 列) 的变化分块掩码"""
+        cols, rows = self.grid
+        height, width = current.shape[:2]
+        tile_h, tile_w = height // rows, width // cols
+        channels = current.shape[2] if current.ndim == 3 else 1
+        changed = cv2.absdiff(previous, current)
+        # 通道与列展平后按分块取最大值，避免逐像素的通道归约
+        blocks = changed.reshape(rows, tile_h, cols, tile_w * channels)
+        return blocks.max(axis=(1, 3)) > 0
+
+    def enhance(self, key: Hashable, frame: np.ndarray) -> np.ndarray:
+        """
+        增强一帧截图
+        :param key: 显示器标识（同一显示器的连续截图使用相同的键）
+        :param frame: BGR 截图
+        :return: 增强后的 BGR 图像（只读，之后的增强不会修改它）
+        """
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        # 同一显示器的增强串行执行，不同显示器之间互不阻塞
+        with key_lock:
+            return self._enhance(key, frame)
+
+    def _enhance(self, key: Hashable, frame: np.ndarray) -> np.ndarray:
+        """增强一帧截图（调用方持有该显示器的锁）"""
+        cols, rows = self.grid
+        height, width = frame.shape[:2]
+
+        with self._lock:
+            state = self._states.get(key)
+        if state is None or state["frame"].shape != frame.shape:
+            return self._store(key, frame, enhance_region(frame, self.clip_limit, self.grid), "full")
+
+        # 尺寸不能被网格整除时 OpenCV 会在内部补边，分块无法对齐：只判断整帧是否变化
+        aligned = height % rows == 0 and width % cols == 0
+        if aligned:
+            dirty = self._dirty_tiles(state["frame"], frame)
+            unchanged = not dirty.any()
+        else:
+            unchanged = np.array_equal(state["frame"], frame)
+        if unchanged:
+            with self._lock:
+                self.stats["unchanged"] += 1
+            return state["enhanced"]
+        if not aligned:
+            return self._store(key, frame, enhance_region(frame, self.clip_limit, self.grid), "full")
+
+        # 相连的变化分块为一组，分别计算：更新区域为组外扩一块，计算区域再外扩一块
+        regions = []
+        count, labels, boxes, _ = cv2.connectedComponentsWithStats(dirty.astype(np.uint8), connectivity=8)
+        for label in range(1, count):
+            tx0, ty0, box_w, box_h = boxes[label][:4]
+            uy0, uy1 = max(0, ty0 - 1), min(rows, ty0 + box_h + 1)
+            ux0, ux1 = max(0, tx0 - 1), min(cols, tx0 + box_w + 1)
+            cy0, cy1 = max(0, uy0 - 1), min(rows, uy1 + 1)
+            cx0, cx1 = max(0, ux0 - 1), min(cols, ux1 + 1)
+            regions.append((uy0, uy1, ux0, ux1, cy0, cy1, cx0, cx1))
+
+        context_tiles = sum((cy1 - cy0) * (cx1 - cx0) for _, _, _, _, cy0, cy1, cx0, cx1 in regions)
+        if context_tiles > rows * cols * self.full_ratio:
+            return self._store(key, frame, enhance_region(frame, self.clip_limit, self.grid), "full")
+
+        tile_h, tile_w = height // rows, width // cols
+        # 在副本上更新，上一帧的结果可能仍在被匹配使用
+        enhanced = state["enhanced"].copy()
+        for uy0, uy1, ux0, ux1, cy0, cy1, cx0, cx1 in regions:
+            context = frame[cy0 * tile_h:cy1 * tile_h, cx0 * tile_w:cx1 * tile_w]
+            enhanced_context = enhance_region(context, self.clip_limit, (cx1 - cx0, cy1 - cy0))
+            enhanced[uy0 * tile_h:uy1 * tile_h, ux0 * tile_w:ux1 * tile_w] = enhanced_context[
+                (uy0 - cy0) * tile_h:(uy1 - cy0) * tile_h,
+                (ux0 - cx0) * tile_w:(ux1 - cx0) * tile_w
+            ]
+        return self._store(key, frame, enhanced, "incremental")
+
+    def _store(self, key: Hashable, frame: np.ndarray, enhanced: np.ndarray, kind: str) -> np.ndarray:
+        """保存本帧原图副本（截图缓冲区会被复用）与增强结果"""
+        with self._lock:
+            state = self._states.get(key)
+            if state is not None and state["frame"].shape == frame.shape:
+                np.copyto(state["frame"], frame)
+            else:
+                state = {"frame": frame.copy()}
+                self._states[key] = state
+            enhanced.setflags(write=False)
+            state["enhanced"] = enhanced
+            self.stats[kind] += 1
+        return enhanced
+
+    def reset(self, key: Optional[Hashable] = None) -> None:
+        """清除缓存（key 为 None 时清除全部显示器）"""
+        with self._lock:
+            if key is None:
+                self._states.clear()
+            else:
+                self._states.pop(key, None)
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+输入动作模块 - 自适应的鼠标移动与点击
+移动时长按距离计算（或直接跳转），用轮询真实光标位置确认到位，代替固定的移动时长和等待；
+可选地在点击后对点击位置附近做帧差分，确认界面确实有响应
+"""
+
+import math
+import time
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+
+from image_watcher import changed_tiles
+
+# 移动方式：instant 直接跳转，distance 按距离计时匀速移动，eased 按距离计时并缓入缓出
+MOVE_PROFILES = ("instant", "distance", "eased")
+
+
+def move_duration(profile: str, distance: float, speed: float, max_duration: float) -> float:
+    """
+    计算移动时长
+    :param profile: 移动方式
+    :param distance: 移动距离（像素）
+    :param speed: 移动速度（像素/秒）
+    :param max_duration: 时长上限（秒）
+    :return: 移动时长（秒）
+    """
+    if profile not in MOVE_PROFILES:
+        raise ValueError(f"不支持的移动方式: {profile}")
+    if profile == "instant" or speed <= 0:
+        return 0.0
+    return min(distance / speed, max_duration)
+
+
+class InputController:
+    """
+    鼠标输入控制器（在输入工作器线程中使用）
+    backend 为 pyautogui 或具有相同 position/moveTo/click 接口的对象
+    """
+
+    def __init__(
+        self,
+        backend: Any,
+        profile: str = "eased",
+        speed: float = 3000.0,
+        max_duration: float = 0.5,
+        arrival_tolerance: int = 1,
+        arrival_timeout: float = 0.5,
+        poll_interval: float = 0.005,
+        capture_region: Optional[Callable[[Dict], np.ndarray]] = None,
+        verify_radius: int = 64,
+        verify_timeout: float = 1.0,
+        verify_interval: float = 0.05,
+        verify_threshold: int = 0
+    ):
+        """
+        :param backend: 输入后端
+        :param profile: 移动方式
+        :param speed: 移动速度（像素/秒）
+        :param max_duration: 移动时长上限（秒）
+        :param arrival_tolerance: 光标与目标的允许偏差（像素）
+        :param arrival_timeout: 等待光标到位的最长时间（秒）
+        :param poll_interval: 光标位置轮询间隔（秒）
+        :param capture_region: 截取全局区域灰度图的函数，提供后才能做点击校验
+        :param verify_radius: 点击校验区域的半边长（像素）
+        :param verify_timeout: 点击后等待界面变化的最长时间（秒）
+        :param verify_interval: 点击校验的截图间隔（秒）
+        :param verify_threshold: 像素差超过该值才视为变化
+        """
+        if profile not in MOVE_PROFILES:
+            raise ValueError(f"不支持的移动方式: {profile}")
+        self.backend = backend
+        self.profile = profile
+        self.speed = speed
+        self.max_duration = max_duration
+        self.arrival_tolerance = arrival_tolerance
+        self.arrival_timeout = arrival_timeout
+        self.poll_interval = poll_interval
+        self.capture_region = capture_region
+        self.verify_radius = verify_radius
+        self.verify_timeout = verify_timeout
+        self.verify_interval = verify_interval
+        self.verify_threshold = verify_threshold
+
+    def move_to(self, x: int, y: int) -> Dict:
+        """
+        移动光标并等待到位
+        :return: {"distance", "duration", "arrived", "move_ms"}
+        """
+        start = time.perf_counter()
+        current_x, current_y = self.backend.position()
+        distance = math.hypot(x - current_x, y - current_y)
+        duration = move_duration(self.profile, distance, self.speed, self.max_duration)
+        tween = self.backend.easeInOutQuad if self.profile == "eased" else self.backend.linear
+        # 到位由轮询确认，移动本身不需要 PAUSE 等待
+        self.backend.moveTo(x, y, duration=duration, tween=tween, _pause=False)
+        arrived = self.wait_for_arrival(x, y)
+        return {
+            "distance": round(distance, 1),
+            "duration": round(duration, 3),
+            "arrived": arrived,
+            "move_ms": round((time.perf_counter() - start) * 1000, 1)
+        }
+
+    def wait_for_arrival(self, x: int, y: int) -> bool:
+        """轮询光标位置，直到与目标的偏差不超过容差或超时"""
+        deadline = time.perf_counter() + self.arrival_timeout
+        while True:
+            current_x, current_y = self.backend.position()
+            if abs(current_x - x) <= self.arrival_tolerance and abs(current_y - y) <= self.arrival_tolerance:
+                return True
+            if time.perf_counter() >= deadline:
+                return False
+            time.sleep(self.poll_interval)
+
+    def click(
+        self,
+        x: int,
+        y: int,
+        button: str = "left",
+        clicks: int = 1,
+        interval: float = 0.0,
+        verify: bool = False
+    ) -> Dict:
+        """
+        移动到目标并点击
+        :param interval: 多次点击之间的间隔（秒）
+        :param verify: 是否在点击后确认点击位置附近的画面发生变化
+        :return: 移动信息，外加 "verified"（未校验时为 None）和 "click_ms"
+        """
+        info = self.move_to(x, y)
+        region = self._verify_region(x, y) if verify and self.capture_region else None
+        before = self.capture_region(region) if region else None
+        if before is not None and before.size == 0:
+            # 点击位置在桌面之外，无法校验
+            region = before = None
+
+        start = time.perf_counter()
+        # 与 moveTo 相同，跳过 pyautogui.PAUSE 的固定等待
+        self.backend.click(x, y, clicks=clicks, interval=interval, button=button, _pause=False)
+        info["verified"] = self._wait_for_change(region, before) if region else None
+        info["click_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        return info
+
+    def _verify_region(self, x: int, y: int) -> Dict:
+        """点击位置周围的校验区域（全局坐标）"""
+        radius = self.verify_radius
+        return {"x": x - radius, "y": y - radius, "width": 2 * radius, "height": 2 * radius}
+
+    def _wait_for_change(self, region: Dict, before: np.ndarray) -> bool:
+        """点击后轮询校验区域，出现变化返回 True，超时返回 False"""
+        deadline = time.perf_counter() + self.verify_timeout
+        while True:
+            after = self.capture_region(region)
+            if after.shape != before.shape or changed_tiles(
+                before, after, max(before.shape[:2]), self.verify_threshold
+            ).any():
+                return True
+            if time.perf_counter() >= deadline:
+                return False
+            time.sleep(self.verify_interval)
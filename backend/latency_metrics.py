@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+延迟统计模块 - 按阶段（截图、预处理、匹配、点击等）记录耗时
+每个阶段用单调时钟计时：单次调用的耗时写入该次的 timings 字典（随匹配详情返回），
+同时累计到进程内的直方图，并保留最近若干次样本用于分位数，按 Prometheus 文本格式导出。
+关闭时 stage() 返回共享的空上下文，几乎没有开销
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+from typing import Deque, Dict, List, Optional, Sequence
+
+# 默认直方图桶上限（秒）
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# 导出的分位数（基于最近的样本窗口）
+QUANTILES = (0.5, 0.9, 0.99)
+
+METRIC_NAME = "pictowork_stage_duration_seconds"
+RECENT_METRIC_NAME = "pictowork_stage_recent_seconds"
+
+# 关闭统计时复用的空上下文
+_DISABLED_STAGE = nullcontext()
+
+
+class StageHistogram:
+    """单个阶段的累计直方图与最近样本窗口（由 LatencyMetrics 的锁保护）"""
+
+    def __init__(self, buckets: Sequence[float], window: int):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.total = 0.0
+        self.recent: Deque[float] = deque(maxlen=window)
+
+    def observe(self, seconds: float) -> None:
+        """记录一次耗时"""
+        self.count += 1
+        self.total += seconds
+        self.recent.append(seconds)
+        for i, upper in enumerate(self.buckets):
+            if seconds <= upper:
+                self.counts[i] += 1
+                break
+
+    def quantile(self, q: float) -> float:
+        """最近样本窗口的分位数（秒）"""
+        if not self.recent:
+            return 0.0
+        values = sorted(self.recent)
+        return values[min(len(values) - 1, int(q * len(values)))]
+
+
+class _Stage:
+    """计时上下文：退出时记录耗时"""
+
+    __slots__ = ("metrics", "name", "timings", "start")
+
+    def __init__(self, metrics: "LatencyMetrics", name: str, timings: Optional[Dict[str, float]]):
+        self.metrics = metrics
+        self.name = name
+        self.timings = timings
+        self.start = 0.0
+
+    def __enter__(self) -> "_Stage":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.metrics.observe(self.name, time.perf_counter() - self.start, self.timings)
+
+
+class LatencyMetrics:
+    """
+    分阶段延迟统计
+    同一 timings 字典中重复出现的阶段（如先在历史位置附近、再全屏匹配）耗时累加
+    """
+
+    def __init__(self, enabled: bool = True, buckets: Sequence[float] = DEFAULT_BUCKETS, window: int = 1024):
+        """
+        :param enabled: 是否启用统计
+        :param buckets: 直方图桶上限（秒，递增）
+        :param window: 每个阶段保留的最近样本数量
+        """
+        self.enabled = enabled
+        self.buckets = tuple(buckets)
+        self.window = window
+        self._stages: Dict[str, StageHistogram] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, enabled: Optional[bool] = None, window: Optional[int] = None) -> None:
+        """更新配置（窗口大小变化时清空已有统计）"""
+        with self._lock:
+            if enabled is not None:
+                self.enabled = enabled
+            if window is not None and window != self.window:
+                self.window = window
+                self._stages.clear()
+
+    def stage(self, name: str, timings: Optional[Dict[str, float]] = None):
+        """
+        阶段计时上下文
+        :param name: 阶段名称
+        :param timings: 可选的单次调用耗时字典，记录为毫秒
+        """
+        if not self.enabled:
+            return _DISABLED_STAGE
+        return _Stage(self, name, timings)
+
+    def observe(self, name: str, seconds: float, timings: Optional[Dict[str, float]] = None) -> None:
+        """直接记录一次阶段耗时（秒）"""
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._stages.get(name)
+            if histogram is None:
+                histogram = self._stages[name] = StageHistogram(self.buckets, self.window)
+            histogram.observe(seconds)
+            if timings is not None:
+                timings[name] = round(timings.get(name, 0.0) + seconds * 1000, 3)
+
+    def reset(self) -> None:
+        """清空统计"""
+        with self._lock:
+            self._stages.clear()
+
+    def render_prometheus(self) -> str:
+        """按 Prometheus 文本格式导出"""
+        lines: List[str] = [
+            f"# HELP {METRIC_NAME} 各处理阶段耗时",
+            f"# TYPE {METRIC_NAME} histogram"
+        ]
+        recent_lines: List[str] = [
+            f"# HELP {RECENT_METRIC_NAME} 各处理阶段最近样本的耗时分位数",
+            f"# TYPE {RECENT_METRIC_NAME} summary"
+        ]
+        with self._lock:
+            for name in sorted(self._stages):
+                histogram = self._stages[name]
+                cumulative = 0
+                for upper, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f'{METRIC_NAME}_bucket{{stage="{name}",le="{upper}"}} {cumulative}')
+                lines.append(f'{METRIC_NAME}_bucket{{stage="{name}",le="+Inf"}} {histogram.count}')
+                lines.append(f'{METRIC_NAME}_sum{{stage="{name}"}} {histogram.total:.6f}')
+                lines.append(f'{METRIC_NAME}_count{{stage="{name}"}} {histogram.count}')
+
+                for q in QUANTILES:
+                    recent_lines.append(
+                        f'{RECENT_METRIC_NAME}{{stage="{name}",quantile="{q}"}} {histogram.quantile(q):.6f}'
+                    )
+                recent_lines.append(f'{RECENT_METRIC_NAME}_sum{{stage="{name}"}} {sum(histogram.recent):.6f}')
+                recent_lines.append(f'{RECENT_METRIC_NAME}_count{{stage="{name}"}} {len(histogram.recent)}')
+        return "\n".join(lines + recent_lines) + "\n"
+
+
+# 全局统计实例（匹配、点击等各模块共用）
+latency_metrics = LatencyMetrics()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+日志广播模块 - WebSocket 日志的多客户端分发
+发布日志只是把消息放进各连接的有界队列，不等待网络发送；每个连接由独立的发送任务
+按固定间隔把积累的消息合并成一帧发出。慢连接的队列满时按策略丢弃消息，
+不会拖慢匹配和点击流程，也不影响其他连接
+"""
+
+import asyncio
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set
+
+# 日志级别
+LOG_LEVELS = ("debug", "info", "success", "warning", "error")
+
+# 队列满时的处理策略：drop_oldest 丢弃最旧的消息，drop_new 丢弃新消息
+OVERFLOW_POLICIES = ("drop_oldest", "drop_new")
+
+
+def parse_levels(levels: Optional[Iterable[str]]) -> Optional[Set[str]]:
+    """
+    解析订阅的日志级别
+    :param levels: 级别列表，None 或空表示订阅全部
+    :return: 级别集合，None 表示全部
+    """
+    if not levels:
+        return None
+    selected = {level.strip() for level in levels if level and level.strip()}
+    unknown = selected - set(LOG_LEVELS)
+    if unknown:
+        raise ValueError(f"不支持的日志级别: {', '.join(sorted(unknown))}")
+    return selected or None
+
+
+class ClientChannel:
+    """单个连接的发送队列与订阅设置"""
+
+    def __init__(self, websocket: Any, max_queue: int, levels: Optional[Set[str]] = None):
+        self.websocket = websocket
+        self.queue: Deque[Dict] = deque()
+        self.max_queue = max_queue
+        self.levels = levels
+        self.dropped = 0
+        self.wake = asyncio.Event()
+        self.send_lock = asyncio.Lock()  # 批量日志与命令响应共用同一连接，发送互斥
+        self.task: Optional[asyncio.Task] = None
+
+    def accepts(self, level: str) -> bool:
+        """是否订阅了该级别"""
+        return self.levels is None or level in self.levels
+
+
+class LogBroadcaster:
+    """
+    日志广播器（所有方法都应在事件循环线程中调用；其他线程使用 publish_threadsafe）
+    """
+
+    def __init__(
+        self,
+        max_queue: int = 256,
+        batch_interval: float = 0.05,
+        max_batch: int = 100,
+        overflow: str = "drop_oldest"
+    ):
+        """
+        :param max_queue: 每个连接的队列长度上限
+        :param batch_interval: 合并发送的间隔（秒），0 表示有消息就发送
+        :param max_batch: 每帧最多合并的消息数量
+        :param overflow: 队列满时的处理策略
+        """
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"不支持的队列溢出策略: {overflow}")
+        self.max_queue = max_queue
+        self.batch_interval = batch_interval
+        self.max_batch = max_batch
+        self.overflow = overflow
+        self.channels: Dict[int, ClientChannel] = {}
+        self.stats = {"published": 0, "sent_frames": 0, "dropped": 0}
+
+    def register(self, websocket: Any, levels: Optional[Set[str]] = None) -> ClientChannel:
+        """登记连接并启动其发送任务"""
+        channel = ClientChannel(websocket, self.max_queue, levels)
+        channel.task = asyncio.get_running_loop().create_task(self._sender(channel))
+        self.channels[id(websocket)] = channel
+        return channel
+
+    def unregister(self, websocket: Any) -> None:
+        """注销连接并停止其发送任务（未发送的消息丢弃）"""
+        channel = self.channels.pop(id(websocket), None)
+        if channel is not None and channel.task is not None:
+            channel.task.cancel()
+
+    def get(self, websocket: Any) -> Optional[ClientChannel]:
+        return self.channels.get(id(websocket))
+
+    def subscribe(self, websocket: Any, levels: Optional[Set[str]]) -> None:
+        """修改连接订阅的日志级别"""
+        channel = self.get(websocket)
+        if channel is not None:
+            channel.levels = levels
+
+    @staticmethod
+    def make_log(level: str, message: str, data: Optional[Dict] = None) -> Dict:
+        """构造日志消息"""
+        return {
+            "type": "log",
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "level": level,
+            "message": message,
+            "data": data or {}
+        }
+
+    def publish(self, level: str, message: str, data: Optional[Dict] = None) -> None:
+        """向所有订阅了该级别的连接发布日志（不等待发送）"""
+        log = self.make_log(level, message, data)
+        self.stats["published"] += 1
+        for channel in list(self.channels.values()):
+            if channel.accepts(level):
+                self._enqueue(channel, log)
+
+    def send_to(self, websocket: Any, message: Dict) -> None:
+        """向单个连接发送消息（同样经过该连接的队列，不受级别过滤）"""
+        channel = self.get(websocket)
+        if channel is not None:
+            self._enqueue(channel, message)
+
+    async def send_direct(self, websocket: Any, message: Dict) -> None:
+        """立即发送一条消息（命令响应、心跳等，不经过队列和合并间隔）"""
+        channel = self.get(websocket)
+        if channel is None:
+            await websocket.send_json(message)
+            return
+        async with channel.send_lock:
+            await websocket.send_json(message)
+
+    def publish_threadsafe(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        level: str,
+        message: str,
+        data: Optional[Dict] = None
+    ) -> None:
+        """在工作线程中发布日志"""
+        loop.call_soon_threadsafe(self.publish, level, message, data)
+
+    def _enqueue(self, channel: ClientChannel, message: Dict) -> None:
+        """放入连接队列，队列已满时按策略丢弃"""
+        if len(channel.queue) >= channel.max_queue:
+            channel.dropped += 1
+            self.stats["dropped"] += 1
+            if self.overflow == "drop_new":
+                return
+            channel.queue.popleft()
+        channel.queue.append(message)
+        channel.wake.set()
+
+    async def _sender(self, channel: ClientChannel) -> None:
+        """连接的发送任务：等待消息，积累一个间隔后合并成帧发送"""
+        try:
+            while True:
+                await channel.wake.wait()
+                if self.batch_interval > 0:
+                    await asyncio.sleep(self.batch_interval)
+                channel.wake.clear()
+                while channel.queue:
+                    count = min(len(channel.queue), self.max_batch)
+                    batch: List[Dict] = [channel.queue.popleft() for _ in range(count)]
+                    dropped, channel.dropped = channel.dropped, 0
+                    if len(batch) == 1 and not dropped:
+                        frame = batch[0]
+                    else:
+                        frame = {"type": "log_batch", "logs": batch, "dropped": dropped}
+                    async with channel.send_lock:
+                        await channel.websocket.send_json(frame)
+                    self.stats["sent_frames"] += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # 发送失败说明连接已断开，停止向该连接分发
+            self.channels.pop(id(channel.websocket), None)
+
+    def info(self) -> Dict[str, Any]:
+        """各连接的队列状态"""
+        return {
+            **self.stats,
+            "connections": [
+                {
+                    "queued": len(channel.queue),
+                    "pending_dropped": channel.dropped,
+                    "levels": sorted(channel.levels) if channel.levels else None
+                }
+                for channel in self.channels.values()
+            ]
+        }
@@ -9,8 +9,8 @@ py-picToWork 简化版后端
 # ==============================
 # 导入模块
 # ==============================
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, UploadFile, File, Form
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, UploadFile, File, Form, Body
+from fastapi.responses import HTMLResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 import cv2
@@ -18,15 +18,35 @@ import numpy as np
 import pyautogui
 import mss
 from PIL import Image
-from typing import List, Dict, Optional, Tuple, Any
+from typing import List, Dict, Optional, Set, Tuple, Any
 import asyncio
 import json
 from datetime import datetime
 import os
 import platform
+import time
 from dataclasses import dataclass
 import warnings
 
+from pyramid_matcher import VERIFY_METHOD, pyramid_match_template, score_map, window_score
+from fft_matcher import choose_engine, get_spectrum, match_template_fft
+from feature_matcher import ScreenFeatures, extract_template_features, locate_template
+from multi_instance import non_max_suppression, threshold_candidates
+from screen_capture import ScreenCaptureService
+from template_cache import template_registry
+from match_cascade import METHODS, MatchCascade
+from search_hints import PIXEL_KEYS, LocationHistory, crop_screenshots, normalize_region
+from parallel_matcher import map_screens, split_into_tiles
+from image_watcher import wait_for_image
+from task_executor import InputWorker, create_match_executor, run_in_executor
+from workflow_engine import WorkflowEngine, WorkflowError, WorkflowServices
+from prefetch import MatchPrefetcher
+from input_actions import InputController
+from latency_metrics import latency_metrics
+from debug_writer import debug_writer
+from log_broadcast import LOG_LEVELS, LogBroadcaster, parse_levels
+from ws_protocol import WebSocketSession
+
 # ==============================
 # 配置定义
 # ==============================
@@ -40,6 +60,7 @@ class AppConfig:
     
     # 路径配置
     UPLOAD_DIR: str = "backend/uploads"
+    UPLOAD_MAX_BYTES: int = 512 * 1024 * 1024  # 上传目录磁盘配额（字节），超出时按最近使用时间淘汰
     STATIC_DIR: str = "static"
     
     # 图像识别配置
@@ -47,14 +68,109 @@ class AppConfig:
     MIN_CONFIDENCE: float = 0.0
     MAX_CONFIDENCE: float = 1.0
     
+    # 搜索模式配置
+    DEFAULT_SEARCH_MODE: str = "full"  # full: 全分辨率搜索, pyramid: 金字塔由粗到精搜索, feature: ORB 特征点匹配
+    DEFAULT_COLOR_MODE: str = "bgr"  # gray / bgr / gray_verify，单通道匹配代价约为三通道的 1/3
+    PYRAMID_MAX_LEVEL: int = 2  # 最大降采样层数
+    PYRAMID_MIN_TEMPLATE_SIZE: int = 8  # 顶层模板最小边长（像素）
+    PYRAMID_CANDIDATES: int = 3  # 顶层保留的候选数量
+    PYRAMID_ROI_MARGIN: int = 4  # 精匹配 ROI 额外扩展像素
+    MATCH_ENGINE: str = "auto"  # spatial / fft / auto，全分辨率搜索使用的匹配引擎
+    FFT_MIN_TEMPLATE_AREA: int = 128 * 128  # auto 模式下改用频域相关的最小模板面积
+    
+    # 特征点匹配配置（search_mode=feature）
+    FEATURE_TEMPLATE_POINTS: int = 500  # 模板最多保留的关键点数量
+    FEATURE_SCREEN_POINTS: int = 5000  # 每个显示器最多提取的关键点数量
+    FEATURE_RATIO: float = 0.75  # 最近邻比值检验阈值
+    FEATURE_MIN_INLIERS: int = 8  # 单应性校验的最少内点数
+    FEATURE_RANSAC_THRESHOLD: float = 5.0  # RANSAC 重投影误差阈值（像素）
+    
+    # 多目标检测配置（查找全部实例）
+    FIND_ALL_METHOD: str = "TM_CCOEFF_NORMED"  # 生成相似度图使用的算法
+    FIND_ALL_MAX_RESULTS: int = 100  # 默认最多返回的实例数量
+    FIND_ALL_MAX_CANDIDATES: int = 5000  # 每个分块进入 NMS 的候选数量上限
+    FIND_ALL_IOU: float = 0.3  # NMS 的 IoU 阈值
+    
+    # 搜索区域配置
+    USE_LOCATION_HINT: bool = True  # 先在模板上次出现的位置附近搜索
+    LOCATION_HINT_MARGIN: int = 32  # 上次位置四周扩展的像素
+    LOCATION_HISTORY_DEPTH: int = 3  # 每个模板保留的历史位置数量
+    LOCATION_HINT_TOLERANCE: float = 0.03  # 历史位置附近的匹配度比记录时低出该值以上则视为其他目标，改为全屏搜索
+    
+    # 等待图片出现配置
+    WAIT_DEFAULT_TIMEOUT: float = 30.0  # 默认超时时间（秒）
+    WAIT_POLL_INTERVAL: float = 0.5  # 截图轮询间隔（秒）
+    WAIT_TILE_SIZE: int = 64  # 帧差分分块边长（像素）
+    WAIT_DIFF_THRESHOLD: int = 0  # 像素差超过该值才视为变化
+    WAIT_FULL_SCAN_RATIO: float = 0.5  # 变化区域总面积超过显示器面积的该比例时整屏匹配
+    
+    # 截图服务配置
+    MONITOR_LAYOUT_REFRESH: float = 5.0  # 显示器布局缓存刷新间隔（秒）
+    FRAME_POOL_SIZE: int = 4  # 每种帧尺寸缓存的缓冲区数量
+    
+    # 匹配算法级联配置
+    CASCADE_METHODS: Tuple[str, ...] = ("TM_CCOEFF_NORMED", "TM_SQDIFF_NORMED")  # TM_CCORR_NORMED 只记录不参与结果
+    CASCADE_ORDER_BY_COST: bool = True  # 按计算代价排序
+    CASCADE_EARLY_EXIT: bool = True  # 达到置信度目标后不再尝试后续算法
+    
+    # 模板缓存配置
+    TEMPLATE_CACHE_BYTES: int = 256 * 1024 * 1024  # 模板内存缓存上限（字节）
+    
+    # 执行器配置
+    MATCH_WORKERS: Optional[int] = None  # 匹配执行器最大工作数，None 为默认值
+    
+    # 并行匹配配置
+    PARALLEL_MATCHING: bool = True  # 多显示器/分块并行匹配
+    TILE_WORKERS: Optional[int] = None  # 分块工作池最大工作数
+    TILE_MIN_PIXELS: int = 1920 * 1080  # 单个分块的最小像素数
+    TILE_MAX_PER_MONITOR: int = 4  # 每个显示器最多切分的块数
+    
     # PyAutoGUI 配置
     PYAUTOGUI_PAUSE: float = 0.1
     PYAUTOGUI_FAILSAFE: bool = True
-    MOVE_DURATION: float = 0.5
+    MOVE_PROFILE: str = "eased"  # instant: 直接跳转, distance: 按距离匀速移动, eased: 按距离计时并缓入缓出
+    MOVE_SPEED: float = 3000.0  # 移动速度（像素/秒）
+    MOVE_DURATION: float = 0.5  # 移动时长上限（秒）
+    ARRIVAL_TOLERANCE: int = 1  # 光标到位的允许偏差（像素）
+    ARRIVAL_TIMEOUT: float = 0.5  # 等待光标到位的最长时间（秒）
+    ARRIVAL_POLL_INTERVAL: float = 0.005  # 光标位置轮询间隔（秒）
     CLICK_INTERVAL: float = 0.1
+    CLICK_VERIFY: bool = False  # 点击后确认点击位置附近的画面发生变化
+    CLICK_VERIFY_RADIUS: int = 64  # 点击校验区域的半边长（像素）
+    CLICK_VERIFY_TIMEOUT: float = 1.0  # 点击后等待界面变化的最长时间（秒）
+    CLICK_VERIFY_INTERVAL: float = 0.05  # 点击校验的截图间隔（秒）
+    
+    # 工作流配置
+    WORKFLOW_WORKERS: int = 1  # 同时运行的工作流数量（多个工作流会争用鼠标键盘）
+    WORKFLOW_HISTORY: int = 50  # 保留的已结束执行记录数量
+    WORKFLOW_SCREENSHOT_DIR: str = "backend/screenshots"  # screenshot 节点的保存根目录
+    WORKFLOW_PREFETCH: bool = True  # 输入动作执行期间预取下一步的匹配结果
+    PREFETCH_DIFF_THRESHOLD: int = 0  # 取用预取结果时判断画面变化的像素差阈值
+    
+    # 调试图片配置（后台写入，不占用点击路径）
+    DEBUG_DIR: str = "backend/debug"  # 调试图片输出目录
+    DEBUG_QUEUE_SIZE: int = 8  # 待写入队列长度，满时丢弃新的调试图片
+    DEBUG_CROP_MARGIN: int = 200  # 只保存匹配框四周该边距内的区域，0 表示保存整帧
+    DEBUG_MAX_WIDTH: int = 1280  # 保存整帧时缩放到的最大宽度
+    DEBUG_FORMAT: str = "png"  # png / jpg
+    DEBUG_PNG_COMPRESSION: int = 1  # PNG 压缩级别（0-9，越小越快）
+    DEBUG_JPEG_QUALITY: int = 85  # JPEG 质量
+    DEBUG_MAX_BYTES: int = 200 * 1024 * 1024  # 调试图片总大小上限（字节）
+    DEBUG_MAX_AGE: float = 3 * 24 * 3600  # 调试图片保存时长（秒）
+    
+    # 延迟统计配置
+    METRICS_ENABLED: bool = True  # 记录各阶段耗时（/api/metrics）
+    METRICS_WINDOW: int = 1024  # 每个阶段用于分位数的最近样本数量
     
     # WebSocket 配置
     WS_RECONNECT_DELAY: int = 5  # 重连延迟（秒）
+    WS_QUEUE_SIZE: int = 256  # 每个连接待发送日志的队列上限
+    WS_BATCH_INTERVAL: float = 0.05  # 日志合并发送间隔（秒）
+    WS_MAX_BATCH: int = 100  # 每帧最多合并的日志条数
+    WS_OVERFLOW: str = "drop_oldest"  # 队列满时: drop_oldest 丢弃最旧的, drop_new 丢弃新日志
+    WS_HEARTBEAT_INTERVAL: float = 15.0  # 服务端心跳间隔（秒），0 表示不发送
+    WS_HEARTBEAT_TIMEOUT: float = 0.0  # 超过该时间未收到客户端任何消息则断开（秒），0 表示不检查
+    WS_MAX_PENDING: int = 16  # 每个连接同时执行的命令数量上限
 
 # 初始化配置实例
 app_config = AppConfig()
@@ -65,6 +181,62 @@ IS_MACOS = SYSTEM == "Darwin"
 IS_WINDOWS = SYSTEM == "Windows"
 IS_LINUX = SYSTEM == "Linux"
 
+# 支持的搜索模式
+SEARCH_MODES = ("full", "pyramid", "feature")
+
+# 支持的颜色模式
+# gray: 单通道匹配, bgr: 三通道匹配, gray_verify: 单通道匹配后对最佳结果做彩色校验
+COLOR_MODES = ("gray", "bgr", "gray_verify")
+
+# 挂在截图字典上的帧级缓存（屏幕金字塔、频谱），同一帧内的多次匹配共用，不随结果返回
+FRAME_CACHE_KEYS = ("pyramid", "spectra", "features")
+
+# 常驻截图服务（所有截图和显示器查询共用一个截图器）
+capture_service = ScreenCaptureService(
+    layout_refresh_interval=app_config.MONITOR_LAYOUT_REFRESH,
+    pool_size=app_config.FRAME_POOL_SIZE
+)
+
+# 模板注册表（按内容哈希去重并缓存解码结果）
+template_registry.configure(
+    upload_dir=app_config.UPLOAD_DIR,
+    max_bytes=app_config.TEMPLATE_CACHE_BYTES,
+    disk_max_bytes=app_config.UPLOAD_MAX_BYTES
+)
+
+# 分阶段延迟统计
+latency_metrics.configure(enabled=app_config.METRICS_ENABLED, window=app_config.METRICS_WINDOW)
+
+# 调试图片后台写入器
+debug_writer.configure(
+    directory=app_config.DEBUG_DIR,
+    queue_size=app_config.DEBUG_QUEUE_SIZE,
+    crop_margin=app_config.DEBUG_CROP_MARGIN,
+    max_width=app_config.DEBUG_MAX_WIDTH,
+    image_format=app_config.DEBUG_FORMAT,
+    png_compression=app_config.DEBUG_PNG_COMPRESSION,
+    jpeg_quality=app_config.DEBUG_JPEG_QUALITY,
+    max_bytes=app_config.DEBUG_MAX_BYTES,
+    max_age=app_config.DEBUG_MAX_AGE
+)
+
+# 模板位置历史（用于“上次位置附近优先”搜索）
+location_history = LocationHistory(depth=app_config.LOCATION_HISTORY_DEPTH)
+
+# 匹配算法级联引擎（各阶段统计在进程内累计）
+match_cascade = MatchCascade(
+    app_config.CASCADE_METHODS,
+    order_by_cost=app_config.CASCADE_ORDER_BY_COST,
+    early_exit=app_config.CASCADE_EARLY_EXIT
+)
+
+# 图像匹配执行器和串行输入工作器（均在事件循环之外运行）
+match_executor = create_match_executor(app_config.MATCH_WORKERS)
+input_worker = InputWorker()
+
+# 分块匹配工作池（独立于匹配执行器，避免嵌套提交时互相等待）
+tile_executor = create_match_executor(app_config.TILE_WORKERS)
+
 # ==============================
 # 工具函数
 # ==============================
@@ -74,72 +246,27 @@ def ensure_dir(dir_path: str) -> None:
         os.makedirs(dir_path, exist_ok=True)
 
 def save_uploaded_file(file_content: bytes, file_ext: str = "png") -> str:
-    """保存上传的文件"""
+    """保存上传的文件（相同内容只保存一次，并预先解码进模板缓存）"""
     ensure_dir(app_config.UPLOAD_DIR)
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-    file_name = f"target_{timestamp}.{file_ext}"
-    file_path = os.path.join(app_config.UPLOAD_DIR, file_name)
-    
-    with open(file_path, "wb") as f:
-        f.write(file_content)
-    
+    _, file_path = template_registry.store(file_content, file_ext)
     return file_path
 
 def get_all_monitors() -> List[Dict]:
-    """获取所有显示器信息"""
-    with mss() as sct:
-        monitors = []
-        for i, monitor in enumerate(sct.monitors[1:], 1):  # 跳过第0个（全屏）
-            monitors.append({
-                "id": i,
-                "left": monitor["left"],
-                "top": monitor["top"],
-                "width": monitor["width"],
-                "height": monitor["height"],
-                "name": f"显示器 {i}",
-                "bounds": (
-                    monitor["left"], 
-                    monitor["top"], 
-                    monitor["left"] + monitor["width"], 
-                    monitor["top"] + monitor["height"]
-                )
-            })
-        return monitors
+    """获取所有显示器信息（使用截图服务缓存的布局）"""
+    return capture_service.get_monitors()
 
-def capture_screenshot(monitor_id: Optional[int] = None) -> List[Dict]:
+def capture_screenshot(monitor_id: Optional[int] = None, color: str = "bgr") -> List[Dict]:
     """
     截取屏幕
     :param monitor_id: None表示所有显示器，数字表示指定显示器
-    :return: 图片列表，包含图片数据和显示器信息
+    :param color: 帧格式，bgr 为三通道，gray 为直接从 BGRA 转换的单通道
+    :return: 图片列表，包含图片数据和显示器信息；用完后调用 release_screenshots 归还帧
     """
-    with mss() as sct:
-        screenshots = []
-        
-        if monitor_id is None:
-            # 截取所有显示器
-            target_monitors = sct.monitors[1:]
-        else:
-            # 截取指定显示器
-            if monitor_id < 1 or monitor_id >= len(sct.monitors):
-                monitor_id = 1  # 默认主显示器
-            target_monitors = [sct.monitors[monitor_id]]
-        
-        for i, monitor in enumerate(target_monitors, 1):
-            screenshot = sct.grab(monitor)
-            img = np.array(screenshot)
-            img = cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
-            
-            screenshots.append({
-                "monitor_id": i,
-                "image": img,
-                "offset_x": monitor["left"],
-                "offset_y": monitor["top"],
-                "width": monitor["width"],
-                "height": monitor["height"],
-                "monitor_info": monitor
-            })
-        
-        return screenshots
+    return capture_service.capture(monitor_id, color)
+
+def release_screenshots(screenshots: List[Dict]) -> None:
+    """归还截图帧到截图服务的缓冲池"""
+    capture_service.release(screenshots)
 
 def validate_coordinates(x: float, y: float, monitors: List[Dict]) -> Tuple[bool, Optional[Dict]]:
     """验证坐标是否在显示器范围内"""
@@ -164,11 +291,263 @@ def validate_image_file(filename: str, content_type: str) -> bool:
 # ==============================
 # 图像匹配模块（内置实现）
 # ==============================
+def screen_metadata(screen: Dict) -> Dict:
+    """截图字典去掉像素数据与帧缓存，只保留坐标相关字段"""
+    return {k: v for k, v in screen.items() if k not in PIXEL_KEYS and k not in FRAME_CACHE_KEYS}
+
+def compute_match_map(screen: Dict, screen_img: np.ndarray, template: np.ndarray, method: int) -> np.ndarray:
+    """
+    计算全分辨率匹配结果图（大模板使用频域相关，频谱按截图几何位置缓存，同一帧内共用）
+    :param screen: 截图或分块
+    :param screen_img: 已转换为与模板相同通道数的截图像素
+    """
+    if choose_engine(app_config.MATCH_ENGINE, template, method, app_config.FFT_MIN_TEMPLATE_AREA) == "fft":
+        height, width = screen_img.shape[:2]
+        spectrum_key = (screen.get("roi_x", 0), screen.get("roi_y", 0), width, height, screen_img.ndim)
+        spectrum = get_spectrum(screen_img, screen.setdefault("spectra", {}), spectrum_key)
+        return match_template_fft(screen_img, template, method, spectrum)
+    return cv2.matchTemplate(screen_img, template, method)
+
+def match_screen(
+    screen: Dict,
+    template: np.ndarray,
+    confidence: float,
+    search_mode: str = "full"
+) -> Dict:
+    """
+    在单个显示器（或显示器分块）上执行级联匹配
+    :param screen: 截图或分块
+    :param template: 模板图片
+    :param confidence: 置信度阈值
+    :param search_mode: 搜索模式（full/pyramid）
+    :return: 匹配结果，包含 confidence/top_left/method/resolved_stage/stages
+    """
+    screen_img = screen["image"]
+    template_height, template_width = template.shape[:2]
+    screen_height, screen_width = screen_img.shape[:2]
+    
+    # 单通道模板配三通道截图时先转换截图
+    screen_pyramid = None
+    if template.ndim == 2 and screen_img.ndim == 3:
+        screen_img = cv2.cvtColor(screen_img, cv2.COLOR_BGR2GRAY)
+    elif search_mode == "pyramid":
+        # 屏幕金字塔挂在截图字典上，级联各阶段与批量匹配的多个模板共用
+        screen_pyramid = screen.get("pyramid")
+        if not screen_pyramid or screen_pyramid[0] is not screen_img:
+            screen_pyramid = screen["pyramid"] = [screen_img]
+    
+    # 如果模板比屏幕大，跳过
+    if template_width > screen_width or template_height > screen_height:
+        return {
+            "screen": screen_metadata(screen),
+            "confidence": 0.0,
+            "top_left": None,
+            "method": None,
+            "resolved_stage": None,
+            "stages": [],
+            "message": "模板尺寸大于屏幕尺寸"
+        }
+    
+    def match_fn(method: int) -> Tuple[float, Optional[Tuple[int, int]]]:
+        """在当前显示器上执行单个算法的全分辨率匹配"""
+        result = compute_match_map(screen, screen_img, template, method)
+        min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
+        
+        # 根据方法类型获取匹配值
+        if method in [cv2.TM_SQDIFF, cv2.TM_SQDIFF_NORMED]:
+            # 平方差方法，值越小越好
+            return 1 - min_val, min_loc  # 转换为相似度（1为最佳）
+        # 其他方法，值越大越好
+        return max_val, max_loc
+    
+    def pyramid_match_fn(method: int) -> Tuple[float, Optional[Tuple[int, int]]]:
+        """金字塔搜索：降采样粗定位 + 候选 ROI 内全分辨率精匹配"""
+        current_confidence, top_left, _ = pyramid_match_template(
+            screen_img,
+            template,
+            method,
+            max_level=app_config.PYRAMID_MAX_LEVEL,
+            min_template_size=app_config.PYRAMID_MIN_TEMPLATE_SIZE,
+            candidates=app_config.PYRAMID_CANDIDATES,
+            roi_margin=app_config.PYRAMID_ROI_MARGIN,
+            screen_pyramid=screen_pyramid
+        )
+        return current_confidence, top_left
+    
+    def verify_fn(top_left: Tuple[int, int]) -> float:
+        """复核平方差结果：该位置窗口的相关系数"""
+        return window_score(screen_img, template, top_left, VERIFY_METHOD)
+    
+    # 按代价依次尝试各算法，达到置信度目标即停止；两种搜索模式使用同一套复核规则
+    if search_mode == "pyramid":
+        cascade_result = match_cascade.run(pyramid_match_fn, confidence, verify_fn)
+        if cascade_result["resolved_stage"] is None:
+            # 真正的峰值可能不在粗匹配候选中（或目标不存在），整个屏幕只退回一次全分辨率级联
+            pyramid_stages = cascade_result["stages"]
+            cascade_result = match_cascade.run(match_fn, confidence, verify_fn)
+            cascade_result["pyramid_stages"] = pyramid_stages
+            cascade_result["pyramid_fallback"] = True
+    else:
+        cascade_result = match_cascade.run(match_fn, confidence, verify_fn)
+    # 结果只带回坐标相关字段，不回传像素数据
+    cascade_result["screen"] = screen_metadata(screen)
+    return cascade_result
+
+def verify_color_match(screen: Dict, top_left: Tuple[int, int], template_bgr: np.ndarray) -> float:
+    """
+    在彩色空间校验单通道匹配结果
+    :param screen: 最佳匹配所在的截图或分块（带 raw_bgra 或三通道 image）
+    :param top_left: 截图内的匹配左上角
+    :param template_bgr: 三通道模板
+    :return: 彩色相似度（1为最佳）
+    """
+    template_height, template_width = template_bgr.shape[:2]
+    x, y = top_left
+    if screen.get("raw_bgra") is not None:
+        roi = cv2.cvtColor(screen["raw_bgra"][y:y + template_height, x:x + template_width], cv2.COLOR_BGRA2BGR)
+    elif screen["image"].ndim == 3:
+        roi = screen["image"][y:y + template_height, x:x + template_width]
+    else:
+        # 没有彩色数据可用时无法校验，视为通过
+        return 1.0
+    result = cv2.matchTemplate(roi, template_bgr, cv2.TM_SQDIFF_NORMED)
+    return float(1 - result[0, 0])
+
+def screen_features(screen: Dict) -> ScreenFeatures:
+    """获取截图的特征点（按截图几何位置缓存在截图字典上，同一帧内共用）"""
+    cache = screen.setdefault("features", {})
+    key = (screen.get("roi_x", 0), screen.get("roi_y", 0), screen["width"], screen["height"])
+    features = cache.get(key)
+    if features is None:
+        gray = screen["image"]
+        if gray.ndim == 3:
+            gray = cv2.cvtColor(gray, cv2.COLOR_BGR2GRAY)
+        features = cache[key] = ScreenFeatures(gray, app_config.FEATURE_SCREEN_POINTS)
+    return features
+
+def verify_color_box(screen: Dict, box: Tuple[int, int, int, int], template_bgr: np.ndarray) -> float:
+    """
+    在彩色空间校验特征点匹配结果：模板缩放到匹配框大小后比较截图内的部分
+    :param box: 截图内的匹配框 (x, y, 宽, 高)，可以部分超出截图
+    :return: 彩色相似度（1为最佳），匹配框完全在截图外时为 0
+    """
+    left, top, width, height = box
+    screen_height, screen_width = screen["image"].shape[:2]
+    x0, y0 = max(0, left), max(0, top)
+    x1, y1 = min(screen_width, left + width), min(screen_height, top + height)
+    if x1 <= x0 or y1 <= y0:
+        return 0.0
+    scaled = cv2.resize(template_bgr, (width, height), interpolation=cv2.INTER_AREA)
+    return verify_color_match(screen, (x0, y0), scaled[y0 - top:y1 - top, x0 - left:x1 - left])
+
+def find_image_by_features(
+    screenshots: List[Dict],
+    cached_template: Any,
+    confidence: float,
+    enable_debug: bool = False,
+    color_mode: str = "bgr",
+    timings: Optional[Dict[str, float]] = None
+) -> Tuple[bool, Optional[Dict], float, Dict]:
+    """
+    特征点匹配实现（不受尺度限制）
+    置信度为单应性内点占比较检验后匹配对的比例，且内点数不少于 FEATURE_MIN_INLIERS
+    :param screenshots: 屏幕截图列表
+    :param cached_template: 模板注册表中的模板
+    :param confidence: 置信度阈值
+    :param enable_debug: 是否启用调试模式
+    :param color_mode: 颜色模式，gray_verify 时对最佳结果做彩色校验（特征点始终在灰度图上提取）
+    :param timings: 可选的阶段耗时字典（毫秒）
+    :return: (是否找到, 位置信息, 最佳匹配度, 匹配详情)，位置信息格式与模板匹配相同
+    """
+    template_features = cached_template.variant(
+        ("orb", app_config.FEATURE_TEMPLATE_POINTS),
+        lambda img: extract_template_features(cached_template.gray, app_config.FEATURE_TEMPLATE_POINTS)
+    )
+    
+    best_confidence = 0.0
+    best_location = None
+    best_source = None
+    best_box = None
+    monitor_results = []
+    for screen in screenshots:
+        features = screen_features(screen)
+        located = locate_template(
+            template_features,
+            features,
+            ratio=app_config.FEATURE_RATIO,
+            min_inliers=app_config.FEATURE_MIN_INLIERS,
+            reproj_threshold=app_config.FEATURE_RANSAC_THRESHOLD
+        )
+        monitor_results.append({
+            "monitor_id": screen["monitor_id"],
+            "best_confidence": located["confidence"],
+            "inliers": located["inliers"],
+            "matches": located["matches"],
+            "screen_points": len(features.points)
+        })
+        if located["bbox"] is None or located["confidence"] <= best_confidence:
+            continue
+        
+        best_confidence = located["confidence"]
+        best_source = screen
+        best_box = located["bbox"]
+        left, top, width, height = located["bbox"]
+        center_x, center_y = np.mean(located["corners"], axis=0)
+        best_location = {
+            "x": int(screen["offset_x"] + round(center_x)),
+            "y": int(screen["offset_y"] + round(center_y)),
+            "local_x": screen.get("roi_x", 0) + left,
+            "local_y": screen.get("roi_y", 0) + top,
+            "width": width,
+            "height": height,
+            "top_left": (screen["offset_x"] + left, screen["offset_y"] + top),
+            "monitor_id": screen["monitor_id"],
+            "monitor_name": f"显示器 {screen['monitor_id']}",
+            "scale": round(float(np.sqrt(width * height / (template_features.width * template_features.height))), 3)
+        }
+    
+    found = best_location is not None and best_confidence >= confidence
+    
+    # 与模板匹配相同：灰度结果在彩色空间复核，未通过时不返回位置
+    color_score = None
+    if color_mode == "gray_verify" and found:
+        with latency_metrics.stage("color_verify", timings):
+            color_score = verify_color_box(best_source, best_box, cached_template.image)
+        if color_score < confidence:
+            found = False
+            best_location = None
+    
+    debug_image = None
+    if enable_debug and found:
+        with latency_metrics.stage("debug_submit", timings):
+            debug_image = debug_writer.submit(
+                best_source["image"], best_box, f"Monitor {best_source['monitor_id']}: {best_confidence:.2%}"
+            )
+    
+    match_info = {
+        "template_size": (template_features.width, template_features.height),
+        "template_points": len(template_features.points),
+        "methods_tried": [{"method": "ORB", "confidence": best_confidence}],
+        "best_method": "ORB" if best_location is not None else None,
+        "monitor_results": monitor_results,
+        "search_mode": "feature",
+        "color_mode": color_mode,
+        "color_verification": color_score,
+        "debug": enable_debug,
+        "debug_image": debug_image
+    }
+    return found, best_location, best_confidence, match_info
+
 def find_image_on_screen_multi_monitor(
     screenshots: List[Dict],
     template_path: str,
     confidence: float = 0.8,
-    enable_debug: bool = False
+    enable_debug: bool = False,
+    search_mode: str = "full",
+    parallel: bool = app_config.PARALLEL_MATCHING,
+    color_mode: str = "bgr",
+    tile_cache: Optional[Dict[int, List[Dict]]] = None,
+    timings: Optional[Dict[str, float]] = None
 ) -> Tuple[bool, Optional[Dict], float, Dict]:
     """
     多显示器图像匹配实现
@@ -176,12 +555,27 @@ def find_image_on_screen_multi_monitor(
     :param template_path: 模板图片路径
     :param confidence: 置信度阈值
     :param enable_debug: 是否启用调试模式
+    :param search_mode: 搜索模式，full 为全分辨率搜索，pyramid 为金字塔由粗到精搜索，feature 为 ORB 特征点匹配
+    :param parallel: 是否将显示器及大显示器分块分发到工作池并行匹配
+    :param color_mode: 颜色模式（gray/bgr/gray_verify）
+    :param tile_cache: 可选的分块缓存（模板高度 -> 分块列表），批量匹配时同高度模板共用分块
+    :param timings: 可选的阶段耗时字典（毫秒），多次调用共用时耗时累加
     :return: (是否找到, 位置信息, 最佳匹配度, 匹配详情)
     """
-    # 读取模板图片
-    template = cv2.imread(template_path)
-    if template is None:
-        raise ValueError(f"无法读取模板图片: {template_path}")
+    if timings is None:
+        timings = {}
+    
+    # 读取模板图片（命中缓存时跳过读盘和解码）
+    with latency_metrics.stage("template", timings):
+        cached_template = template_registry.load(template_path)
+        if cached_template is None:
+            raise ValueError(f"无法读取模板图片: {template_path}")
+        template = cached_template.image if color_mode == "bgr" else cached_template.gray
+    if search_mode == "feature":
+        with latency_metrics.stage("feature_match", timings):
+            result = find_image_by_features(screenshots, cached_template, confidence, enable_debug, color_mode, timings)
+        result[3]["timings"] = timings
+        return result
     
     template_height, template_width = template.shape[:2]
     template_size = (template_width, template_height)
@@ -189,76 +583,74 @@ def find_image_on_screen_multi_monitor(
     best_confidence = 0.0
     best_location = None
     best_monitor_id = 1
+    best_source = None
+    best_local_loc = None
+    best_method = None
     method_results = []
     monitor_results = []
     
-    # 定义要尝试的匹配算法
-    match_methods = [
-        (cv2.TM_CCOEFF_NORMED, "TM_CCOEFF_NORMED"),
-        (cv2.TM_CCORR_NORMED, "TM_CCORR_NORMED"),
-        (cv2.TM_SQDIFF_NORMED, "TM_SQDIFF_NORMED")
-    ]
+    # 并行模式下大显示器切分为带重叠的水平分块
+    if parallel:
+        work = tile_cache.get(template_height) if tile_cache is not None else None
+        if work is None:
+            work = split_into_tiles(
+                screenshots,
+                template_height,
+                app_config.TILE_MIN_PIXELS,
+                app_config.TILE_MAX_PER_MONITOR
+            )
+            if tile_cache is not None:
+                tile_cache[template_height] = work
+    else:
+        work = screenshots
+    with latency_metrics.stage("match", timings):
+        tile_results = map_screens(
+            tile_executor if parallel else None,
+            match_screen,
+            work, template, confidence, search_mode
+        )
     
-    for screen in screenshots:
-        screen_img = screen["image"]
-        screen_height, screen_width = screen_img.shape[:2]
-        monitor_id = screen["monitor_id"]
+    # 合并分块结果：每个显示器保留最佳分块
+    merged: Dict[int, Dict] = {}
+    for source, tile_result in zip(work, tile_results):
+        tile_result["source"] = source
+        monitor_id = tile_result["screen"]["monitor_id"]
+        for stage in tile_result["stages"]:
+            if "error" in stage and not enable_debug:
+                continue
+            method_results.append({**stage, "monitor_id": monitor_id})
         
-        # 如果模板比屏幕大，跳过
-        if template_width > screen_width or template_height > screen_height:
+        current = merged.get(monitor_id)
+        if current is None:
+            merged[monitor_id] = {**tile_result, "tiles": 1}
+            continue
+        current["tiles"] += 1
+        if tile_result["top_left"] is not None and (
+            current["top_left"] is None or tile_result["confidence"] > current["confidence"]
+        ):
+            merged[monitor_id] = {**tile_result, "tiles": current["tiles"]}
+    
+    for monitor_id, monitor_result in merged.items():
+        screen = monitor_result["screen"]
+        monitor_best_confidence = monitor_result["confidence"]
+        monitor_best_loc = monitor_result["top_left"]
+        
+        if monitor_result.get("message"):
             if enable_debug:
                 monitor_results.append({
                     "monitor_id": monitor_id,
                     "best_confidence": 0.0,
-                    "message": "模板尺寸大于屏幕尺寸"
+                    "message": monitor_result["message"]
                 })
             continue
         
-        monitor_best_confidence = 0.0
-        monitor_best_loc = None
-        monitor_best_method = None
-        
-        for method, method_name in match_methods:
-            try:
-                # 执行模板匹配
-                result = cv2.matchTemplate(screen_img, template, method)
-                
-                # 根据方法类型获取匹配值
-                if method in [cv2.TM_SQDIFF, cv2.TM_SQDIFF_NORMED]:
-                    # 平方差方法，值越小越好
-                    min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
-                    current_confidence = 1 - min_val  # 转换为相似度（1为最佳）
-                    top_left = min_loc
-                else:
-                    # 其他方法，值越大越好
-                    min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
-                    current_confidence = max_val
-                    top_left = max_loc
-                
-                method_results.append({
-                    "method": method_name,
-                    "confidence": current_confidence,
-                    "monitor_id": monitor_id
-                })
-                
-                # 更新当前显示器的最佳匹配
-                if current_confidence > monitor_best_confidence:
-                    monitor_best_confidence = current_confidence
-                    monitor_best_loc = top_left
-                    monitor_best_method = method_name
-                
-            except Exception as e:
-                if enable_debug:
-                    method_results.append({
-                        "method": method_name,
-                        "confidence": 0.0,
-                        "error": str(e)
-                    })
-        
         # 更新全局最佳匹配
-        if monitor_best_confidence > best_confidence and monitor_best_confidence > best_confidence:
+        if monitor_best_loc is not None and monitor_best_confidence > best_confidence:
             best_confidence = monitor_best_confidence
             best_monitor_id = monitor_id
+            best_source = monitor_result["source"]
+            best_local_loc = monitor_best_loc
+            best_method = monitor_result["method"]
             
             # 计算中心点坐标（全局坐标）
             center_x = screen["offset_x"] + monitor_best_loc[0] + template_width // 2
@@ -267,8 +659,8 @@ def find_image_on_screen_multi_monitor(
             best_location = {
                 "x": center_x,
                 "y": center_y,
-                "local_x": monitor_best_loc[0],
-                "local_y": monitor_best_loc[1],
+                "local_x": screen.get("roi_x", 0) + monitor_best_loc[0],
+                "local_y": screen.get("roi_y", 0) + monitor_best_loc[1],
                 "width": template_width,
                 "height": template_height,
                 "top_left": (screen["offset_x"] + monitor_best_loc[0], screen["offset_y"] + monitor_best_loc[1]),
@@ -279,21 +671,47 @@ def find_image_on_screen_multi_monitor(
         monitor_results.append({
             "monitor_id": monitor_id,
             "best_confidence": monitor_best_confidence,
-            "best_method": monitor_best_method
+            "best_method": monitor_result["method"],
+            "resolved_stage": monitor_result["resolved_stage"],
+            "tiles": monitor_result["tiles"]
         })
     
     # 确定最终结果
     found = best_confidence >= confidence
     
+    # 单通道匹配后对最佳结果做彩色校验（只转换匹配区域）
+    color_score = None
+    if color_mode == "gray_verify" and found:
+        with latency_metrics.stage("color_verify", timings):
+            color_score = verify_color_match(best_source, best_local_loc, cached_template.image)
+        if color_score < confidence:
+            found = False
+            best_location = None
+    
+    # 调试模式：交给后台写入器标注并保存最佳匹配（队列满时丢弃）
+    debug_image = None
+    if enable_debug and found:
+        with latency_metrics.stage("debug_submit", timings):
+            debug_image = debug_writer.submit(
+                best_source["image"],
+                (int(best_local_loc[0]), int(best_local_loc[1]), template_width, template_height),
+                f"Monitor {best_monitor_id}: {best_confidence:.2%}"
+            )
+    
     match_info = {
         "template_size": template_size,
         "methods_tried": method_results,
-        "best_method": next(
-            (m["method"] for m in method_results if m["confidence"] == best_confidence),
-            None
-        ),
+        "best_method": best_method,
         "monitor_results": monitor_results,
-        "debug": enable_debug
+        "search_mode": search_mode,
+        "cascade_order": match_cascade.methods,
+        "match_engine": app_config.MATCH_ENGINE,
+        "parallel": parallel,
+        "color_mode": color_mode,
+        "color_verification": color_score,
+        "timings": timings,
+        "debug": enable_debug,
+        "debug_image": debug_image
     }
     
     return found, best_location, best_confidence, match_info
@@ -302,43 +720,52 @@ def find_image_on_screen_multi_monitor(
 # WebSocket 连接管理
 # ==============================
 class ConnectionManager:
-    def __init__(self):
+    """
+    WebSocket 连接管理
+    日志只放入各连接的有界队列，由各连接的发送任务合并发送，调用方不等待网络
+    """
+
+    def __init__(self, broadcaster: LogBroadcaster):
         self.active_connections: List[WebSocket] = []
+        self.broadcaster = broadcaster
 
-    async def connect(self, websocket: WebSocket):
-        """建立WebSocket连接"""
+    async def connect(self, websocket: WebSocket, levels: Optional[Set[str]] = None):
+        """
+        建立WebSocket连接
+        :param levels: 订阅的日志级别，None 表示全部
+        """
         await websocket.accept()
         self.active_connections.append(websocket)
-        await self.send_log(websocket, "info", "WebSocket 连接成功")
+        self.broadcaster.register(websocket, levels)
+        self.send_log(websocket, "info", "WebSocket 连接成功")
 
     def disconnect(self, websocket: WebSocket):
         """断开WebSocket连接"""
         if websocket in self.active_connections:
             self.active_connections.remove(websocket)
+        self.broadcaster.unregister(websocket)
 
-    async def send_log(
+    def send_log(
         self, 
         websocket: WebSocket, 
         level: str, 
         message: str, 
         data: Optional[Dict] = None
     ):
-        """发送日志到前端"""
-        log_data = {
-            "type": "log",
-            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "level": level,
-            "message": message,
-            "data": data or {}
-        }
-        try:
-            await websocket.send_json(log_data)
-        except Exception:
-            # 忽略发送失败的情况
-            pass
+        """发送日志到单个连接"""
+        self.broadcaster.send_to(websocket, LogBroadcaster.make_log(level, message, data))
+
+    def broadcast(self, level: str, message: str, data: Optional[Dict] = None):
+        """发送日志到所有订阅了该级别的连接"""
+        self.broadcaster.publish(level, message, data)
 
 # 初始化WebSocket管理器
-ws_manager = ConnectionManager()
+ws_manager = ConnectionManager(LogBroadcaster(
+    max_queue=app_config.WS_QUEUE_SIZE,
+    batch_interval=app_config.WS_BATCH_INTERVAL,
+    max_batch=app_config.WS_MAX_BATCH,
+    overflow=app_config.WS_OVERFLOW
+))
 
 # ==============================
 # PyAutoGUI 初始化配置
@@ -365,6 +792,35 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 事件循环（工作线程通过它向 WebSocket 推送日志）
+event_loop: Optional[asyncio.AbstractEventLoop] = None
+
+@app.on_event("startup")
+async def remember_event_loop():
+    """记录服务的事件循环"""
+    global event_loop
+    event_loop = asyncio.get_running_loop()
+
+@app.on_event("startup")
+async def adopt_legacy_uploads():
+    """
+    早期按时间戳命名的上传文件按内容纳入索引（重复副本删除）
+    会改名和删除文件，只在服务启动时执行，导入模块时不做
+    """
+    template_registry.uploads.adopt_untracked()
+
+@app.on_event("shutdown")
+async def shutdown_services():
+    """服务关闭时释放截图器和执行器"""
+    workflow_engine.stop_all()
+    workflow_executor.shutdown(wait=False)
+    input_worker.shutdown(wait=False)
+    match_executor.shutdown(wait=False)
+    tile_executor.shutdown(wait=False)
+    debug_writer.shutdown()
+    template_registry.uploads.flush()
+    capture_service.close()
+
 # ==============================
 # 图像识别包装函数
 # ==============================
@@ -372,7 +828,12 @@ def find_image_on_screen(
     template_path: str,
     confidence: float = 0.8,
     enable_debug: bool = False,
-    monitor_id: Optional[int] = None
+    monitor_id: Optional[int] = None,
+    search_mode: str = app_config.DEFAULT_SEARCH_MODE,
+    region: Optional[Dict] = None,
+    use_location_hint: bool = app_config.USE_LOCATION_HINT,
+    color_mode: str = app_config.DEFAULT_COLOR_MODE,
+    screenshots: Optional[List[Dict]] = None
 ) -> Tuple[bool, Optional[Dict], float, Dict]:
     """
     图像识别包装函数 - 支持多尺度、多算法和多显示器匹配
@@ -380,13 +841,441 @@ def find_image_on_screen(
     :param confidence: 置信度阈值
     :param enable_debug: 是否启用调试模式
     :param monitor_id: 监控器ID，None表示所有
+    :param search_mode: 搜索模式（full/pyramid/feature）
+    :param region: 搜索区域 {"x", "y", "width", "height"}（全局坐标），None 表示全屏
+    :param use_location_hint: 是否先在该模板上次出现的位置附近搜索
+    :param color_mode: 颜色模式（gray/bgr/gray_verify）
+    :param screenshots: 调用方已截取的截图（由调用方负责归还），None 时自行截图
+    :return: (是否找到, 位置信息, 匹配置信度, 匹配详情)
+    """
+    region = normalize_region(region)
+    timings: Dict[str, float] = {}
+    start = time.perf_counter()
+    
+    # 截取屏幕（单个或所有显示器），单通道模式直接截取灰度帧
+    owns_screenshots = screenshots is None
+    if owns_screenshots:
+        with latency_metrics.stage("capture", timings):
+            screenshots = capture_screenshot(monitor_id, "bgr" if color_mode == "bgr" else "gray")
+    
+    try:
+        # 每次查找记录一次模板使用（内部的多次匹配不重复记录）
+        cached_template = template_registry.load(template_path, record_use=True)
+        template_id = cached_template.template_id if cached_template and use_location_hint else None
+        
+        result = None
+        if region is not None:
+            # 显式搜索区域：只在区域内匹配
+            result = find_image_on_screen_multi_monitor(
+                crop_screenshots(screenshots, region), template_path, confidence, enable_debug, search_mode,
+                color_mode=color_mode, timings=timings
+            )
+            result[3]["search_region"] = region
+        else:
+            # 先在上次出现位置附近的小区域内匹配
+            # 附近的匹配度必须接近记录时的匹配度：目标移走后，历史位置附近的相似元素
+            # 也可能超过阈值，此时应全屏搜索真正的目标
+            if template_id:
+                for hint, recorded_confidence in location_history.hint_regions(
+                    template_id, app_config.LOCATION_HINT_MARGIN
+                ):
+                    hinted = find_image_on_screen_multi_monitor(
+                        crop_screenshots(screenshots, hint), template_path, confidence, enable_debug, search_mode,
+                        color_mode=color_mode, timings=timings
+                    )
+                    if hinted[0] and hinted[2] >= recorded_confidence - app_config.LOCATION_HINT_TOLERANCE:
+                        hinted[3]["search_region"] = hint
+                        hinted[3]["search_hint"] = "last_location"
+                        result = hinted
+                        break
+                if result is None:
+                    # 历史位置已失效，全屏结果会重新记录
+                    location_history.forget(template_id)
+            
+            # 回退到全屏搜索
+            if result is None:
+                result = find_image_on_screen_multi_monitor(
+                    screenshots, template_path, confidence, enable_debug, search_mode,
+                    color_mode=color_mode, timings=timings
+                )
+                result[3]["search_hint"] = "full_screen"
+        
+        if result[0] and template_id:
+            location_history.record(template_id, result[1], result[2])
+        return result
+    finally:
+        if owns_screenshots:
+            release_screenshots(screenshots)
+        latency_metrics.observe("find_total", time.perf_counter() - start, timings)
+
+def wait_for_image_on_screen(
+    template_path: str,
+    confidence: float = 0.8,
+    timeout: float = app_config.WAIT_DEFAULT_TIMEOUT,
+    interval: float = app_config.WAIT_POLL_INTERVAL,
+    monitor_id: Optional[int] = None,
+    search_mode: str = app_config.DEFAULT_SEARCH_MODE,
+    color_mode: str = app_config.DEFAULT_COLOR_MODE,
+    cancel_event: Optional[Any] = None
+) -> Tuple[bool, Optional[Dict], float, Dict]:
+    """
+    等待图片出现 - 按间隔截图，只在发生变化且能容纳模板的区域内重新匹配
+    :param template_path: 模板图片路径
+    :param confidence: 置信度阈值
+    :param timeout: 超时时间（秒）
+    :param interval: 轮询间隔（秒）
+    :param monitor_id: 监控器ID，None表示所有
+    :param search_mode: 搜索模式（full/pyramid/feature）
+    :param color_mode: 颜色模式（gray/bgr/gray_verify）
+    :param cancel_event: 可选的 threading.Event，置位后停止等待
     :return: (是否找到, 位置信息, 匹配置信度, 匹配详情)
     """
-    # 截取屏幕（单个或所有显示器）
-    screenshots = capture_screenshot(monitor_id)
+    cached_template = template_registry.load(template_path, record_use=True)
+    if cached_template is None:
+        raise ValueError(f"无法读取模板图片: {template_path}")
+    template_height, template_width = cached_template.image.shape[:2]
+    capture_color = "bgr" if color_mode == "bgr" else "gray"
+    
+    def match_fn(screenshots: List[Dict]) -> Tuple[bool, Optional[Dict], float, Dict]:
+        return find_image_on_screen_multi_monitor(
+            screenshots, template_path, confidence, False, search_mode,
+            color_mode=color_mode
+        )
+    
+    found, location, match_confidence, match_info = wait_for_image(
+        lambda: capture_screenshot(monitor_id, capture_color),
+        release_screenshots,
+        match_fn,
+        (template_width, template_height),
+        timeout=timeout,
+        interval=interval,
+        tile_size=app_config.WAIT_TILE_SIZE,
+        threshold=app_config.WAIT_DIFF_THRESHOLD,
+        cancel_event=cancel_event,
+        full_ratio=app_config.WAIT_FULL_SCAN_RATIO
+    )
+    if found and location:
+        location_history.record(cached_template.template_id, location, match_confidence)
+    return found, location, match_confidence, match_info
+
+def find_images_on_screen_batch(
+    templates: List[str],
+    confidence: float = 0.8,
+    enable_debug: bool = False,
+    monitor_id: Optional[int] = None,
+    search_mode: str = app_config.DEFAULT_SEARCH_MODE,
+    color_mode: str = app_config.DEFAULT_COLOR_MODE
+) -> List[Dict]:
+    """
+    批量查找多个模板 - 只截图一次，所有模板共用截图、分块和屏幕金字塔
+    :param templates: 模板路径或模板 ID 列表
+    :param confidence: 置信度阈值
+    :param enable_debug: 是否启用调试模式
+    :param monitor_id: 监控器ID，None表示所有
+    :param search_mode: 搜索模式（full/pyramid/feature）
+    :param color_mode: 颜色模式（gray/bgr/gray_verify）
+    :return: 与 templates 顺序一致的结果列表，每项包含 template/template_id/found/location/confidence
+    """
+    results: List[Optional[Dict]] = [None] * len(templates)
+    loaded = []
+    for index, template in enumerate(templates):
+        cached_template = template_registry.load(template, record_use=True)
+        if cached_template is None:
+            results[index] = {"template": template, "found": False, "error": f"无法读取模板图片: {template}"}
+        else:
+            loaded.append((index, template, cached_template))
+    if not loaded:
+        return results
     
-    # 调用图像匹配模块
-    return find_image_on_screen_multi_monitor(screenshots, template_path, confidence, enable_debug)
+    # 按模板尺寸分组处理，同高度模板连续复用同一组分块
+    loaded.sort(key=lambda item: item[2].image.shape[:2])
+    
+    screenshots = capture_screenshot(monitor_id, "bgr" if color_mode == "bgr" else "gray")
+    try:
+        # 预先挂上屏幕金字塔和频谱缓存，未切分的显示器（及同位置的分块）由所有模板共用
+        for screen in screenshots:
+            screen["pyramid"] = [screen["image"]]
+            screen["spectra"] = {}
+            screen["features"] = {}
+        tile_cache: Dict[int, List[Dict]] = {}
+        
+        for index, template, cached_template in loaded:
+            try:
+                found, location, match_confidence, match_info = find_image_on_screen_multi_monitor(
+                    screenshots, template, confidence, enable_debug, search_mode,
+                    color_mode=color_mode, tile_cache=tile_cache
+                )
+            except Exception as e:
+                results[index] = {
+                    "template": template,
+                    "template_id": cached_template.template_id,
+                    "found": False,
+                    "error": str(e)
+                }
+                continue
+            if found and location:
+                location_history.record(cached_template.template_id, location, match_confidence)
+            results[index] = {
+                "template": template,
+                "template_id": cached_template.template_id,
+                "found": found,
+                "location": location,
+                "confidence": match_confidence,
+                "best_method": match_info.get("best_method"),
+                "template_size": match_info.get("template_size")
+            }
+        return results
+    finally:
+        release_screenshots(screenshots)
+
+def score_instances(screen: Dict, template: np.ndarray, method: int, threshold: float) -> Dict:
+    """
+    在单个显示器（或分块）上计算相似度图并提取超过阈值的候选位置
+    :return: {"points": 截图内左上角 (N, 2), "scores": (N,)}
+    """
+    screen_img = screen["image"]
+    if template.ndim == 2 and screen_img.ndim == 3:
+        screen_img = cv2.cvtColor(screen_img, cv2.COLOR_BGR2GRAY)
+    if template.shape[0] > screen_img.shape[0] or template.shape[1] > screen_img.shape[1]:
+        return {"points": np.zeros((0, 2), np.int64), "scores": np.zeros(0, np.float32)}
+    scores = score_map(compute_match_map(screen, screen_img, template, method), method)
+    points, values = threshold_candidates(scores, threshold, app_config.FIND_ALL_MAX_CANDIDATES)
+    return {"points": points, "scores": values}
+
+def find_all_instances_on_screen(
+    template_path: str,
+    confidence: float = 0.8,
+    max_results: int = app_config.FIND_ALL_MAX_RESULTS,
+    monitor_id: Optional[int] = None,
+    region: Optional[Dict] = None,
+    color_mode: str = app_config.DEFAULT_COLOR_MODE
+) -> Tuple[List[Dict], Dict]:
+    """
+    查找模板在屏幕上的全部实例
+    :param template_path: 模板图片路径或模板 ID
+    :param confidence: 置信度阈值
+    :param max_results: 最多返回的实例数量
+    :param monitor_id: 监控器ID，None表示所有
+    :param region: 搜索区域 {"x", "y", "width", "height"}（全局坐标），None 表示全屏
+    :param color_mode: 颜色模式（gray/bgr/gray_verify）
+    :return: (按置信度降序的实例列表, 匹配详情)，实例的坐标字段与单目标匹配的位置信息相同
+    """
+    region = normalize_region(region)
+    cached_template = template_registry.load(template_path, record_use=True)
+    if cached_template is None:
+        raise ValueError(f"无法读取模板图片: {template_path}")
+    template = cached_template.image if color_mode == "bgr" else cached_template.gray
+    template_height, template_width = template.shape[:2]
+    method = METHODS[app_config.FIND_ALL_METHOD]
+    
+    screenshots = capture_screenshot(monitor_id, "bgr" if color_mode == "bgr" else "gray")
+    try:
+        screens = crop_screenshots(screenshots, region) if region is not None else screenshots
+        work = split_into_tiles(
+            screens, template_height, app_config.TILE_MIN_PIXELS, app_config.TILE_MAX_PER_MONITOR
+        ) if app_config.PARALLEL_MATCHING else screens
+        tile_results = map_screens(
+            tile_executor if app_config.PARALLEL_MATCHING else None,
+            score_instances,
+            work, template, method, confidence
+        )
+        
+        # 汇总所有分块的候选框（全局坐标），分块重叠处的重复候选由 NMS 去除
+        sources = []
+        points = []
+        scores = []
+        for tile_index, tile_result in enumerate(tile_results):
+            count = len(tile_result["scores"])
+            if not count:
+                continue
+            sources.append(np.full(count, tile_index))
+            points.append(tile_result["points"])
+            scores.append(tile_result["scores"])
+        
+        if not scores:
+            instances = []
+            candidate_count = 0
+        else:
+            sources = np.concatenate(sources)
+            local_points = np.concatenate(points)
+            scores = np.concatenate(scores)
+            offsets = np.array([[work[i]["offset_x"], work[i]["offset_y"]] for i in sources]).reshape(-1, 2)
+            global_points = local_points + offsets
+            boxes = np.column_stack([
+                global_points,
+                np.full(len(scores), template_width),
+                np.full(len(scores), template_height)
+            ])
+            candidate_count = len(scores)
+            # 彩色校验会剔除部分实例，NMS 阶段不限制数量
+            keep = non_max_suppression(
+                boxes, scores, app_config.FIND_ALL_IOU,
+                candidate_count if color_mode == "gray_verify" else max_results
+            )
+            
+            instances = []
+            for index in keep:
+                if len(instances) >= max_results:
+                    break
+                source = work[sources[index]]
+                local_x, local_y = (int(v) for v in local_points[index])
+                instance_confidence = float(scores[index])
+                if color_mode == "gray_verify":
+                    color_score = verify_color_match(source, (local_x, local_y), cached_template.image)
+                    if color_score < confidence:
+                        continue
+                left, top = (int(v) for v in global_points[index])
+                instances.append({
+                    "x": left + template_width // 2,
+                    "y": top + template_height // 2,
+                    "local_x": source.get("roi_x", 0) + local_x,
+                    "local_y": source.get("roi_y", 0) + local_y,
+                    "width": template_width,
+                    "height": template_height,
+                    "top_left": (left, top),
+                    "monitor_id": source["monitor_id"],
+                    "monitor_name": f"显示器 {source['monitor_id']}",
+                    "confidence": instance_confidence
+                })
+        
+        match_info = {
+            "template_size": (template_width, template_height),
+            "method": app_config.FIND_ALL_METHOD,
+            "candidates": candidate_count,
+            "max_results": max_results,
+            "color_mode": color_mode,
+            "search_region": region
+        }
+        return instances, match_info
+    finally:
+        release_screenshots(screenshots)
+
+def capture_region_gray(region: Dict) -> np.ndarray:
+    """截取全局区域的灰度图（用于点击校验，只截取该区域）"""
+    return capture_service.grab_region(region, "gray")
+
+# 鼠标输入控制器（按距离计算移动时长，轮询光标位置确认到位）
+input_controller = InputController(
+    pyautogui,
+    profile=app_config.MOVE_PROFILE,
+    speed=app_config.MOVE_SPEED,
+    max_duration=app_config.MOVE_DURATION,
+    arrival_tolerance=app_config.ARRIVAL_TOLERANCE,
+    arrival_timeout=app_config.ARRIVAL_TIMEOUT,
+    poll_interval=app_config.ARRIVAL_POLL_INTERVAL,
+    capture_region=capture_region_gray,
+    verify_radius=app_config.CLICK_VERIFY_RADIUS,
+    verify_timeout=app_config.CLICK_VERIFY_TIMEOUT,
+    verify_interval=app_config.CLICK_VERIFY_INTERVAL,
+    verify_threshold=app_config.WAIT_DIFF_THRESHOLD
+)
+
+def perform_click(x: int, y: int, button: str = "left", clicks: int = 1) -> Dict:
+    """
+    移动鼠标并点击（在输入工作器线程中执行）
+    :param x: 全局 X 坐标
+    :param y: 全局 Y 坐标
+    :param button: 鼠标按钮（left/right/middle）
+    :param clicks: 点击次数
+    :return: 移动与点击信息（距离、耗时、是否到位、点击校验结果）
+    """
+    info = input_controller.click(
+        x, y, button=button, clicks=clicks,
+        interval=app_config.CLICK_INTERVAL, verify=app_config.CLICK_VERIFY
+    )
+    latency_metrics.observe("move", info["move_ms"] / 1000)
+    latency_metrics.observe("click", info["click_ms"] / 1000)
+    return info
+
+def compose_screenshot(screenshots: List[Dict], region: Optional[Dict] = None) -> np.ndarray:
+    """
+    将多个显示器的截图拼接为一张图片
+    :param region: 全局区域，None 表示所有显示器的外包矩形
+    :return: 与截图格式相同的图片（显示器之间的空白处为黑色）
+    """
+    if region is None:
+        left = min(s["offset_x"] for s in screenshots)
+        top = min(s["offset_y"] for s in screenshots)
+        right = max(s["offset_x"] + s["width"] for s in screenshots)
+        bottom = max(s["offset_y"] + s["height"] for s in screenshots)
+        region = {"x": left, "y": top, "width": right - left, "height": bottom - top}
+    canvas = np.zeros((region["height"], region["width"]) + screenshots[0]["image"].shape[2:], np.uint8)
+    for piece in crop_screenshots(screenshots, region):
+        x = piece["offset_x"] - region["x"]
+        y = piece["offset_y"] - region["y"]
+        canvas[y:y + piece["height"], x:x + piece["width"]] = piece["image"]
+    return canvas
+
+def save_workflow_screenshot(path: str, region: Optional[Dict] = None) -> str:
+    """
+    保存截图（screenshot 节点）
+    :param path: WORKFLOW_SCREENSHOT_DIR 下的相对路径
+    :param region: 截图区域（全局坐标），None 表示所有显示器
+    :return: 实际保存路径
+    """
+    target = os.path.normpath(os.path.join(app_config.WORKFLOW_SCREENSHOT_DIR, path))
+    root = os.path.normpath(app_config.WORKFLOW_SCREENSHOT_DIR)
+    if os.path.isabs(path) or os.path.commonpath([root, target]) != root:
+        raise ValueError(f"截图路径必须位于 {root} 之内: {path}")
+    ensure_dir(os.path.dirname(target))
+    screenshots = capture_screenshot(None, "bgr")
+    try:
+        image = compose_screenshot(screenshots, normalize_region(region))
+    finally:
+        release_screenshots(screenshots)
+    if not cv2.imwrite(target, image):
+        raise ValueError(f"无法保存截图: {target}")
+    return target
+
+def send_log_threadsafe(level: str, message: str, data: Optional[Dict] = None) -> None:
+    """在工作线程中向所有连接广播日志"""
+    if event_loop is None or event_loop.is_closed():
+        return
+    ws_manager.broadcaster.publish_threadsafe(event_loop, level, message, data)
+
+# ==============================
+# 工作流引擎
+# ==============================
+workflow_executor = create_match_executor(app_config.WORKFLOW_WORKERS)
+
+# 推测性预取（在匹配执行器中运行，取用时按帧差分校验）
+match_prefetcher = MatchPrefetcher(
+    match_executor,
+    lambda color: capture_screenshot(None, color),
+    release_screenshots,
+    tile_size=app_config.WAIT_TILE_SIZE,
+    threshold=app_config.PREFETCH_DIFF_THRESHOLD
+)
+
+def prefetch_match(template_path: str, confidence: float, region: Optional[Dict] = None) -> Any:
+    """
+    在后台推测性地查找图片（工作流下一步的目标）
+    :return: SpeculativeMatch，result() 在画面已变化时返回 None
+    """
+    color = "bgr" if app_config.DEFAULT_COLOR_MODE == "bgr" else "gray"
+    return match_prefetcher.start(
+        template_path,
+        lambda screenshots: find_image_on_screen(template_path, confidence, region=region, screenshots=screenshots),
+        color
+    )
+
+workflow_engine = WorkflowEngine(
+    WorkflowServices(
+        load_template=template_registry.load,
+        find_image=lambda image_id, confidence, region: find_image_on_screen(image_id, confidence, region=region),
+        wait_for_image=lambda image_id, confidence, timeout, interval, cancel_event: wait_for_image_on_screen(
+            image_id, confidence, timeout, interval, cancel_event=cancel_event
+        ),
+        click=lambda x, y, button, clicks: input_worker.call(perform_click, x, y, button, clicks),
+        run_input=input_worker.call,
+        input=pyautogui,
+        save_screenshot=save_workflow_screenshot,
+        log=send_log_threadsafe,
+        prefetch=prefetch_match if app_config.WORKFLOW_PREFETCH else None
+    ),
+    workflow_executor,
+    max_history=app_config.WORKFLOW_HISTORY
+)
 
 # ==============================
 # API 路由
@@ -407,6 +1296,42 @@ async def get_monitors():
             "error": str(e)
         }
 
+@app.get("/api/cascade/stats")
+async def get_cascade_stats():
+    """获取匹配算法级联的各阶段统计（用于调整算法顺序）"""
+    return {
+        "success": True,
+        "cascade": match_cascade.stats()
+    }
+
+@app.get("/api/uploads")
+async def get_uploads():
+    """上传文件库的磁盘占用和各模板的使用记录"""
+    return {
+        "success": True,
+        "usage": template_registry.uploads.usage(),
+        "templates": template_registry.uploads.entries()
+    }
+
+@app.post("/api/uploads/gc")
+async def collect_uploads():
+    """立即按磁盘配额清理上传文件库"""
+    removed = template_registry.uploads.collect_garbage()
+    return {"success": True, "removed": removed, "usage": template_registry.uploads.usage()}
+
+@app.get("/api/ws/stats")
+async def get_ws_stats():
+    """WebSocket 日志分发统计（各连接的队列长度、丢弃数量）"""
+    return {"success": True, "broadcast": ws_manager.broadcaster.info()}
+
+@app.get("/api/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """各阶段耗时统计（Prometheus 文本格式）"""
+    return PlainTextResponse(
+        latency_metrics.render_prometheus(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
 @app.get("/", response_class=HTMLResponse)
 async def root():
     """返回前端页面"""
@@ -717,7 +1642,18 @@ async def root():
                 
                 ws.onmessage = (event) => {
                     const data = JSON.parse(event.data);
-                    addLog(data.level, data.message, data.data);
+                    if (data.type === 'log_batch') {
+                        // 服务端合并发送的多条日志
+                        data.logs.forEach(log => addLog(log.level, log.message, log.data));
+                        if (data.dropped) {
+                            addLog('warning', `⚠️ 日志过多，已丢弃 ${data.dropped} 条`);
+                        }
+                    } else if (data.type === 'ping') {
+                        // 回复服务端心跳
+                        ws.send(JSON.stringify({ type: 'pong', id: data.id }));
+                    } else if (data.type === 'log') {
+                        addLog(data.level, data.message, data.data);
+                    }
                 };
                 
                 ws.onclose = () => {
@@ -868,20 +1804,231 @@ async def root():
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
-    """WebSocket 端点"""
-    await ws_manager.connect(websocket)
-    
+    """
+    WebSocket 端点
+    查询参数 levels 为逗号分隔的订阅级别（如 ?levels=warning,error），缺省订阅全部
+    """
+    try:
+        levels = parse_levels(websocket.query_params.get("levels", "").split(","))
+        invalid_levels = None
+    except ValueError as e:
+        levels, invalid_levels = None, str(e)
+    await ws_manager.connect(websocket, levels)
+    if invalid_levels:
+        ws_manager.send_log(websocket, "warning", f"⚠️ {invalid_levels}，已订阅全部级别")
+
+    def subscribe(requested) -> List[str]:
+        selected = parse_levels(requested)
+        ws_manager.broadcaster.subscribe(websocket, selected)
+        return sorted(selected) if selected else list(LOG_LEVELS)
+
+    async def receive() -> str:
+        # 二进制帧按 UTF-8 解码，由会话统一校验 JSON
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(message.get("code", 1000))
+        if message.get("text") is not None:
+            return message["text"]
+        return (message.get("bytes") or b"").decode("utf-8", errors="replace")
+
+    session = WebSocketSession(
+        receive=receive,
+        send=lambda message: ws_manager.broadcaster.send_direct(websocket, message),
+        handlers=WS_COMMANDS,
+        on_subscribe=subscribe,
+        close=websocket.close,
+        heartbeat_interval=app_config.WS_HEARTBEAT_INTERVAL,
+        heartbeat_timeout=app_config.WS_HEARTBEAT_TIMEOUT,
+        max_pending=app_config.WS_MAX_PENDING
+    )
     try:
-        while True:
-            # 保持连接
-            await asyncio.sleep(1)
-    except WebSocketDisconnect:
+        # 阻塞在读取客户端消息上，断开时立即退出
+        await session.run()
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
         ws_manager.disconnect(websocket)
 
+async def execute_match(
+    file_path: str,
+    confidence: float,
+    search_mode: str,
+    search_region: Optional[Dict],
+    use_location_hint: bool,
+    color_mode: str,
+    click: bool = True
+) -> Dict:
+    """
+    识别模板并（可选）点击，参数已由调用方校验
+    :param file_path: 模板文件路径或模板 ID
+    :param click: 找到后是否点击
+    :return: 接口响应
+    """
+    # 获取显示器信息
+    monitors = get_all_monitors()
+    monitor_summary = ", ".join([f"显示器{m['id']}({m['width']}x{m['height']})" for m in monitors])
+    ws_manager.broadcast("info", f"🖥️ 检测到 {len(monitors)} 个显示器: {monitor_summary}")
+    
+    ws_manager.broadcast("info", f"🔍 开始识别屏幕 (置信度: {confidence})")
+    ws_manager.broadcast("info", f"🔬 使用多算法匹配 (搜索模式: {search_mode})...")
+    
+    # 查找图片（启用调试模式，在匹配执行器中运行）
+    found, location, match_confidence, match_info = await run_in_executor(
+        match_executor,
+        find_image_on_screen,
+        file_path, confidence, enable_debug=True, search_mode=search_mode,
+        region=search_region, use_location_hint=use_location_hint,
+        color_mode=color_mode
+    )
+    
+    # 输出详细的坐标信息用于调试
+    if found and location:
+        ws_manager.broadcast(
+            "info",
+            f"🔍 坐标详情: 绝对({location.get('x')}, {location.get('y')}), "
+            f"相对({location.get('local_x')}, {location.get('local_y')}), "
+            f"显示器偏移({location['top_left'][0] - location['local_x']}, {location['top_left'][1] - location['local_y']})"
+        )
+    
+    # 显示匹配详情
+    if match_info.get("methods_tried"):
+        methods_text = ", ".join([
+            f"{m['method']}: {m.get('confidence', 0):.2%}" 
+            for m in match_info["methods_tried"] 
+            if 'confidence' in m
+        ])
+        ws_manager.broadcast(
+            "info",
+            f"📊 尝试的算法: {methods_text}"
+        )
+    
+    if match_info.get("best_method"):
+        ws_manager.broadcast(
+            "info",
+            f"🎯 最佳匹配方法: {match_info['best_method']}"
+        )
+    
+    if found:
+        monitor_info = f"显示器 {location.get('monitor_id', 1)}" if location.get('monitor_id') else ""
+        ws_manager.broadcast(
+            "success", 
+            f"✅ 找到目标图片！匹配度: {match_confidence:.2%} ({monitor_info})",
+            {
+                "location": location,
+                "template_size": match_info.get("template_size"),
+                "method": match_info.get("best_method"),
+                "monitor_id": location.get('monitor_id'),
+                "monitor_name": location.get('monitor_name')
+            }
+        )
+        
+        # 显示所有显示器的搜索结果
+        if match_info.get("monitor_results"):
+            monitors_summary = []
+            for mr in match_info["monitor_results"]:
+                monitors_summary.append(
+                    f"显示器{mr['monitor_id']}: {mr['best_confidence']:.2%}"
+                )
+            ws_manager.broadcast(
+                "info",
+                f"📺 各显示器匹配度: {', '.join(monitors_summary)}"
+            )
+        
+        if not click:
+            return {
+                "success": True,
+                "found": True,
+                "location": location,
+                "confidence": match_confidence,
+                "clicked": False,
+                "timings": match_info.get("timings")
+            }
+        
+        # 执行点击
+        try:
+            x = location['x']
+            y = location['y']
+            
+            # 验证坐标是否在显示器范围内
+            coordinate_valid, target_monitor = validate_coordinates(x, y, monitors)
+            
+            if coordinate_valid and target_monitor:
+                ws_manager.broadcast(
+                    "info",
+                    f"✅ 坐标在{target_monitor['name']}范围内"
+                )
+            else:
+                ws_manager.broadcast(
+                    "warning",
+                    f"⚠️ 坐标({x}, {y})可能超出显示器范围，但仍会尝试点击"
+                )
+            
+            ws_manager.broadcast(
+                "info",
+                f"🖱️ 准备点击坐标: ({x}, {y})"
+            )
+            
+            # 移动并点击（在串行输入工作器中执行）；点击一旦提交就不再响应取消，返回真实结果
+            click_info = await input_worker.run_committed(perform_click, x, y)
+            
+            if not click_info["arrived"]:
+                ws_manager.broadcast(
+                    "warning",
+                    f"⚠️ 光标未在 {app_config.ARRIVAL_TIMEOUT}s 内到达目标位置"
+                )
+            if click_info["verified"] is False:
+                ws_manager.broadcast(
+                    "warning",
+                    f"⚠️ 点击后 {app_config.CLICK_VERIFY_TIMEOUT}s 内点击位置附近画面无变化"
+                )
+            
+            ws_manager.broadcast(
+                "success",
+                f"✅ 点击成功！位置: ({x}, {y}) (移动 {click_info['move_ms']:.0f}ms)",
+                {"click_info": click_info}
+            )
+            
+            return {
+                "success": True,
+                "found": True,
+                "location": location,
+                "confidence": match_confidence,
+                "clicked": True,
+                "click_info": click_info,
+                "timings": match_info.get("timings")
+            }
+            
+        except Exception as e:
+            ws_manager.broadcast(
+                "error",
+                f"❌ 点击失败: {str(e)}"
+            )
+            return {
+                "success": False,
+                "error": f"Click failed: {str(e)}"
+            }
+    else:
+        ws_manager.broadcast(
+            "warning",
+            f"⚠️ 未找到目标图片 (最高匹配度: {match_confidence:.2%})"
+        )
+        
+        return {
+            "success": False,
+            "found": False,
+            "confidence": match_confidence,
+            "timings": match_info.get("timings"),
+            "message": "图片未找到，请尝试降低置信度或使用更清晰的图片"
+        }
+
 @app.post("/api/execute")
 async def execute_task(
     file: UploadFile = File(...),
-    confidence: float = Form(app_config.DEFAULT_CONFIDENCE)
+    confidence: float = Form(app_config.DEFAULT_CONFIDENCE),
+    search_mode: str = Form(app_config.DEFAULT_SEARCH_MODE),
+    region: Optional[str] = Form(None),
+    use_location_hint: bool = Form(app_config.USE_LOCATION_HINT),
+    color_mode: str = Form(app_config.DEFAULT_COLOR_MODE)
 ):
     """
     执行识别和点击任务
@@ -890,175 +2037,373 @@ async def execute_task(
     if not ws_manager.active_connections:
         return {"success": False, "error": "No WebSocket connection"}
     
-    websocket = ws_manager.active_connections[0]
-    
     try:
         # 验证图片文件
         if not validate_image_file(file.filename, file.content_type):
-            await ws_manager.send_log(websocket, "error", f"❌ 不支持的文件格式: {file.filename}")
+            ws_manager.broadcast("error", f"❌ 不支持的文件格式: {file.filename}")
             return {"success": False, "error": "Unsupported file format"}
         
         # 验证置信度参数
         confidence = max(app_config.MIN_CONFIDENCE, min(app_config.MAX_CONFIDENCE, confidence))
         
+        # 验证搜索模式参数
+        if search_mode not in SEARCH_MODES:
+            ws_manager.broadcast("error", f"❌ 不支持的搜索模式: {search_mode}")
+            return {"success": False, "error": f"Unsupported search mode: {search_mode}"}
+        
+        # 验证颜色模式参数
+        if color_mode not in COLOR_MODES:
+            ws_manager.broadcast("error", f"❌ 不支持的颜色模式: {color_mode}")
+            return {"success": False, "error": f"Unsupported color mode: {color_mode}"}
+        
+        # 解析搜索区域参数（JSON 字符串）
+        try:
+            search_region = normalize_region(json.loads(region)) if region else None
+        except (json.JSONDecodeError, ValueError) as e:
+            ws_manager.broadcast("error", f"❌ 搜索区域参数无效: {region}")
+            return {"success": False, "error": f"Invalid region: {e}"}
+        
         # 保存上传的图片
         file_ext = get_file_extension(file.filename)
         file_content = await file.read()
         file_path = save_uploaded_file(file_content, file_ext)
         
-        await ws_manager.send_log(websocket, "info", f"📁 图片已保存: {file.filename}")
-        
-        # 获取显示器信息
-        monitors = get_all_monitors()
-        monitor_summary = ", ".join([f"显示器{m['id']}({m['width']}x{m['height']})" for m in monitors])
-        await ws_manager.send_log(websocket, "info", f"🖥️ 检测到 {len(monitors)} 个显示器: {monitor_summary}")
-        
-        await ws_manager.send_log(websocket, "info", f"🔍 开始识别屏幕 (置信度: {confidence})")
-        await ws_manager.send_log(websocket, "info", "🔬 使用多算法和多尺度匹配...")
+        ws_manager.broadcast("info", f"📁 图片已保存: {file.filename}")
         
-        # 查找图片（启用调试模式）
-        found, location, match_confidence, match_info = find_image_on_screen(
-            file_path, confidence, enable_debug=True
+        return await execute_match(
+            file_path, confidence, search_mode, search_region, use_location_hint, color_mode
+        )
+            
+    except Exception as e:
+        ws_manager.broadcast(
+            "error",
+            f"❌ 执行出错: {str(e)}"
         )
         
-        # 输出详细的坐标信息用于调试
-        if found and location:
-            await ws_manager.send_log(
-                websocket,
-                "info",
-                f"🔍 坐标详情: 绝对({location.get('x')}, {location.get('y')}), "
-                f"相对({location.get('local_x')}, {location.get('local_y')}), "
-                f"显示器偏移({location.get('top_left', {}).get('x', 0) - location.get('local_x', 0) + location.get('width', 0)//2}, "
-                f"{location.get('top_left', {}).get('y', 0) - location.get('local_y', 0) + location.get('height', 0)//2})"
-            )
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+@app.post("/api/image/upload")
+async def upload_image(file: UploadFile = File(...)):
+    """
+    注册模板图片，返回模板 ID（相同内容返回相同 ID）
+    之后可用 /api/execute/template、/api/screen/find-image 按 ID 识别，不必重复上传图片
+    """
+    if not validate_image_file(file.filename, file.content_type):
+        return {"success": False, "error": "Unsupported file format"}
+    try:
+        content = await file.read()
+        template_id, file_path = template_registry.store(content, get_file_extension(file.filename))
+        cached_template = template_registry.load(template_id)
+        if cached_template is None:
+            return {"success": False, "error": "Invalid image", "error_code": "INVALID_PARAMETERS"}
+        height, width = cached_template.image.shape[:2]
+        return {
+            "success": True,
+            "id": template_id,
+            "path": file_path,
+            "size": len(content),
+            "width": width,
+            "height": height
+        }
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+def parse_template_request(payload: Dict) -> Tuple[Optional[Dict], Optional[Dict]]:
+    """
+    解析按模板 ID 识别的 JSON 请求
+    :return: (参数, 错误响应)，二者只有一个不为 None
+    """
+    image_id = payload.get("image_id")
+    if not isinstance(image_id, str) or template_registry.uploads.path(image_id) is None:
+        return None, {"success": False, "error": f"Template not found: {image_id}", "error_code": "IMAGE_NOT_FOUND"}
+    search_mode = payload.get("search_mode", app_config.DEFAULT_SEARCH_MODE)
+    if search_mode not in SEARCH_MODES:
+        return None, {"success": False, "error": f"Unsupported search mode: {search_mode}"}
+    color_mode = payload.get("color_mode", app_config.DEFAULT_COLOR_MODE)
+    if color_mode not in COLOR_MODES:
+        return None, {"success": False, "error": f"Unsupported color mode: {color_mode}"}
+    try:
+        confidence = float(payload.get("confidence", app_config.DEFAULT_CONFIDENCE))
+        search_region = normalize_region(payload.get("region"))
+    except (TypeError, ValueError) as e:
+        return None, {"success": False, "error": f"Invalid parameters: {e}", "error_code": "INVALID_PARAMETERS"}
+    return {
+        "file_path": image_id,
+        "confidence": max(app_config.MIN_CONFIDENCE, min(app_config.MAX_CONFIDENCE, confidence)),
+        "search_mode": search_mode,
+        "search_region": search_region,
+        "use_location_hint": bool(payload.get("use_location_hint", app_config.USE_LOCATION_HINT)),
+        "color_mode": color_mode
+    }, None
+
+@app.post("/api/execute/template")
+async def execute_template_task(payload: Dict = Body(...)):
+    """
+    按模板 ID 识别并点击
+    请求体: {"image_id", "confidence", "search_mode", "region", "use_location_hint", "color_mode", "click"}
+    """
+    params, error = parse_template_request(payload)
+    if error:
+        return error
+    try:
+        return await execute_match(click=bool(payload.get("click", True)), **params)
+    except Exception as e:
+        ws_manager.broadcast("error", f"❌ 执行出错: {str(e)}")
+        return {"success": False, "error": str(e)}
+
+@app.post("/api/screen/find-image")
+async def find_image_task(payload: Dict = Body(...)):
+    """
+    按模板 ID 识别（不点击）
+    请求体: {"image_id", "confidence", "search_mode", "region", "use_location_hint", "color_mode"}
+    """
+    params, error = parse_template_request(payload)
+    if error:
+        return error
+    try:
+        return await execute_match(click=False, **params)
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+async def ws_match_command(message: Dict) -> Dict:
+    """WebSocket match 命令：按模板 ID 识别，不点击"""
+    params, error = parse_template_request(message)
+    if error:
+        return error
+    return await execute_match(click=False, **params)
+
+async def ws_click_command(message: Dict) -> Dict:
+    """WebSocket click 命令：按模板 ID 识别并点击"""
+    params, error = parse_template_request(message)
+    if error:
+        return error
+    return await execute_match(click=True, **params)
+
+# WebSocket 命令（参数同 /api/execute/template）
+WS_COMMANDS = {
+    "match": ws_match_command,
+    "click": ws_click_command
+}
+
+@app.post("/api/wait-for-image")
+async def wait_for_image_task(
+    file: UploadFile = File(...),
+    confidence: float = Form(app_config.DEFAULT_CONFIDENCE),
+    timeout: float = Form(app_config.WAIT_DEFAULT_TIMEOUT),
+    interval: float = Form(app_config.WAIT_POLL_INTERVAL),
+    search_mode: str = Form(app_config.DEFAULT_SEARCH_MODE),
+    color_mode: str = Form(app_config.DEFAULT_COLOR_MODE)
+):
+    """
+    等待图片出现（服务端轮询，不点击）
+    """
+    try:
+        # 验证参数
+        if not validate_image_file(file.filename, file.content_type):
+            return {"success": False, "error": "Unsupported file format"}
+        if search_mode not in SEARCH_MODES:
+            return {"success": False, "error": f"Unsupported search mode: {search_mode}"}
+        if color_mode not in COLOR_MODES:
+            return {"success": False, "error": f"Unsupported color mode: {color_mode}"}
+        confidence = max(app_config.MIN_CONFIDENCE, min(app_config.MAX_CONFIDENCE, confidence))
+        timeout = max(0.0, timeout)
+        interval = max(0.01, interval)
         
-        # 显示匹配详情
-        if match_info.get("methods_tried"):
-            methods_text = ", ".join([
-                f"{m['method']}: {m.get('confidence', 0):.2%}" 
-                for m in match_info["methods_tried"] 
-                if 'confidence' in m
-            ])
-            await ws_manager.send_log(
-                websocket,
-                "info",
-                f"📊 尝试的算法: {methods_text}"
-            )
+        file_path = save_uploaded_file(await file.read(), get_file_extension(file.filename))
         
-        if match_info.get("best_method"):
-            await ws_manager.send_log(
-                websocket,
-                "info",
-                f"🎯 最佳匹配方法: {match_info['best_method']}"
-            )
+        ws_manager.broadcast("info", f"⏳ 等待图片出现: {file.filename} (超时: {timeout}s)")
+        
+        found, location, match_confidence, match_info = await run_in_executor(
+            match_executor,
+            wait_for_image_on_screen,
+            file_path, confidence, timeout, interval,
+            search_mode=search_mode, color_mode=color_mode
+        )
         
         if found:
-            monitor_info = f"显示器 {location.get('monitor_id', 1)}" if location.get('monitor_id') else ""
-            await ws_manager.send_log(
-                websocket, 
-                "success", 
-                f"✅ 找到目标图片！匹配度: {match_confidence:.2%} ({monitor_info})",
-                {
-                    "location": location,
-                    "template_size": match_info.get("template_size"),
-                    "method": match_info.get("best_method"),
-                    "monitor_id": location.get('monitor_id'),
-                    "monitor_name": location.get('monitor_name')
-                }
+            ws_manager.broadcast(
+                "success",
+                f"✅ 图片已出现！匹配度: {match_confidence:.2%}",
+                {"location": location, "watch": match_info.get("watch")}
             )
-            
-            # 显示所有显示器的搜索结果
-            if match_info.get("monitor_results"):
-                monitors_summary = []
-                for mr in match_info["monitor_results"]:
-                    monitors_summary.append(
-                        f"显示器{mr['monitor_id']}: {mr['best_confidence']:.2%}"
-                    )
-                await ws_manager.send_log(
-                    websocket,
-                    "info",
-                    f"📺 各显示器匹配度: {', '.join(monitors_summary)}"
-                )
-            
-            # 执行点击
-            try:
-                x = location['x']
-                y = location['y']
-                
-                # 验证坐标是否在显示器范围内
-                coordinate_valid, target_monitor = validate_coordinates(x, y, monitors)
-                
-                if coordinate_valid and target_monitor:
-                    await ws_manager.send_log(
-                        websocket,
-                        "info",
-                        f"✅ 坐标在{target_monitor['name']}范围内"
-                    )
-                else:
-                    await ws_manager.send_log(
-                        websocket,
-                        "warning",
-                        f"⚠️ 坐标({x}, {y})可能超出显示器范围，但仍会尝试点击"
-                    )
-                
-                await ws_manager.send_log(
-                    websocket,
-                    "info",
-                    f"🖱️ 准备点击坐标: ({x}, {y})"
-                )
-                
-                # 使用更安全的方式移动和点击
-                pyautogui.moveTo(x, y, duration=app_config.MOVE_DURATION, tween=pyautogui.easeInOutQuad)
-                await asyncio.sleep(0.3)  # 增加等待时间，确保移动完成
-                
-                # 单独执行点击，不带任何修饰键
-                pyautogui.click(x, y, clicks=1, interval=app_config.CLICK_INTERVAL, button='left')
-                
-                await ws_manager.send_log(
-                    websocket,
-                    "success",
-                    f"✅ 点击成功！位置: ({x}, {y})"
-                )
-                
-                return {
-                    "success": True,
-                    "found": True,
-                    "location": location,
-                    "confidence": match_confidence,
-                    "clicked": True
-                }
-                
-            except Exception as e:
-                await ws_manager.send_log(
-                    websocket,
-                    "error",
-                    f"❌ 点击失败: {str(e)}"
-                )
-                return {
-                    "success": False,
-                    "error": f"Click failed: {str(e)}"
-                }
         else:
-            await ws_manager.send_log(
-                websocket,
+            ws_manager.broadcast(
                 "warning",
-                f"⚠️ 未找到目标图片 (最高匹配度: {match_confidence:.2%})"
+                f"⚠️ 等待超时，未找到目标图片 (最高匹配度: {match_confidence:.2%})"
             )
-            
-            return {
-                "success": False,
-                "found": False,
-                "confidence": match_confidence,
-                "message": "图片未找到，请尝试降低置信度或使用更清晰的图片"
-            }
-            
+        
+        return {
+            "success": found,
+            "found": found,
+            "location": location,
+            "confidence": match_confidence,
+            "watch": match_info.get("watch")
+        }
+    
     except Exception as e:
-        await ws_manager.send_log(
-            websocket,
-            "error",
-            f"❌ 执行出错: {str(e)}"
+        ws_manager.broadcast("error", f"❌ 等待出错: {str(e)}")
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+@app.post("/api/execution/start")
+async def start_execution(payload: Dict = Body(...)):
+    """
+    启动工作流（服务端执行，节点耗时通过 WebSocket 推送）
+    请求体: {"workflow": 工作流 JSON, "options": {...}}，节点中的 image_id 为已上传模板的 ID 或路径
+    """
+    workflow = payload.get("workflow")
+    if not isinstance(workflow, dict):
+        return {"success": False, "error": "Missing workflow", "error_code": "INVALID_PARAMETERS"}
+    try:
+        execution = workflow_engine.start(workflow, payload.get("options"))
+    except WorkflowError as e:
+        return {"success": False, "error": str(e), "error_code": e.code}
+    return {
+        "success": True,
+        "execution_id": execution.execution_id,
+        "status": execution.status,
+        "started_at": execution.started_at
+    }
+
+@app.post("/api/execution/{action}")
+async def control_execution(action: str, payload: Dict = Body(...)):
+    """
+    暂停/继续/停止工作流
+    请求体: {"execution_id": ...}
+    """
+    if action not in ("pause", "resume", "stop"):
+        return {"success": False, "error": f"Unsupported action: {action}", "error_code": "INVALID_PARAMETERS"}
+    execution = workflow_engine.get(payload.get("execution_id"))
+    if execution is None:
+        return {"success": False, "error": "Execution not found", "error_code": "WORKFLOW_NOT_FOUND"}
+    getattr(execution, action)()
+    return {"success": True, "execution_id": execution.execution_id, "status": execution.status}
+
+@app.get("/api/execution/status/{execution_id}")
+async def get_execution_status(execution_id: str):
+    """获取工作流执行状态"""
+    execution = workflow_engine.get(execution_id)
+    if execution is None:
+        return {"success": False, "error": "Execution not found", "error_code": "WORKFLOW_NOT_FOUND"}
+    return {"success": True, **execution.state()}
+
+@app.post("/api/find-all")
+async def find_all_task(
+    file: UploadFile = File(...),
+    confidence: float = Form(app_config.DEFAULT_CONFIDENCE),
+    max_results: int = Form(app_config.FIND_ALL_MAX_RESULTS),
+    region: Optional[str] = Form(None),
+    color_mode: str = Form(app_config.DEFAULT_COLOR_MODE)
+):
+    """
+    查找模板的全部实例（不点击），结果按置信度降序
+    """
+    try:
+        if not validate_image_file(file.filename, file.content_type):
+            return {"success": False, "error": "Unsupported file format"}
+        if color_mode not in COLOR_MODES:
+            return {"success": False, "error": f"Unsupported color mode: {color_mode}"}
+        confidence = max(app_config.MIN_CONFIDENCE, min(app_config.MAX_CONFIDENCE, confidence))
+        max_results = max(1, max_results)
+        try:
+            search_region = normalize_region(json.loads(region)) if region else None
+        except (json.JSONDecodeError, ValueError) as e:
+            return {"success": False, "error": f"Invalid region: {e}"}
+        
+        file_path = save_uploaded_file(await file.read(), get_file_extension(file.filename))
+        
+        instances, match_info = await run_in_executor(
+            match_executor,
+            find_all_instances_on_screen,
+            file_path, confidence, max_results,
+            region=search_region, color_mode=color_mode
+        )
+        
+        ws_manager.broadcast(
+            "success" if instances else "warning",
+            f"📊 找到 {len(instances)} 个实例: {file.filename} (候选 {match_info['candidates']} 个)"
         )
         
+        return {
+            "success": True,
+            "found": bool(instances),
+            "count": len(instances),
+            "instances": instances,
+            "template_size": match_info["template_size"]
+        }
+    
+    except Exception as e:
+        ws_manager.broadcast("error", f"❌ 查找全部实例出错: {str(e)}")
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+@app.post("/api/batch-match")
+async def batch_match_task(
+    files: Optional[List[UploadFile]] = File(None),
+    template_ids: Optional[str] = Form(None),
+    confidence: float = Form(app_config.DEFAULT_CONFIDENCE),
+    search_mode: str = Form(app_config.DEFAULT_SEARCH_MODE),
+    color_mode: str = Form(app_config.DEFAULT_COLOR_MODE)
+):
+    """
+    批量识别多个模板（只截图一次，不点击）
+    template_ids 为 JSON 数组或逗号分隔的已缓存模板 ID，可与上传文件混合使用
+    """
+    try:
+        if search_mode not in SEARCH_MODES:
+            return {"success": False, "error": f"Unsupported search mode: {search_mode}"}
+        if color_mode not in COLOR_MODES:
+            return {"success": False, "error": f"Unsupported color mode: {color_mode}"}
+        confidence = max(app_config.MIN_CONFIDENCE, min(app_config.MAX_CONFIDENCE, confidence))
+        
+        templates: List[str] = []
+        for file in files or []:
+            if not validate_image_file(file.filename, file.content_type):
+                return {"success": False, "error": f"Unsupported file format: {file.filename}"}
+            templates.append(save_uploaded_file(await file.read(), get_file_extension(file.filename)))
+        
+        if template_ids:
+            try:
+                ids = json.loads(template_ids)
+            except json.JSONDecodeError:
+                ids = template_ids.split(",")
+            if not isinstance(ids, list):
+                ids = [ids]
+            templates.extend(str(template_id).strip() for template_id in ids if str(template_id).strip())
+        
+        if not templates:
+            return {"success": False, "error": "No templates provided"}
+        
+        ws_manager.broadcast("info", f"🔍 批量识别 {len(templates)} 个模板 (置信度: {confidence})")
+        
+        results = await run_in_executor(
+            match_executor,
+            find_images_on_screen_batch,
+            templates, confidence,
+            search_mode=search_mode, color_mode=color_mode
+        )
+        found_count = sum(1 for result in results if result.get("found"))
+        
+        ws_manager.broadcast(
+            "success" if found_count else "warning",
+            f"📊 批量识别完成: 找到 {found_count}/{len(results)} 个模板"
+        )
+        
+        return {
+            "success": True,
+            "found_count": found_count,
+            "results": results
+        }
+    
+    except Exception as e:
+        ws_manager.broadcast("error", f"❌ 批量识别出错: {str(e)}")
         return {
             "success": False,
             "error": str(e)
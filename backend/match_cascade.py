@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+匹配算法级联模块 - 按代价排序依次尝试匹配算法，达到置信度目标即提前结束
+同时统计每个阶段的命中次数和耗时，便于根据真实数据调整算法顺序。
+只有 TM_CCOEFF_NORMED 的相似度能直接确定结果；TM_SQDIFF_NORMED 的 1 - 最小值在背景上也可能很高，
+其最佳位置要经过复核（该位置窗口的 TM_CCOEFF_NORMED 相似度），取两者中较低的值
+"""
+
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import cv2
+
+# 算法名称 -> OpenCV 常量
+METHODS = {
+    "TM_CCOEFF_NORMED": cv2.TM_CCOEFF_NORMED,
+    "TM_CCORR_NORMED": cv2.TM_CCORR_NORMED,
+    "TM_SQDIFF_NORMED": cv2.TM_SQDIFF_NORMED,
+}
+
+# 相对计算代价（越小越先尝试）；CCOEFF 需要额外的均值处理
+METHOD_COSTS = {
+    "TM_SQDIFF_NORMED": 1.0,
+    "TM_CCORR_NORMED": 1.0,
+    "TM_CCOEFF_NORMED": 1.2,
+}
+
+# 参与最佳结果、可以提前结束级联的算法；TM_CCORR_NORMED 在明亮区域容易给出虚高的相似度，
+# 即使配置在级联中也只记录在 stages 中供对比，不参与最佳结果，并排在其他算法之后
+EARLY_EXIT_METHODS = ("TM_CCOEFF_NORMED", "TM_SQDIFF_NORMED")
+
+# 结果需要经过复核才能参与比较的算法（没有复核函数时只记录）
+VERIFY_METHODS = ("TM_SQDIFF_NORMED",)
+
+# 匹配函数：输入 OpenCV 算法常量，返回 (相似度, 左上角坐标)
+MatchFn = Callable[[int], Tuple[float, Optional[Tuple[int, int]]]]
+
+# 复核函数：输入左上角坐标，返回该位置窗口的 TM_CCOEFF_NORMED 相似度
+VerifyFn = Callable[[Tuple[int, int]], float]
+
+
+class MatchCascade:
+    """
+    匹配算法级联引擎
+    按顺序执行各阶段，某一阶段的相似度达到目标时停止，并记录由哪个阶段确定结果
+    """
+
+    def __init__(self, methods: Sequence[str], order_by_cost: bool = True, early_exit: bool = True):
+        """
+        :param methods: 参与级联的算法名称
+        :param order_by_cost: 是否按 METHOD_COSTS 重新排序（稳定排序，同代价保持原顺序；
+                              不能提前结束的算法始终排在最后）
+        :param early_exit: 是否在达到目标后提前结束；关闭时与逐一尝试全部算法等价
+        """
+        unknown = [m for m in methods if m not in METHODS]
+        if unknown:
+            raise ValueError(f"不支持的匹配算法: {', '.join(unknown)}")
+        if not any(m in EARLY_EXIT_METHODS for m in methods):
+            raise ValueError(f"级联中至少需要一个可确定结果的算法: {', '.join(EARLY_EXIT_METHODS)}")
+        if order_by_cost:
+            methods = sorted(methods, key=lambda m: (m not in EARLY_EXIT_METHODS, METHOD_COSTS.get(m, 1.0)))
+        self.methods: List[str] = list(methods)
+        self.early_exit = early_exit
+        self._lock = threading.Lock()
+        self._stats = {
+            name: {"runs": 0, "resolved": 0, "total_ms": 0.0}
+            for name in self.methods
+        }
+        self._unresolved = 0
+
+    def run(
+        self,
+        match_fn: MatchFn,
+        target: float,
+        verify_fn: Optional[VerifyFn] = None,
+        methods: Optional[Sequence[str]] = None
+    ) -> Dict:
+        """
+        执行级联匹配
+        :param match_fn: 匹配函数
+        :param target: 置信度目标
+        :param verify_fn: 复核函数，VERIFY_METHODS 中算法的结果经它复核后才参与比较
+        :param methods: 只执行级联中的这些算法（保持级联顺序），None 表示全部
+        :return: {"confidence", "top_left", "method", "resolved_stage", "stages"}
+                 resolved_stage 为确定结果的阶段序号（从 1 开始），未达到目标时为 None
+        """
+        best_confidence = 0.0
+        best_loc = None
+        best_method = None
+        resolved_stage = None
+        stages = []
+
+        selected = [m for m in self.methods if methods is None or m in methods]
+        for stage, method_name in enumerate(selected, 1):
+            start = time.perf_counter()
+            try:
+                confidence, top_left = match_fn(METHODS[method_name])
+            except Exception as e:
+                stages.append({"method": method_name, "confidence": 0.0, "error": str(e)})
+                continue
+            elapsed_ms = (time.perf_counter() - start) * 1000
+
+            self._record(method_name, elapsed_ms, resolved=False)
+            if top_left is None:
+                continue
+
+            confidence = float(confidence)
+            stage_result = {
+                "method": method_name,
+                "confidence": confidence,
+                "stage": stage,
+                "elapsed_ms": round(elapsed_ms, 3)
+            }
+            stages.append(stage_result)
+            if method_name not in EARLY_EXIT_METHODS:
+                continue
+            if method_name in VERIFY_METHODS:
+                if verify_fn is None:
+                    continue
+                verified = float(verify_fn(top_left))
+                stage_result["verified"] = round(verified, 4)
+                confidence = min(confidence, verified)
+            if best_loc is None or confidence > best_confidence:
+                best_confidence = confidence
+                best_loc = top_left
+                best_method = method_name
+
+            if confidence >= target and resolved_stage is None:
+                resolved_stage = stage
+                self._record(method_name, 0.0, resolved=True)
+                if self.early_exit:
+                    break
+
+        if resolved_stage is None:
+            with self._lock:
+                self._unresolved += 1
+
+        return {
+            "confidence": best_confidence,
+            "top_left": best_loc,
+            "method": best_method,
+            "resolved_stage": resolved_stage,
+            "stages": stages
+        }
+
+    def _record(self, method_name: str, elapsed_ms: float, resolved: bool) -> None:
+        """记录阶段统计"""
+        with self._lock:
+            stat = self._stats[method_name]
+            if resolved:
+                stat["resolved"] += 1
+            else:
+                stat["runs"] += 1
+                stat["total_ms"] += elapsed_ms
+
+    def stats(self) -> Dict:
+        """
+        级联统计：各阶段执行次数、确定结果次数、平均耗时
+        """
+        with self._lock:
+            stages = []
+            for name in self.methods:
+                stat = self._stats[name]
+                stages.append({
+                    "method": name,
+                    "runs": stat["runs"],
+                    "resolved": stat["resolved"],
+                    "avg_ms": round(stat["total_ms"] / stat["runs"], 3) if stat["runs"] else 0.0
+                })
+            return {"order": list(self.methods), "stages": stages, "unresolved": self._unresolved}
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+多目标检测模块 - 相似度图阈值化 + 向量化非极大值抑制(NMS)
+一次匹配得到整张相似度图后，取出所有超过阈值的局部峰值作为候选框，
+再用 NumPy 批量计算 IoU 做 NMS，得到按置信度排序的全部实例
+"""
+
+from typing import Tuple
+
+import cv2
+import numpy as np
+
+
+def threshold_candidates(
+    scores: np.ndarray,
+    threshold: float,
+    max_candidates: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    从相似度图中提取候选位置
+    只保留 3x3 邻域内的局部峰值（同一目标周围的大片高分像素只留一个），
+    候选过多时按分数保留前 max_candidates 个，保证噪声屏幕上的开销有上限
+    :param scores: “越大越好”的相似度图
+    :param threshold: 相似度阈值
+    :param max_candidates: 候选数量上限
+    :return: (候选左上角坐标 (N, 2) [x, y], 候选分数 (N,))
+    """
+    scores = scores.astype(np.float32, copy=False)
+    peaks = (scores >= threshold) & (scores >= cv2.dilate(scores, np.ones((3, 3), np.uint8)))
+    ys, xs = np.nonzero(peaks)
+    values = scores[ys, xs]
+    if len(values) > max_candidates:
+        keep = np.argpartition(values, -max_candidates)[-max_candidates:]
+        xs, ys, values = xs[keep], ys[keep], values[keep]
+    return np.stack([xs, ys], axis=1), values
+
+
+def non_max_suppression(
+    boxes: np.ndarray,
+    scores: np.ndarray,
+    iou_threshold: float = 0.3,
+    max_results: int = 100
+) -> np.ndarray:
+    """
+    非极大值抑制
+    :param boxes: (N, 4) [x, y, 宽, 高]
+    :param scores: (N,) 置信度
+    :param iou_threshold: 与已保留框 IoU 超过该值的框被抑制
+    :param max_results: 最多保留的框数量
+    :return: 保留框的下标，按置信度降序
+    """
+    if len(boxes) == 0:
+        return np.zeros(0, np.int64)
+    x1 = boxes[:, 0].astype(np.float64)
+    y1 = boxes[:, 1].astype(np.float64)
+    x2 = x1 + boxes[:, 2]
+    y2 = y1 + boxes[:, 3]
+    areas = boxes[:, 2].astype(np.float64) * boxes[:, 3]
+
+    order = np.argsort(-scores, kind="stable")
+    keep = []
+    while order.size and len(keep) < max_results:
+        best = order[0]
+        keep.append(best)
+        rest = order[1:]
+        # 当前框与剩余所有框的 IoU 一次算出
+        width = np.clip(np.minimum(x2[best], x2[rest]) - np.maximum(x1[best], x1[rest]), 0, None)
+        height = np.clip(np.minimum(y2[best], y2[rest]) - np.maximum(y1[best], y1[rest]), 0, None)
+        inter = width * height
+        iou = inter / (areas[best] + areas[rest] - inter)
+        order = rest[iou <= iou_threshold]
+    return np.array(keep, np.int64)
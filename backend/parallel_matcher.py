@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+并行匹配模块 - 将多个显示器（以及大显示器的水平分块）分发到工作池并行匹配
+分块之间按模板高度重叠，保证跨越分块边界的目标不会被漏掉
+"""
+
+import math
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, List, Optional
+
+from search_hints import crop_screenshots
+
+
+def split_into_tiles(
+    screenshots: List[Dict],
+    template_height: int,
+    min_tile_pixels: int,
+    max_tiles: int
+) -> List[Dict]:
+    """
+    将大显示器按行切分为水平分块（视图，不复制像素）
+    :param screenshots: 截图列表
+    :param template_height: 模板高度，相邻分块重叠 template_height - 1 行
+    :param min_tile_pixels: 单个分块的最小像素数，小于 2 倍该值的显示器不切分
+    :param max_tiles: 每个显示器最多切分的块数
+    :return: 分块列表，每块带有 tile_index，结构与截图相同
+    """
+    tiles = []
+    for screen in screenshots:
+        height, width = screen["image"].shape[:2]
+        count = min(max_tiles, (height * width) // max(1, min_tile_pixels))
+        # 每块至少要能放下模板
+        count = min(count, height // max(1, template_height))
+        if count < 2:
+            tiles.append({**screen, "tile_index": 0})
+            continue
+
+        strip = math.ceil(height / count)
+        for index in range(count):
+            region = {
+                "x": screen["offset_x"],
+                "y": screen["offset_y"] + index * strip,
+                "width": width,
+                "height": strip + template_height - 1
+            }
+            for tile in crop_screenshots([screen], region):
+                tiles.append({**tile, "tile_index": index})
+    return tiles
+
+
+def map_screens(executor: Optional[Executor], fn: Callable[..., Any], screens: List[Dict], *args: Any) -> List[Any]:
+    """
+    对每个截图（或分块）执行 fn(screen, *args)
+    :param executor: 工作池；为 None 或只有一项任务时在当前线程顺序执行
+    :return: 与 screens 顺序一致的结果列表
+    """
+    if executor is None or len(screens) < 2:
+        return [fn(screen, *args) for screen in screens]
+    futures = [executor.submit(fn, screen, *args) for screen in screens]
+    return [future.result() for future in futures]
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+推测性预取模块 - 在当前输入动作执行期间提前截图并匹配下一步的目标
+鼠标移动动画期间 CPU 空闲，提前完成下一步的匹配可以把匹配耗时藏在动画时间里；
+取用结果时重新截一帧与预取时的画面逐块比较，画面变化影响到结果时丢弃预取结果
+"""
+
+import threading
+from concurrent.futures import Executor, Future
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from image_watcher import changed_tiles
+
+# 匹配结果：(是否找到, 位置信息, 匹配度, 匹配详情)
+MatchResult = Tuple[bool, Optional[Dict], float, Dict]
+
+
+def gray_snapshot(screenshots: List[Dict]) -> Dict[int, Dict]:
+    """保存截图的灰度副本（截图缓冲区归还后会被复用）"""
+    snapshot = {}
+    for screen in screenshots:
+        image = screen["image"]
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image.copy()
+        snapshot[screen["monitor_id"]] = {
+            "image": gray,
+            "offset_x": screen["offset_x"],
+            "offset_y": screen["offset_y"]
+        }
+    return snapshot
+
+
+def rect_changed(mask: np.ndarray, tile_size: int, left: int, top: int, width: int, height: int) -> bool:
+    """
+    判断显示器内的矩形是否与变化分块相交
+    :param mask: changed_tiles 返回的变化分块掩码
+    :param left/top: 矩形在显示器内的左上角
+    """
+    rows, cols = mask.shape
+    r0, r1 = max(0, top // tile_size), min(rows - 1, (top + height - 1) // tile_size)
+    c0, c1 = max(0, left // tile_size), min(cols - 1, (left + width - 1) // tile_size)
+    if r0 > r1 or c0 > c1:
+        return False
+    return bool(mask[r0:r1 + 1, c0:c1 + 1].any())
+
+
+class SpeculativeMatch:
+    """
+    一次预取
+    result() 等待后台匹配完成并校验画面，仍然有效时返回匹配结果，否则返回 None
+    """
+
+    def __init__(self, key: str, future: "Future", prefetcher: "MatchPrefetcher"):
+        self.key = key
+        self._future = future
+        self._prefetcher = prefetcher
+        self.discard_reason: Optional[str] = None
+
+    def cancel(self) -> None:
+        """放弃预取（尚未开始时直接取消）"""
+        self._future.cancel()
+
+    def result(self) -> Optional[MatchResult]:
+        """
+        取用预取结果
+        未找到目标时画面任何变化都会使结果失效（目标可能刚出现）；
+        找到目标时只有目标区域发生变化才失效
+        """
+        try:
+            snapshot, match_result = self._future.result()
+        except Exception as e:
+            self.discard_reason = f"error: {e}"
+            return None
+        reason = self._prefetcher.validate(snapshot, match_result)
+        if reason is not None:
+            self.discard_reason = reason
+            return None
+        return match_result
+
+
+class MatchPrefetcher:
+    """
+    预取器
+    在后台执行器中截图并匹配，保存截图的灰度副本用于取用时的变化检测
+    """
+
+    def __init__(
+        self,
+        executor: Executor,
+        capture_fn: Callable[[str], List[Dict]],
+        release_fn: Callable[[List[Dict]], None],
+        tile_size: int = 64,
+        threshold: int = 0
+    ):
+        """
+        :param executor: 运行预取的执行器
+        :param capture_fn: 截图函数，参数为帧格式（bgr/gray）
+        :param release_fn: 截图归还函数
+        :param tile_size: 变化检测分块边长
+        :param threshold: 像素差阈值
+        """
+        self.executor = executor
+        self.capture_fn = capture_fn
+        self.release_fn = release_fn
+        self.tile_size = tile_size
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self.stats = {"started": 0, "hits": 0, "discarded": 0}
+
+    def start(self, key: str, match_fn: Callable[[List[Dict]], MatchResult], color: str = "bgr") -> SpeculativeMatch:
+        """
+        启动预取
+        :param key: 预取标识（如节点 ID）
+        :param match_fn: 在给定截图上执行匹配的函数
+        :param color: 截图帧格式
+        """
+        def run() -> Tuple[Dict[int, Dict], MatchResult]:
+            screenshots = self.capture_fn(color)
+            try:
+                snapshot = gray_snapshot(screenshots)
+                return snapshot, match_fn(screenshots)
+            finally:
+                self.release_fn(screenshots)
+
+        with self._lock:
+            self.stats["started"] += 1
+        return SpeculativeMatch(key, self.executor.submit(run), self)
+
+    def validate(self, snapshot: Dict[int, Dict], match_result: MatchResult) -> Optional[str]:
+        """
+        重新截图并与预取时的画面比较
+        :return: 失效原因，仍然有效时返回 None
+        """
+        found, location = match_result[0], match_result[1]
+        current = self.capture_fn("gray")
+        try:
+            reason = None
+            for screen in current:
+                previous = snapshot.get(screen["monitor_id"])
+                if previous is None or previous["image"].shape != screen["image"].shape:
+                    reason = "layout_changed"
+                    break
+                mask = changed_tiles(previous["image"], screen["image"], self.tile_size, self.threshold)
+                if not mask.any():
+                    continue
+                if not found:
+                    reason = "screen_changed"
+                    break
+                if location and location.get("monitor_id") == screen["monitor_id"] and rect_changed(
+                    mask,
+                    self.tile_size,
+                    location["top_left"][0] - screen["offset_x"],
+                    location["top_left"][1] - screen["offset_y"],
+                    location["width"],
+                    location["height"]
+                ):
+                    reason = "target_changed"
+                    break
+        finally:
+            self.release_fn(current)
+
+        with self._lock:
+            self.stats["discarded" if reason else "hits"] += 1
+        return reason
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+图像金字塔匹配模块 - 由粗到精的模板搜索
+先在降采样的屏幕和模板上定位候选区域，再仅在候选区域附近做全分辨率精匹配
+"""
+
+import cv2
+import numpy as np
+from typing import List, Optional, Tuple
+
+# 平方差类方法，值越小越好
+SQDIFF_METHODS = (cv2.TM_SQDIFF, cv2.TM_SQDIFF_NORMED)
+
+# 复核算法（对明亮区域不会给出虚高的相似度）
+VERIFY_METHOD = cv2.TM_CCOEFF_NORMED
+
+
+def build_pyramid(img: np.ndarray, levels: int, pyramid: Optional[List[np.ndarray]] = None) -> List[np.ndarray]:
+    """
+    构建图像金字塔
+    :param img: 原始图像
+    :param levels: 降采样层数（不含原图）
+    :param pyramid: 可选的已有金字塔（首层必须是 img），层数不足时原地补齐，便于多个模板共用
+    :return: [原图, 1/2, 1/4, ...]
+    """
+    if pyramid is None or not pyramid or pyramid[0] is not img:
+        pyramid = [img]
+    while len(pyramid) <= levels:
+        pyramid.append(cv2.pyrDown(pyramid[-1]))
+    return pyramid
+
+
+def choose_pyramid_levels(
+    template_shape: Tuple[int, ...],
+    max_level: int,
+    min_template_size: int
+) -> int:
+    """
+    根据模板尺寸确定可用的金字塔层数，保证最顶层模板不小于 min_template_size
+    """
+    template_height, template_width = template_shape[:2]
+    levels = 0
+    while levels < max_level:
+        scale = 2 ** (levels + 1)
+        if template_width // scale < min_template_size or template_height // scale < min_template_size:
+            break
+        levels += 1
+    return levels
+
+
+def score_map(result: np.ndarray, method: int) -> np.ndarray:
+    """将匹配结果统一转换为“越大越好”的相似度图"""
+    if method in SQDIFF_METHODS:
+        return 1.0 - result
+    return result
+
+
+def find_peaks(scores: np.ndarray, count: int, suppress_w: int, suppress_h: int) -> List[Tuple[float, Tuple[int, int]]]:
+    """
+    在相似度图中取前 count 个峰值，每取一个就抑制其邻域，避免候选集中在同一位置
+    :return: [(相似度, (x, y)), ...]
+    """
+    scores = scores.copy()
+    peaks = []
+    for _ in range(count):
+        _, max_val, _, max_loc = cv2.minMaxLoc(scores)
+        if not np.isfinite(max_val):
+            break
+        peaks.append((float(max_val), max_loc))
+        x, y = max_loc
+        scores[
+            max(0, y - suppress_h):y + suppress_h + 1,
+            max(0, x - suppress_w):x + suppress_w + 1
+        ] = -np.inf
+    return peaks
+
+
+def window_score(screen_img: np.ndarray, template: np.ndarray, top_left: Tuple[int, int], method: int) -> float:
+    """
+    计算模板与截图中指定位置窗口的相似度（1为最佳）
+    模板没有纹理时相关系数无定义（NaN），视为 1，由原算法的结果决定
+    """
+    template_height, template_width = template.shape[:2]
+    x, y = top_left
+    window = screen_img[y:y + template_height, x:x + template_width]
+    value = float(score_map(cv2.matchTemplate(window, template, method), method)[0, 0])
+    return value if np.isfinite(value) else 1.0
+
+
+def pyramid_match_template(
+    screen_img: np.ndarray,
+    template: np.ndarray,
+    method: int,
+    max_level: int = 2,
+    min_template_size: int = 8,
+    candidates: int = 3,
+    roi_margin: int = 4,
+    screen_pyramid: Optional[List[np.ndarray]] = None
+) -> Tuple[float, Optional[Tuple[int, int]], dict]:
+    """
+    金字塔模板匹配
+    :param screen_img: 屏幕截图（全分辨率）
+    :param template: 模板图片（全分辨率）
+    :param method: OpenCV 匹配方法
+    :param max_level: 最大降采样层数
+    :param min_template_size: 顶层模板的最小边长（像素）
+    :param candidates: 顶层保留的候选数量
+    :param roi_margin: 精匹配 ROI 在映射误差之外额外扩展的像素
+    :param screen_pyramid: 可选的屏幕金字塔缓存（列表，首层为 screen_img），会被原地补齐
+    :return: (相似度, 左上角坐标, 金字塔详情)
+    """
+    template_height, template_width = template.shape[:2]
+    screen_height, screen_width = screen_img.shape[:2]
+    levels = choose_pyramid_levels(template.shape, max_level, min_template_size)
+
+    # 模板太小无法降采样时直接做全分辨率匹配
+    if levels == 0:
+        confidence, loc = _full_match(screen_img, template, method)
+        return confidence, loc, {"levels": 0, "candidates": 1}
+
+    screen_top = build_pyramid(screen_img, levels, screen_pyramid)[levels]
+    template_top = build_pyramid(template, levels)[-1]
+    scale = 2 ** levels
+
+    # 粗匹配：在顶层得到候选位置
+    coarse_scores = score_map(cv2.matchTemplate(screen_top, template_top, method), method)
+    peaks = find_peaks(
+        coarse_scores,
+        candidates,
+        max(1, template_top.shape[1] // 2),
+        max(1, template_top.shape[0] // 2)
+    )
+
+    # 精匹配：在每个候选附近的小 ROI 内做全分辨率匹配
+    best_confidence = 0.0
+    best_loc = None
+    margin = scale + roi_margin
+    for _, (cx, cy) in peaks:
+        x0 = max(0, cx * scale - margin)
+        y0 = max(0, cy * scale - margin)
+        x1 = min(screen_width, cx * scale + template_width + margin)
+        y1 = min(screen_height, cy * scale + template_height + margin)
+        if x1 - x0 < template_width or y1 - y0 < template_height:
+            continue
+
+        roi = screen_img[y0:y1, x0:x1]
+        fine_scores = score_map(cv2.matchTemplate(roi, template, method), method)
+        _, max_val, _, max_loc = cv2.minMaxLoc(fine_scores)
+        if best_loc is None or max_val > best_confidence:
+            best_confidence = float(max_val)
+            best_loc = (x0 + max_loc[0], y0 + max_loc[1])
+
+    return best_confidence, best_loc, {"levels": levels, "candidates": len(peaks)}
+
+
+def _full_match(screen_img: np.ndarray, template: np.ndarray, method: int) -> Tuple[float, Tuple[int, int]]:
+    """全分辨率匹配，返回 (相似度, 左上角坐标)"""
+    scores = score_map(cv2.matchTemplate(screen_img, template, method), method)
+    _, max_val, _, max_loc = cv2.minMaxLoc(scores)
+    return float(max_val), max_loc
+
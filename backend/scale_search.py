@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+多尺度搜索模块 - 由粗到精的尺度搜索 + 黄金分割细化 + 最佳尺度记忆
+缩放后的模板按尺度缓存；每个模板在每种显示器 DPI 下的最佳尺度会被记住，
+下次优先尝试，混合 DPI 环境通常第一次尝试就能命中
+"""
+
+import math
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+# 黄金分割比
+GOLDEN_RATIO = (math.sqrt(5) - 1) / 2
+
+
+def screen_dpi_key(screen_data: Dict) -> str:
+    """
+    生成显示器 DPI 键
+    截图带有 dpi_scale 时直接使用，否则以分辨率近似区分不同显示器
+    """
+    if screen_data.get("dpi_scale"):
+        return f"dpi{screen_data['dpi_scale']}"
+    return f"{screen_data['width']}x{screen_data['height']}"
+
+
+class ScaleMemory:
+    """
+    最佳尺度记忆
+    按 (模板 ID, 显示器 DPI 键) 记录最近一次成功匹配的尺度
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._scales: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[str, str]) -> Optional[float]:
+        """获取记住的尺度"""
+        with self._lock:
+            scale = self._scales.get(key)
+            if scale is not None:
+                self._scales.move_to_end(key)
+            return scale
+
+    def remember(self, key: Tuple[str, str], scale: float) -> None:
+        """记录最佳尺度"""
+        with self._lock:
+            self._scales[key] = scale
+            self._scales.move_to_end(key)
+            while len(self._scales) > self.max_entries:
+                self._scales.popitem(last=False)
+
+
+class ScaleSearch:
+    """
+    尺度搜索引擎
+    1. 先尝试记住的尺度，达到目标直接返回
+    2. 在粗网格上评估，找到最佳粗尺度
+    3. 在最佳粗尺度两侧的区间内做黄金分割细化
+    """
+
+    def __init__(
+        self,
+        coarse_scales: Sequence[float] = (0.7, 0.85, 1.15, 1.3),
+        refine_iterations: int = 4,
+        scale_precision: float = 0.01,
+        min_size: int = 10
+    ):
+        """
+        :param coarse_scales: 粗搜索尺度网格（1.0 由调用方的常规匹配覆盖）
+        :param refine_iterations: 黄金分割细化迭代次数
+        :param scale_precision: 尺度量化精度，量化后的尺度可命中缩放模板缓存
+        :param min_size: 缩放后模板的最小边长
+        """
+        self.coarse_scales = sorted(coarse_scales)
+        self.refine_iterations = refine_iterations
+        self.scale_precision = scale_precision
+        self.min_size = min_size
+
+    def _quantize(self, scale: float) -> float:
+        """将尺度量化到固定精度"""
+        return round(round(scale / self.scale_precision) * self.scale_precision, 4)
+
+    def search(
+        self,
+        screenshot_gray: np.ndarray,
+        get_scaled: Callable[[float], np.ndarray],
+        template_shape: Tuple[int, int],
+        base_confidence: float,
+        target: float,
+        remembered: Optional[float] = None
+    ) -> Dict:
+        """
+        执行尺度搜索
+        :param screenshot_gray: 灰度截图
+        :param get_scaled: 按尺度返回缩放模板的函数（通常带缓存）
+        :param template_shape: 原始模板 (高, 宽)
+        :param base_confidence: 1.0 尺度下的匹配度
+        :param target: 置信度目标
+        :param remembered: 记住的最佳尺度
+        :return: {"scale", "confidence", "top_left", "template", "tried"}
+        """
+        screen_height, screen_width = screenshot_gray.shape[:2]
+        template_height, template_width = template_shape
+        evaluated: Dict[float, Tuple[float, Optional[Tuple[int, int]]]] = {1.0: (base_confidence, None)}
+        tried: List[Dict] = []
+        best = {"scale": 1.0, "confidence": base_confidence, "top_left": None, "template": None}
+
+        def evaluate(scale: float) -> float:
+            scale = self._quantize(scale)
+            if scale in evaluated:
+                return evaluated[scale][0]
+            width = int(template_width * scale)
+            height = int(template_height * scale)
+            if width < self.min_size or height < self.min_size or width > screen_width or height > screen_height:
+                evaluated[scale] = (-1.0, None)
+                return -1.0
+            try:
+                template_scaled = get_scaled(scale)
+                result = cv2.matchTemplate(screenshot_gray, template_scaled, cv2.TM_CCOEFF_NORMED)
+                _, max_val, _, max_loc = cv2.minMaxLoc(result)
+            except Exception as e:
+                tried.append({"scale": scale, "error": str(e)})
+                evaluated[scale] = (-1.0, None)
+                return -1.0
+            max_val = float(max_val)
+            evaluated[scale] = (max_val, max_loc)
+            tried.append({"scale": scale, "confidence": max_val})
+            if max_val > best["confidence"]:
+                best.update(scale=scale, confidence=max_val, top_left=max_loc, template=template_scaled)
+            return max_val
+
+        # 1. 记住的尺度
+        if remembered is not None and evaluate(remembered) >= target:
+            return {**best, "tried": tried}
+
+        # 2. 粗搜索
+        for scale in self.coarse_scales:
+            evaluate(scale)
+            if best["confidence"] >= target:
+                return {**best, "tried": tried}
+
+        # 3. 在最佳粗尺度的相邻网格点之间做黄金分割细化
+        grid = sorted(set(self.coarse_scales) | {1.0})
+        center = min(grid, key=lambda s: abs(s - best["scale"]))
+        index = grid.index(center)
+        low = grid[index - 1] if index > 0 else center - (grid[1] - grid[0])
+        high = grid[index + 1] if index + 1 < len(grid) else center + (grid[-1] - grid[-2])
+
+        x1 = high - GOLDEN_RATIO * (high - low)
+        x2 = low + GOLDEN_RATIO * (high - low)
+        f1, f2 = evaluate(x1), evaluate(x2)
+        for _ in range(self.refine_iterations):
+            if best["confidence"] >= target or high - low < self.scale_precision * 2:
+                break
+            if f1 >= f2:
+                high, x2, f2 = x2, x1, f1
+                x1 = high - GOLDEN_RATIO * (high - low)
+                f1 = evaluate(x1)
+            else:
+                low, x1, f1 = x1, x2, f2
+                x2 = low + GOLDEN_RATIO * (high - low)
+                f2 = evaluate(x2)
+
+        return {**best, "tried": tried}
+
+
+# 全局尺度记忆与默认搜索引擎
+scale_memory = ScaleMemory()
+default_scale_search = ScaleSearch()
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+屏幕截图服务模块 - 常驻截图器 + 显示器布局缓存 + 帧缓冲池
+避免每次截图都重新建立 mss 连接，并复用 numpy 帧缓冲区
+"""
+
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import mss
+import numpy as np
+
+
+class FramePool:
+    """
+    帧缓冲池
+    按 (高, 宽, 通道数) 缓存已释放的 numpy 数组，下次截图直接复用
+    """
+
+    def __init__(self, max_per_shape: int = 4):
+        self.max_per_shape = max_per_shape
+        self._free: Dict[Tuple[int, ...], List[np.ndarray]] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, shape: Tuple[int, ...]) -> np.ndarray:
+        """取出一个指定形状的缓冲区，池中没有时新建"""
+        with self._lock:
+            free = self._free.get(shape)
+            if free:
+                return free.pop()
+        return np.empty(shape, dtype=np.uint8)
+
+    def release(self, frame: np.ndarray) -> None:
+        """归还缓冲区，超过上限的直接丢弃"""
+        if frame is None:
+            return
+        with self._lock:
+            free = self._free.setdefault(frame.shape, [])
+            if len(free) < self.max_per_shape and not any(f is frame for f in free):
+                free.append(frame)
+
+    def clear(self) -> None:
+        """清空缓冲池"""
+        with self._lock:
+            self._free.clear()
+
+
+class ScreenCaptureService:
+    """
+    常驻截图服务
+    持有一个 mss 截图器，缓存显示器布局（定时重新读取，布局变化或截图失败时才重建截图器），
+    截图结果写入帧缓冲池中的数组，调用方用完后通过 release 归还
+    """
+
+    def __init__(self, layout_refresh_interval: float = 5.0, pool_size: int = 4):
+        """
+        :param layout_refresh_interval: 显示器布局刷新间隔（秒）
+        :param pool_size: 每种帧尺寸最多缓存的缓冲区数量
+        """
+        self.layout_refresh_interval = layout_refresh_interval
+        self.pool = FramePool(pool_size)
+        self._grabber = None
+        self._monitors: List[Dict] = []
+        self._layout_time = 0.0
+        self._lock = threading.RLock()
+
+    # ------------------------------
+    # 截图器与布局管理
+    # ------------------------------
+    def _ensure_grabber(self, force_refresh: bool = False) -> None:
+        """
+        确保截图器可用
+        布局过期时用临时实例重新读取显示器列表，布局确实变化才重建截图器；
+        强制刷新（截图失败）时直接重建
+        """
+        if self._grabber is None or force_refresh:
+            self._open_grabber()
+            return
+        if time.monotonic() - self._layout_time <= self.layout_refresh_interval:
+            return
+
+        monitors = self._read_monitors()
+        self._layout_time = time.monotonic()
+        if monitors != self._monitors:
+            self._open_grabber()
+
+    def _open_grabber(self) -> None:
+        """（重新）建立截图器并读取布局"""
+        self._close_grabber()
+        self._grabber = mss.mss()
+        monitors = [dict(m) for m in self._grabber.monitors]
+        if monitors != self._monitors:
+            # 布局发生变化，旧尺寸的缓冲区不再有用
+            self.pool.clear()
+        self._monitors = monitors
+        self._layout_time = time.monotonic()
+
+    def _read_monitors(self) -> List[Dict]:
+        """
+        读取当前显示器列表
+        mss 实例会缓存 monitors，因此用一个临时实例查询，长期持有的截图器保持不变
+        """
+        with mss.mss() as probe:
+            return [dict(m) for m in probe.monitors]
+
+    def _close_grabber(self) -> None:
+        """关闭截图器"""
+        if self._grabber is not None:
+            try:
+                self._grabber.close()
+            except Exception:
+                pass
+            self._grabber = None
+
+    def close(self) -> None:
+        """释放截图器和缓冲池"""
+        with self._lock:
+            self._close_grabber()
+            self._monitors = []
+            self._layout_time = 0.0
+            self.pool.clear()
+
+    def get_monitors(self) -> List[Dict]:
+        """
+        获取所有显示器信息（使用缓存的布局）
+        :return: 与 get_all_monitors 相同结构的显示器列表
+        """
+        with self._lock:
+            self._ensure_grabber()
+            layout = list(self._monitors[1:])  # 跳过第0个（全屏）
+
+        monitors = []
+        for i, monitor in enumerate(layout, 1):
+            monitors.append({
+                "id": i,
+                "left": monitor["left"],
+                "top": monitor["top"],
+                "width": monitor["width"],
+                "height": monitor["height"],
+                "name": f"显示器 {i}",
+                "bounds": (
+                    monitor["left"],
+                    monitor["top"],
+                    monitor["left"] + monitor["width"],
+                    monitor["top"] + monitor["height"]
+                )
+            })
+        return monitors
+
+    # ------------------------------
+    # 截图
+    # ------------------------------
+    def _select_targets(self, monitor_id: Optional[int]) -> List[Tuple[int, Dict]]:
+        """根据 monitor_id 选择要截取的显示器"""
+        if monitor_id is None:
+            # 截取所有显示器（跳过第0个合并区域）
+            return list(enumerate(self._monitors[1:], 1))
+        if monitor_id < 1 or monitor_id >= len(self._monitors):
+            monitor_id = 1  # 默认主显示器
+        return [(monitor_id, self._monitors[monitor_id])]
+
+    def _grab_into(self, monitor: Dict, color: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        截取单个显示器，BGRA 原始数据直接转换写入缓冲池中的帧
+        :param color: bgr 输出三通道帧，gray 直接输出单通道帧（不经过 BGR 中间帧）
+        :return: (帧, BGRA 原始数据视图)
+        """
+        shot = self._grabber.grab(monitor)
+        height, width = shot.height, shot.width
+        bgra = np.frombuffer(shot.raw, dtype=np.uint8).reshape(height, width, 4)
+        if color == "gray":
+            frame = self.pool.acquire((height, width))
+            cv2.cvtColor(bgra, cv2.COLOR_BGRA2GRAY, dst=frame)
+        else:
+            frame = self.pool.acquire((height, width, 3))
+            cv2.cvtColor(bgra, cv2.COLOR_BGRA2BGR, dst=frame)
+        return frame, bgra
+
+    def capture(self, monitor_id: Optional[int] = None, color: str = "bgr") -> List[Dict]:
+        """
+        截取屏幕
+        :param monitor_id: None表示所有显示器，数字表示指定显示器
+        :param color: 帧格式，bgr 为三通道，gray 为单通道
+        :return: 与 capture_screenshot 相同结构的截图列表（额外带有 raw_bgra 原始数据视图）；
+                 用完后请调用 release 归还帧
+        """
+        with self._lock:
+            self._ensure_grabber()
+            targets = self._select_targets(monitor_id)
+            try:
+                frames = [self._grab_into(monitor, color) for _, monitor in targets]
+            except Exception:
+                # 截图失败通常是显示器布局变化或连接失效，重建后重试一次
+                self._ensure_grabber(force_refresh=True)
+                targets = self._select_targets(monitor_id)
+                frames = [self._grab_into(monitor, color) for _, monitor in targets]
+
+        screenshots = []
+        for (index, monitor), (frame, bgra) in zip(targets, frames):
+            screenshots.append({
+                "monitor_id": index,
+                "image": frame,
+                "raw_bgra": bgra,
+                "offset_x": monitor["left"],
+                "offset_y": monitor["top"],
+                "width": monitor["width"],
+                "height": monitor["height"],
+                "monitor_info": monitor
+            })
+        return screenshots
+
+    def grab_region(self, region: Dict, color: str = "gray") -> np.ndarray:
+        """
+        只截取一个小的全局区域（用于点击校验等高频轮询，不截整个显示器）
+        :param region: 全局区域 {"x", "y", "width", "height"}，超出桌面的部分被裁掉
+        :param color: bgr 或 gray
+        :return: 新分配的帧（不来自缓冲池，无需归还）；区域完全在桌面之外时为空数组
+        """
+        with self._lock:
+            self._ensure_grabber()
+            desktop = self._monitors[0]
+            left = max(region["x"], desktop["left"])
+            top = max(region["y"], desktop["top"])
+            right = min(region["x"] + region["width"], desktop["left"] + desktop["width"])
+            bottom = min(region["y"] + region["height"], desktop["top"] + desktop["height"])
+            if right <= left or bottom <= top:
+                return np.zeros((0, 0) if color == "gray" else (0, 0, 3), np.uint8)
+            area = {"left": left, "top": top, "width": right - left, "height": bottom - top}
+            try:
+                shot = self._grabber.grab(area)
+            except Exception:
+                self._ensure_grabber(force_refresh=True)
+                shot = self._grabber.grab(area)
+            bgra = np.frombuffer(shot.raw, dtype=np.uint8).reshape(shot.height, shot.width, 4)
+            return cv2.cvtColor(bgra, cv2.COLOR_BGRA2GRAY if color == "gray" else cv2.COLOR_BGRA2BGR)
+
+    def release(self, screenshots: List[Dict]) -> None:
+        """归还截图帧到缓冲池"""
+        for screen in screenshots:
+            self.pool.release(screen.get("image"))
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+搜索区域模块 - 显式搜索区域(ROI)与“上次位置附近优先”提示
+把截图裁剪为指定的全局区域，并按模板记录最近的匹配位置，
+下次查找时先在上次位置附近的小区域内匹配，找不到再回退到全屏搜索
+"""
+
+import threading
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+# 截图字典中保存像素数据的字段（裁剪时需要同步切片）
+PIXEL_KEYS = ("image", "raw_bgra")
+
+
+def normalize_region(region: Optional[Dict]) -> Optional[Dict]:
+    """
+    校验并规范化搜索区域
+    :param region: {"x", "y", "width", "height"}（全局坐标），None 表示不限制
+    :return: 规范化后的区域；宽高非正时抛出 ValueError
+    """
+    if region is None:
+        return None
+    try:
+        normalized = {
+            "x": int(region["x"]),
+            "y": int(region["y"]),
+            "width": int(region["width"]),
+            "height": int(region["height"])
+        }
+    except (KeyError, TypeError, ValueError):
+        raise ValueError(f"无效的搜索区域: {region}")
+    if normalized["width"] <= 0 or normalized["height"] <= 0:
+        raise ValueError(f"搜索区域宽高必须为正数: {region}")
+    return normalized
+
+
+def crop_screenshots(screenshots: List[Dict], region: Dict) -> List[Dict]:
+    """
+    将截图列表裁剪到全局区域内（返回视图，不复制像素）
+    裁剪后的截图 offset_x/offset_y 指向裁剪区左上角的全局坐标，
+    roi_x/roi_y 记录裁剪区在显示器内的位置，用于还原显示器内相对坐标
+    :param screenshots: capture_screenshot 返回的截图列表
+    :param region: 规范化后的全局区域
+    :return: 与区域相交的显示器裁剪结果
+    """
+    region_left = region["x"]
+    region_top = region["y"]
+    region_right = region_left + region["width"]
+    region_bottom = region_top + region["height"]
+
+    cropped = []
+    for screen in screenshots:
+        left = max(region_left, screen["offset_x"])
+        top = max(region_top, screen["offset_y"])
+        right = min(region_right, screen["offset_x"] + screen["width"])
+        bottom = min(region_bottom, screen["offset_y"] + screen["height"])
+        if right <= left or bottom <= top:
+            continue
+
+        roi_x = left - screen["offset_x"]
+        roi_y = top - screen["offset_y"]
+        rows = slice(roi_y, roi_y + (bottom - top))
+        cols = slice(roi_x, roi_x + (right - left))
+        pixels = {key: screen[key][rows, cols] for key in PIXEL_KEYS if screen.get(key) is not None}
+        cropped.append({
+            **screen,
+            **pixels,
+            "offset_x": left,
+            "offset_y": top,
+            "width": right - left,
+            "height": bottom - top,
+            "roi_x": screen.get("roi_x", 0) + roi_x,
+            "roi_y": screen.get("roi_y", 0) + roi_y
+        })
+    return cropped
+
+
+class LocationHistory:
+    """
+    模板位置历史
+    按模板 ID 保存最近几次匹配到的全局矩形及当时的匹配度，用于生成“上次位置附近”的搜索区域
+    """
+
+    def __init__(self, max_templates: int = 256, depth: int = 3):
+        """
+        :param max_templates: 最多记录的模板数量（LRU 淘汰）
+        :param depth: 每个模板保留的历史位置数量
+        """
+        self.max_templates = max_templates
+        self.depth = depth
+        self._history: "OrderedDict[str, Deque[Tuple[Dict, float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, template_id: str, location: Dict, confidence: float = 1.0) -> None:
+        """
+        记录一次匹配位置
+        :param confidence: 该位置的匹配度（再次在附近命中时用于判断是否仍是同一个目标）
+        """
+        top_left = location["top_left"]
+        if isinstance(top_left, dict):
+            x, y = top_left["x"], top_left["y"]
+        else:
+            x, y = top_left
+        rect = {
+            "x": int(x),
+            "y": int(y),
+            "width": int(location["width"]),
+            "height": int(location["height"])
+        }
+        with self._lock:
+            entries = self._history.get(template_id)
+            if entries is None:
+                entries = deque(maxlen=self.depth)
+                self._history[template_id] = entries
+            self._history.move_to_end(template_id)
+            for entry in list(entries):
+                if entry[0] == rect:
+                    entries.remove(entry)
+            entries.appendleft((rect, float(confidence)))
+            while len(self._history) > self.max_templates:
+                self._history.popitem(last=False)
+
+    def hint_regions(self, template_id: str, margin: int) -> List[Tuple[Dict, float]]:
+        """
+        生成上次位置附近的搜索区域（最近一次在前）
+        :param template_id: 模板 ID
+        :param margin: 在历史矩形四周扩展的像素
+        :return: [(搜索区域, 记录时的匹配度), ...]
+        """
+        with self._lock:
+            entries = list(self._history.get(template_id, ()))
+        return [
+            (
+                {
+                    "x": rect["x"] - margin,
+                    "y": rect["y"] - margin,
+                    "width": rect["width"] + margin * 2,
+                    "height": rect["height"] + margin * 2
+                },
+                confidence
+            )
+            for rect, confidence in entries
+        ]
+
+    def forget(self, template_id: str) -> None:
+        """清除某个模板的位置历史"""
+        with self._lock:
+            self._history.pop(template_id, None)
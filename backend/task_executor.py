@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+任务执行器模块 - 将耗时操作移出 asyncio 事件循环
+图像匹配等 CPU 密集任务交给线程池（OpenCV 计算会释放 GIL），鼠标键盘操作交给单线程输入工作器串行执行。
+不使用进程池：匹配依赖进程内的状态（位置历史、级联与尺度记忆、延迟统计、调试图片写入器），
+预取等任务提交的也是不可序列化的闭包
+"""
+
+import asyncio
+import functools
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+
+def create_match_executor(max_workers: Optional[int] = None) -> Executor:
+    """
+    创建图像匹配执行器（线程池）
+    :param max_workers: 最大工作数，None 表示使用默认值
+    :return: 执行器实例
+    """
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="match")
+
+
+async def run_in_executor(executor: Executor, func: Callable, *args: Any, **kwargs: Any) -> Any:
+    """在指定执行器中运行同步函数并等待结果"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
+
+class InputWorker:
+    """
+    输入工作器
+    所有鼠标键盘操作在同一个专用线程中按提交顺序执行，避免并发请求互相抢占光标
+    """
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="input")
+
+    async def run(self, func: Callable, *args: Any, **kwargs: Any) -> Any:
+        """提交一个输入操作并等待其完成"""
+        return await run_in_executor(self._executor, func, *args, **kwargs)
+
+    async def run_committed(self, func: Callable, *args: Any, **kwargs: Any) -> Any:
+        """
+        提交一个输入操作并等待其完成；提交之后调用方收到的取消不再中断等待，
+        操作照常执行并返回真实结果（避免把已经发生的点击报告为“已取消”）
+        """
+        future = asyncio.ensure_future(self.run(func, *args, **kwargs))
+        while True:
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if future.cancelled():
+                    raise
+
+    def call(self, func: Callable, *args: Any, **kwargs: Any) -> Any:
+        """在同步代码（如工作流线程）中提交输入操作并阻塞等待完成；不能在输入线程内调用"""
+        return self._executor.submit(func, *args, **kwargs).result()
+
+    def shutdown(self, wait: bool = True) -> None:
+        """关闭输入工作器"""
+        self._executor.shutdown(wait=wait)
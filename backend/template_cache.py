@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+模板缓存模块 - 按内容哈希去重的模板注册表
+上传内容相同的模板只落盘一次（文件由按内容寻址的上传文件库管理）；解码结果及其预处理变体
+（增强、灰度、缩放等）保存在按字节大小淘汰的 LRU 内存缓存中，重复匹配同一目标时跳过解码和预处理
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from upload_store import UploadStore, hash_bytes
+
+
+class CachedTemplate:
+    """
+    已解码的模板及其预处理变体
+    变体按需构建一次后缓存，占用的字节数计入注册表的内存上限
+    """
+
+    def __init__(self, template_id: str, image: np.ndarray, path: Optional[str] = None):
+        self.template_id = template_id
+        self.image = image
+        self.path = path
+        self._variants: Dict[Hashable, Any] = {}
+        self._lock = threading.Lock()
+        self.on_resize: Optional[Callable[["CachedTemplate"], None]] = None
+
+    @property
+    def nbytes(self) -> int:
+        """原图与全部变体占用的字节数"""
+        total = self.image.nbytes
+        for value in self._variants.values():
+            # 数组及带 nbytes 属性的预处理结果（如特征描述子）都计入
+            total += getattr(value, "nbytes", 0)
+        return total
+
+    def variant(self, key: Hashable, build: Callable[[np.ndarray], Any]) -> Any:
+        """
+        获取预处理变体，不存在时用 build(原图) 构建并缓存
+        :param key: 变体键，如 "gray"、("scale", 0.8)
+        :param build: 变体构建函数
+        """
+        with self._lock:
+            if key in self._variants:
+                return self._variants[key]
+        value = build(self.image)
+        with self._lock:
+            value = self._variants.setdefault(key, value)
+        if self.on_resize is not None:
+            self.on_resize(self)
+        return value
+
+    @property
+    def gray(self) -> np.ndarray:
+        """灰度变体"""
+        return self.variant("gray", lambda img: cv2.cvtColor(img, cv2.COLOR_BGR2GRAY))
+
+    def scaled(self, scale: float, base: Hashable = "gray", build_base: Optional[Callable] = None) -> np.ndarray:
+        """
+        缩放变体
+        :param scale: 缩放比例
+        :param base: 作为缩放源的变体键
+        :param build_base: 源变体不存在时的构建函数，默认取灰度
+        """
+        source = self.variant(base, build_base) if build_base else self.gray
+
+        def build(_img):
+            width = int(source.shape[1] * scale)
+            height = int(source.shape[0] * scale)
+            return cv2.resize(source, (width, height))
+
+        return self.variant((base, "scale", round(scale, 4)), build)
+
+
+class TemplateRegistry:
+    """
+    模板注册表
+    - store: 按内容哈希保存上传的模板，相同内容只写一次文件
+    - load: 按路径或模板 ID 获取已解码模板，命中时不再读盘解码；
+      record_use 为 True 时记录到上传文件库的使用统计（每个请求只应记录一次）
+    """
+
+    def __init__(self, upload_dir: str = "backend/uploads", max_bytes: int = 256 * 1024 * 1024):
+        """
+        :param upload_dir: 模板文件保存目录
+        :param max_bytes: 内存缓存上限（字节）
+        """
+        self.uploads = UploadStore(upload_dir)
+        self.uploads.on_remove = self.forget
+        self.max_bytes = max_bytes
+        self._cache: "OrderedDict[str, CachedTemplate]" = OrderedDict()
+        self._paths: Dict[str, Tuple[str, float]] = {}  # 路径 -> (模板 ID, 文件修改时间)
+        self._id_paths: Dict[str, str] = {}  # 模板 ID -> 路径
+        self._size = 0
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def upload_dir(self) -> str:
+        return self.uploads.directory
+
+    def configure(
+        self,
+        upload_dir: Optional[str] = None,
+        max_bytes: Optional[int] = None,
+        disk_max_bytes: Optional[int] = None
+    ) -> None:
+        """
+        更新注册表配置
+        :param max_bytes: 内存缓存上限（字节）
+        :param disk_max_bytes: 上传目录的磁盘配额（字节）
+        """
+        self.uploads.configure(directory=upload_dir, max_bytes=disk_max_bytes)
+        with self._lock:
+            if max_bytes is not None:
+                self.max_bytes = max_bytes
+                self._evict()
+
+    # ------------------------------
+    # 缓存管理
+    # ------------------------------
+    def _recompute_size(self, cached: CachedTemplate) -> None:
+        """变体增加后重新统计占用并按需淘汰"""
+        with self._lock:
+            if cached.template_id in self._cache:
+                self._size = sum(t.nbytes for t in self._cache.values())
+                self._evict()
+
+    def _put(self, cached: CachedTemplate) -> CachedTemplate:
+        """放入缓存（调用方持有锁）"""
+        existing = self._cache.get(cached.template_id)
+        if existing is not None:
+            self._cache.move_to_end(cached.template_id)
+            return existing
+        cached.on_resize = self._recompute_size
+        self._cache[cached.template_id] = cached
+        self._size += cached.nbytes
+        self._evict()
+        return cached
+
+    def _evict(self) -> None:
+        """按 LRU 顺序淘汰，直到占用不超过上限（至少保留最近使用的一个）"""
+        while self._size > self.max_bytes and len(self._cache) > 1:
+            _, evicted = self._cache.popitem(last=False)
+            evicted.on_resize = None
+            self._size -= evicted.nbytes
+
+    def _get(self, template_id: str) -> Optional[CachedTemplate]:
+        """按 ID 取缓存并标记为最近使用（调用方持有锁）"""
+        cached = self._cache.get(template_id)
+        if cached is not None:
+            self._cache.move_to_end(template_id)
+            self.hits += 1
+        return cached
+
+    def forget(self, template_id: str) -> None:
+        """丢弃模板 ID 对应的缓存和路径映射（上传文件库淘汰该文件后调用）"""
+        with self._lock:
+            cached = self._cache.pop(template_id, None)
+            if cached is not None:
+                cached.on_resize = None
+                self._size -= cached.nbytes
+            self._id_paths.pop(template_id, None)
+            for path in [path for path, (known_id, _) in self._paths.items() if known_id == template_id]:
+                del self._paths[path]
+
+    def clear(self) -> None:
+        """清空内存缓存及路径映射（之后的查找重新从上传文件库解析）"""
+        with self._lock:
+            self._cache.clear()
+            self._paths.clear()
+            self._id_paths.clear()
+            self._size = 0
+
+    # ------------------------------
+    # 对外接口
+    # ------------------------------
+    def store(self, content: bytes, file_ext: str = "png") -> Tuple[str, str]:
+        """
+        保存上传的模板内容
+        :param content: 图片文件字节
+        :param file_ext: 文件扩展名
+        :return: (模板 ID, 文件路径)
+        """
+        template_id, file_path, _ = self.uploads.put(content, file_ext)
+
+        with self._lock:
+            self._paths[file_path] = (template_id, os.path.getmtime(file_path))
+            self._id_paths[template_id] = file_path
+            if template_id in self._cache:
+                self._cache.move_to_end(template_id)
+                return template_id, file_path
+
+        # 直接从内存解码，省去一次读盘
+        image = cv2.imdecode(np.frombuffer(content, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is not None:
+            with self._lock:
+                self._put(CachedTemplate(template_id, image, file_path))
+        return template_id, file_path
+
+    def load(self, path_or_id: str, record_use: bool = False) -> Optional[CachedTemplate]:
+        """
+        获取已解码的模板
+        :param path_or_id: 模板文件路径或模板 ID
+        :param record_use: 是否记录一次使用（上传文件库按最近使用时间淘汰，由请求入口记录，
+                           同一请求内部的重复查找不记录）
+        :return: CachedTemplate，无法读取时返回 None
+        """
+        cached = self._load(path_or_id)
+        if cached is not None and record_use:
+            self.uploads.touch(cached.template_id)
+        return cached
+
+    def _load(self, path_or_id: str) -> Optional[CachedTemplate]:
+        """load 的实现（不记录使用统计）"""
+        with self._lock:
+            if path_or_id in self._cache:
+                return self._get(path_or_id)
+            path = self._id_paths.get(path_or_id)
+        if path is None:
+            path = self.uploads.path(path_or_id) or path_or_id
+
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return None
+
+        with self._lock:
+            known = self._paths.get(path)
+            if known is not None and known[1] == mtime:
+                cached = self._get(known[0])
+                if cached is not None:
+                    return cached
+
+        self.misses += 1
+        with open(path, "rb") as f:
+            content = f.read()
+        image = cv2.imdecode(np.frombuffer(content, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            return None
+
+        template_id = hash_bytes(content)
+        with self._lock:
+            self._paths[path] = (template_id, mtime)
+            self._id_paths.setdefault(template_id, path)
+            return self._put(CachedTemplate(template_id, image, path))
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计信息"""
+        with self._lock:
+            return {
+                "templates": len(self._cache),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+# 全局模板注册表（main.py 与 image_matcher.py 共用）
+template_registry = TemplateRegistry()
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+上传文件存储模块 - 按内容寻址的模板文件库
+文件名由内容哈希决定，相同内容只写一次；目录下的 JSON 索引记录每个文件的大小、
+最近使用时间和使用次数，总大小超过配额时按最近使用时间淘汰。
+文件和索引都先写临时文件再原子替换，进程中途退出不会留下半个文件
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# 索引文件名
+INDEX_NAME = "index.json"
+
+# 纳入管理的旧文件前缀（早期按时间戳命名的上传文件）
+LEGACY_PREFIX = "target_"
+
+
+def hash_bytes(content: bytes) -> str:
+    """计算内容哈希（作为模板 ID）"""
+    return hashlib.sha256(content).hexdigest()
+
+
+def atomic_write(path: str, content: bytes) -> None:
+    """先写同目录下的临时文件再替换，读者只会看到完整的旧文件或新文件"""
+    temp_path = f"{path}.tmp{threading.get_ident()}"
+    with open(temp_path, "wb") as f:
+        f.write(content)
+    os.replace(temp_path, path)
+
+
+class UploadStore:
+    """
+    按内容哈希寻址的上传文件库
+    索引项: {"file", "size", "created", "last_used", "uploads", "hits"}
+    """
+
+    def __init__(self, directory: str = "backend/uploads", max_bytes: int = 512 * 1024 * 1024,
+                 save_interval: float = 5.0):
+        """
+        :param directory: 文件目录
+        :param max_bytes: 磁盘配额（字节），0 表示不限制
+        :param save_interval: 只有使用记录变化时，两次写索引的最短间隔（秒）
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.save_interval = save_interval
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._loaded = False
+        self._dirty = False
+        self._last_save = 0.0
+        self._lock = threading.RLock()
+        self.stats = {"stored": 0, "deduplicated": 0, "removed": 0, "removed_bytes": 0}
+        # 淘汰文件后的回调，参数为模板 ID（供内存缓存丢弃对应的模板和路径）
+        self.on_remove: Optional[Callable[[str], None]] = None
+
+    def configure(self, directory: Optional[str] = None, max_bytes: Optional[int] = None,
+                  save_interval: Optional[float] = None) -> None:
+        """更新配置（目录变化时重新加载索引）"""
+        with self._lock:
+            if directory is not None and directory != self.directory:
+                self.directory = directory
+                self._entries.clear()
+                self._loaded = False
+            if max_bytes is not None:
+                self.max_bytes = max_bytes
+            if save_interval is not None:
+                self.save_interval = save_interval
+
+    # ------------------------------
+    # 索引
+    # ------------------------------
+    @property
+    def index_path(self) -> str:
+        return os.path.join(self.directory, INDEX_NAME)
+
+    def _ensure_loaded(self) -> None:
+        """首次使用时读取索引（调用方持有锁）"""
+        if self._loaded:
+            return
+        self._loaded = True
+        os.makedirs(self.directory, exist_ok=True)
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                entries = json.load(f).get("entries", {})
+        except (OSError, ValueError):
+            entries = {}
+        # 丢弃文件已不存在的索引项
+        self._entries = {
+            template_id: entry for template_id, entry in entries.items()
+            if os.path.exists(os.path.join(self.directory, entry["file"]))
+        }
+
+    def adopt_untracked(self) -> int:
+        """
+        把索引之外的旧上传文件按内容改名纳入索引，内容重复的副本直接删除
+        （会改变旧文件的路径，应在服务启动时、开始匹配之前调用）
+        :return: 处理的文件数量
+        """
+        with self._lock:
+            self._ensure_loaded()
+            handled = self._adopt_untracked()
+            if handled:
+                self._save()
+            return handled
+
+    def _adopt_untracked(self) -> int:
+        """adopt_untracked 的实现（调用方持有锁）"""
+        handled = 0
+        indexed = {entry["file"] for entry in self._entries.values()}
+        for name in sorted(os.listdir(self.directory)):
+            path = os.path.join(self.directory, name)
+            if name in indexed or not name.startswith(LEGACY_PREFIX) or ".tmp" in name or not os.path.isfile(path):
+                continue
+            with open(path, "rb") as f:
+                content = f.read()
+            template_id = hash_bytes(content)
+            handled += 1
+            if template_id in self._entries:
+                os.remove(path)
+                self.stats["deduplicated"] += 1
+                continue
+            file_ext = os.path.splitext(name)[1].lstrip(".") or "png"
+            canonical = self._file_name(template_id, file_ext)
+            os.replace(path, os.path.join(self.directory, canonical))
+            mtime = os.path.getmtime(os.path.join(self.directory, canonical))
+            self._entries[template_id] = {
+                "file": canonical, "size": len(content), "created": mtime,
+                "last_used": mtime, "uploads": 1, "hits": 0
+            }
+            indexed.add(canonical)
+        return handled
+
+    def _save(self) -> None:
+        """原子地写入索引（调用方持有锁）"""
+        payload = json.dumps({"entries": self._entries}, ensure_ascii=False, indent=1)
+        atomic_write(self.index_path, payload.encode("utf-8"))
+        self._dirty = False
+        self._last_save = time.monotonic()
+
+    def _save_if_due(self) -> None:
+        """使用记录变化后按间隔写索引（调用方持有锁）"""
+        if self._dirty and time.monotonic() - self._last_save >= self.save_interval:
+            self._save()
+
+    def flush(self) -> None:
+        """立即写入未保存的索引变化"""
+        with self._lock:
+            if self._loaded and self._dirty:
+                self._save()
+
+    @staticmethod
+    def _file_name(template_id: str, file_ext: str) -> str:
+        return f"{LEGACY_PREFIX}{template_id[:16]}.{file_ext}"
+
+    # ------------------------------
+    # 对外接口
+    # ------------------------------
+    def put(self, content: bytes, file_ext: str = "png") -> Tuple[str, str, bool]:
+        """
+        保存文件内容
+        :param content: 文件字节
+        :param file_ext: 扩展名（只在首次保存时使用）
+        :return: (模板 ID, 文件路径, 是否新写入)
+        """
+        template_id = hash_bytes(content)
+        now = time.time()
+        with self._lock:
+            self._ensure_loaded()
+            entry = self._entries.get(template_id)
+            if entry is not None and os.path.exists(os.path.join(self.directory, entry["file"])):
+                entry["uploads"] += 1
+                entry["last_used"] = now
+                self.stats["deduplicated"] += 1
+                self._dirty = True
+                self._save_if_due()
+                return template_id, os.path.join(self.directory, entry["file"]), False
+
+            name = self._file_name(template_id, file_ext)
+            atomic_write(os.path.join(self.directory, name), content)
+            self._entries[template_id] = {
+                "file": name, "size": len(content), "created": now,
+                "last_used": now, "uploads": 1, "hits": 0
+            }
+            self.stats["stored"] += 1
+            self.collect_garbage(keep=template_id)
+            self._save()
+            return template_id, os.path.join(self.directory, name), True
+
+    def path(self, template_id: str) -> Optional[str]:
+        """模板 ID 对应的文件路径，不存在时返回 None"""
+        with self._lock:
+            self._ensure_loaded()
+            entry = self._entries.get(template_id)
+            return os.path.join(self.directory, entry["file"]) if entry else None
+
+    def touch(self, template_id: str) -> None:
+        """记录一次使用（更新最近使用时间和命中次数）"""
+        with self._lock:
+            entry = self._entries.get(template_id)
+            if entry is None:
+                return
+            entry["last_used"] = time.time()
+            entry["hits"] += 1
+            self._dirty = True
+            self._save_if_due()
+
+    def collect_garbage(self, keep: Optional[str] = None) -> int:
+        """
+        按最近使用时间淘汰，直到总大小不超过配额
+        :param keep: 不淘汰的模板 ID（如刚保存的文件）
+        :return: 删除的文件数量
+        """
+        with self._lock:
+            self._ensure_loaded()
+            if self.max_bytes <= 0:
+                return 0
+            total = sum(entry["size"] for entry in self._entries.values())
+            removed = 0
+            for template_id, entry in sorted(self._entries.items(), key=lambda item: item[1]["last_used"]):
+                if total <= self.max_bytes:
+                    break
+                if template_id == keep:
+                    continue
+                try:
+                    os.remove(os.path.join(self.directory, entry["file"]))
+                except FileNotFoundError:
+                    pass
+                except OSError:
+                    continue
+                del self._entries[template_id]
+                total -= entry["size"]
+                removed += 1
+                self.stats["removed"] += 1
+                self.stats["removed_bytes"] += entry["size"]
+                if self.on_remove is not None:
+                    self.on_remove(template_id)
+            if removed:
+                self._save()
+            return removed
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """索引内容（按最近使用时间倒序），hit_rate 为每次上传对应的使用次数"""
+        with self._lock:
+            self._ensure_loaded()
+            items = [
+                {"template_id": template_id, **entry, "hit_rate": entry["hits"] / max(1, entry["uploads"])}
+                for template_id, entry in self._entries.items()
+            ]
+        return sorted(items, key=lambda item: item["last_used"], reverse=True)
+
+    def usage(self) -> Dict[str, Any]:
+        """磁盘占用与累计统计"""
+        with self._lock:
+            self._ensure_loaded()
+            return {
+                "files": len(self._entries),
+                "bytes": sum(entry["size"] for entry in self._entries.values()),
+                "max_bytes": self.max_bytes,
+                **self.stats
+            }
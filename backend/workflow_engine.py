@@ -0,0 +1,624 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+工作流执行引擎 - 在服务端按节点图连续执行工作流（格式见 docs/WORKFLOW.md）
+启动前一次性加载并缓存所有引用的模板，之后各节点在同一个工作线程中紧接着执行，
+图像匹配复用常驻的截图服务和模板缓存，不再需要客户端逐步上传和往返请求；
+每个节点的耗时通过日志回调实时推送
+"""
+
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import Executor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# 匹配结果：(是否找到, 位置信息, 匹配度, 匹配详情)
+MatchResult = Tuple[bool, Optional[Dict], float, Dict]
+
+# 引用模板的配置字段
+IMAGE_KEYS = ("image_id",)
+
+# 变量引用 ${name}
+VARIABLE_PATTERN = re.compile(r"\$\{(\w+)\}")
+
+# 按键名称 -> pyautogui 按键名
+KEY_ALIASES = {
+    "cmd": "command",
+    "control": "ctrl",
+    "option": "alt",
+    "esc": "escape",
+    "return": "enter",
+}
+
+# 可以预取匹配结果的节点类型
+PREFETCH_NODE_TYPES = ("find_and_click", "wait_for_image")
+
+# 执行状态
+STATUS_PENDING = "pending"
+STATUS_RUNNING = "running"
+STATUS_PAUSED = "paused"
+STATUS_STOPPED = "stopped"
+STATUS_COMPLETED = "completed"
+STATUS_FAILED = "failed"
+
+
+class WorkflowError(Exception):
+    """工作流执行错误，code 对应 docs/API.md 中的错误代码"""
+
+    def __init__(self, message: str, code: str = "EXECUTION_FAILED", node_id: Optional[str] = None):
+        super().__init__(message)
+        self.code = code
+        self.node_id = node_id
+
+
+class WorkflowStopped(Exception):
+    """工作流被停止"""
+
+
+@dataclass
+class WorkflowServices:
+    """
+    工作流引擎依赖的外部服务（由 main.py 注入）
+    find_image(模板, 置信度, 区域) / wait_for_image(模板, 置信度, 超时, 间隔, 取消事件) 返回 MatchResult；
+    click(x, y, 按钮, 次数) 与 run_input(函数, *参数) 在输入工作器线程中同步执行；
+    input 为 pyautogui 模块；log(级别, 消息, 数据) 推送日志，可在任意线程调用；
+    prefetch(模板, 置信度, 区域) 在后台推测性地匹配下一步的目标，返回带 result() 的预取对象
+    （result() 在画面已变化时返回 None），为 None 时不预取
+    """
+    load_template: Callable[[str], Any]
+    find_image: Callable[[str, float, Optional[Dict]], MatchResult]
+    wait_for_image: Callable[[str, float, float, float, threading.Event], MatchResult]
+    click: Callable[[int, int, str, int], None]
+    run_input: Callable[..., Any]
+    input: Any
+    save_screenshot: Callable[[str, Optional[Dict]], str]
+    log: Callable[[str, str, Dict], None]
+    prefetch: Optional[Callable[[str, float, Optional[Dict]], Any]] = None
+
+
+def parse_workflow(workflow: Dict) -> Dict:
+    """
+    校验工作流结构
+    :param workflow: 工作流 JSON
+    :return: {"nodes": {id: 节点}, "order": [id], "next": {id: 下一个 id}, "start": 起始 id, "variables": {名: 值}}
+    """
+    nodes = workflow.get("nodes")
+    if not isinstance(nodes, list) or not nodes:
+        raise WorkflowError("工作流没有节点", "INVALID_PARAMETERS")
+
+    node_map: Dict[str, Dict] = {}
+    order: List[str] = []
+    for node in nodes:
+        node_id = node.get("id") if isinstance(node, dict) else None
+        if not node_id or node_id in node_map:
+            raise WorkflowError(f"节点 ID 缺失或重复: {node_id}", "INVALID_PARAMETERS")
+        if node.get("type") not in NODE_TYPES:
+            raise WorkflowError(f"不支持的节点类型: {node.get('type')}", "INVALID_PARAMETERS", node_id)
+        node_map[node_id] = node
+        order.append(node_id)
+
+    next_map: Dict[str, str] = {}
+    targets = set()
+    for connection in workflow.get("connections") or []:
+        source, target = connection.get("from"), connection.get("to")
+        if source not in node_map or target not in node_map:
+            raise WorkflowError(f"连接引用了不存在的节点: {source} -> {target}", "INVALID_PARAMETERS")
+        # 同一节点的多条无条件连接只取第一条；分支由 condition 节点自身的 true_path/false_path 决定
+        next_map.setdefault(source, target)
+        targets.add(target)
+
+    for node_id, node in node_map.items():
+        config = node.get("config") or {}
+        for key in ("true_path", "false_path", "body_start", "body_end"):
+            target = config.get(key)
+            if target is not None and target not in node_map:
+                raise WorkflowError(f"{key} 引用了不存在的节点: {target}", "INVALID_PARAMETERS", node_id)
+            if target is not None and key != "body_end":
+                targets.add(target)
+
+    # 起始节点：第一个没有入边的节点（都有入边时取第一个节点）
+    start = next((node_id for node_id in order if node_id not in targets), order[0])
+
+    variables = {}
+    for name, definition in (workflow.get("variables") or {}).items():
+        variables[name] = definition.get("value") if isinstance(definition, dict) else definition
+
+    return {"nodes": node_map, "order": order, "next": next_map, "start": start, "variables": variables}
+
+
+def resolve_variables(value: Any, variables: Dict[str, Any]) -> Any:
+    """
+    替换配置中的 ${name} 变量引用
+    整个字符串就是一个引用时保留变量原始类型，否则按字符串拼接
+    """
+    if isinstance(value, str):
+        whole = VARIABLE_PATTERN.fullmatch(value)
+        if whole and whole.group(1) in variables:
+            return variables[whole.group(1)]
+        return VARIABLE_PATTERN.sub(
+            lambda m: str(variables[m.group(1)]) if m.group(1) in variables else m.group(0), value
+        )
+    if isinstance(value, dict):
+        return {k: resolve_variables(v, variables) for k, v in value.items()}
+    if isinstance(value, list):
+        return [resolve_variables(v, variables) for v in value]
+    return value
+
+
+def normalize_key(key: str) -> str:
+    """按键名称转换为 pyautogui 使用的小写名称"""
+    key = str(key).strip().lower()
+    return KEY_ALIASES.get(key, key)
+
+
+class WorkflowExecution:
+    """
+    单次工作流执行
+    在执行器线程中顺序执行节点；暂停/停止在节点之间（以及等待类节点内部）生效
+    """
+
+    def __init__(self, workflow: Dict, services: WorkflowServices, options: Optional[Dict] = None):
+        """
+        :param workflow: 工作流 JSON
+        :param services: 外部服务
+        :param options: 执行选项（debug_mode 等）
+        """
+        self.execution_id = f"exec-{uuid.uuid4().hex[:12]}"
+        self.workflow_id = workflow.get("id")
+        self.graph = parse_workflow(workflow)
+        self.services = services
+        self.options = options or {}
+        self.variables = dict(self.graph["variables"])
+        self.status = STATUS_PENDING
+        self.current_node: Optional[str] = None
+        self.executed = 0
+        self.node_timings: List[Dict] = []
+        self.error: Optional[Dict] = None
+        self.started_at: Optional[str] = None
+        self.finished_at: Optional[str] = None
+        self.templates: Dict[str, Any] = {}
+        self._resume = threading.Event()
+        self._resume.set()
+        self._stop = threading.Event()
+        self._start_time = 0.0
+        self._prefetched: Optional[Tuple[str, Any]] = None
+
+    # ------------------------------
+    # 控制
+    # ------------------------------
+    def pause(self) -> None:
+        """暂停（当前节点执行完后生效）"""
+        if self.status == STATUS_RUNNING:
+            self._resume.clear()
+            self.status = STATUS_PAUSED
+
+    def resume(self) -> None:
+        """继续执行"""
+        if self.status == STATUS_PAUSED:
+            self.status = STATUS_RUNNING
+            self._resume.set()
+
+    def stop(self) -> None:
+        """停止执行（等待类节点会立即中断）"""
+        self._stop.set()
+        self._resume.set()
+
+    def _checkpoint(self) -> None:
+        """节点之间的暂停/停止检查点"""
+        self._resume.wait()
+        if self._stop.is_set():
+            raise WorkflowStopped()
+
+    def _sleep(self, seconds: float) -> None:
+        """可被停止打断的等待"""
+        if seconds > 0 and self._stop.wait(seconds):
+            raise WorkflowStopped()
+
+    # ------------------------------
+    # 执行
+    # ------------------------------
+    def prepare(self) -> None:
+        """一次性加载并缓存工作流引用的全部模板，缺失时在执行任何节点之前失败"""
+        for node_id in self.graph["order"]:
+            config = resolve_variables(self.graph["nodes"][node_id].get("config") or {}, self.variables)
+            for source in (config, config.get("condition") if isinstance(config.get("condition"), dict) else {}):
+                for key in IMAGE_KEYS:
+                    image_id = source.get(key)
+                    if not image_id or image_id in self.templates:
+                        continue
+                    cached = self.services.load_template(image_id)
+                    if cached is None:
+                        raise WorkflowError(f"模板不存在: {image_id}", "IMAGE_NOT_FOUND", node_id)
+                    self.templates[image_id] = cached
+
+    def run(self) -> Dict:
+        """
+        执行工作流（阻塞，在执行器线程中调用）
+        :return: 执行状态
+        """
+        self.status = STATUS_RUNNING
+        self.started_at = datetime.now().isoformat()
+        self._start_time = time.perf_counter()
+        try:
+            prepare_start = time.perf_counter()
+            self.prepare()
+            self._log("info", f"📦 已加载 {len(self.templates)} 个模板", {
+                "elapsed_ms": round((time.perf_counter() - prepare_start) * 1000, 3)
+            })
+            self._run_from(self.graph["start"])
+            self.status = STATUS_COMPLETED
+            self._log("success", f"✅ 工作流执行完成 ({self.duration:.2f}s)", {"status": self.status})
+        except WorkflowStopped:
+            self.status = STATUS_STOPPED
+            self._log("warning", "⏹️ 工作流已停止", {"status": self.status})
+        except WorkflowError as e:
+            self.status = STATUS_FAILED
+            self.error = {"message": str(e), "error_code": e.code, "node_id": e.node_id or self.current_node}
+            self._log("error", f"❌ 工作流执行失败: {e}", self.error)
+        except Exception as e:
+            self.status = STATUS_FAILED
+            self.error = {"message": str(e), "error_code": "EXECUTION_FAILED", "node_id": self.current_node}
+            self._log("error", f"❌ 工作流执行失败: {e}", self.error)
+        finally:
+            if self._prefetched is not None:
+                self._prefetched[1].cancel()
+                self._prefetched = None
+            self.finished_at = datetime.now().isoformat()
+        return self.state()
+
+    def _run_from(self, node_id: Optional[str], stop_at: Optional[str] = None) -> None:
+        """
+        从指定节点开始沿连接执行
+        :param stop_at: 执行完该节点后返回（循环体结束节点）
+        """
+        while node_id is not None:
+            self._checkpoint()
+            next_id = self._execute_node(node_id)
+            if node_id == stop_at:
+                return
+            node_id = next_id
+
+    def _execute_node(self, node_id: str) -> Optional[str]:
+        """执行单个节点并记录耗时，返回下一个节点 ID"""
+        node = self.graph["nodes"][node_id]
+        name = node.get("name") or node_id
+        self.current_node = node_id
+        config = resolve_variables(node.get("config") or {}, self.variables)
+
+        # 没有被当前节点用到的预取直接放弃
+        if self._prefetched is not None and self._prefetched[0] != node_id:
+            self._prefetched[1].cancel()
+            self._prefetched = None
+
+        start = time.perf_counter()
+        handler = NODE_TYPES[node["type"]]
+        try:
+            next_id = handler(self, node_id, config)
+        except (WorkflowError, WorkflowStopped):
+            raise
+        except Exception as e:
+            raise WorkflowError(f"{name}: {e}", "EXECUTION_FAILED", node_id)
+        elapsed_ms = round((time.perf_counter() - start) * 1000, 3)
+
+        self.executed += 1
+        timing = {"node_id": node_id, "type": node["type"], "elapsed_ms": elapsed_ms}
+        self.node_timings.append(timing)
+        self._log("info", f"⏱️ 节点完成: {name} ({elapsed_ms:.0f}ms)", {**timing, "progress": self.progress})
+        return next_id if next_id is not None else self.graph["next"].get(node_id)
+
+    def _log(self, level: str, message: str, data: Optional[Dict] = None) -> None:
+        """推送日志（附带执行 ID）"""
+        try:
+            self.services.log(level, message, {"execution_id": self.execution_id, **(data or {})})
+        except Exception:
+            # 日志推送失败不影响执行
+            pass
+
+    # ------------------------------
+    # 状态
+    # ------------------------------
+    @property
+    def duration(self) -> float:
+        """已执行时间（秒）"""
+        return time.perf_counter() - self._start_time if self._start_time else 0.0
+
+    @property
+    def progress(self) -> int:
+        """执行进度（已执行节点数占节点总数的百分比，循环可能超过节点总数）"""
+        total = len(self.graph["order"])
+        return min(100, round(self.executed * 100 / total)) if total else 100
+
+    def state(self) -> Dict:
+        """执行状态（对应 GET /api/execution/status）"""
+        return {
+            "execution_id": self.execution_id,
+            "workflow_id": self.workflow_id,
+            "status": self.status,
+            "progress": self.progress,
+            "current_node": self.current_node,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "duration": round(self.duration, 3),
+            "node_timings": list(self.node_timings),
+            "error": self.error
+        }
+
+    # ------------------------------
+    # 推测性预取
+    # ------------------------------
+    def _prefetch_next(self) -> None:
+        """当前节点即将执行输入动作时，在后台提前匹配下一个节点的目标"""
+        node_id = self.current_node
+        if self.services.prefetch is None or self._prefetched is not None or node_id is None:
+            return
+        next_id = self.graph["next"].get(node_id)
+        next_node = self.graph["nodes"].get(next_id) if next_id else None
+        if next_node is None or next_node["type"] not in PREFETCH_NODE_TYPES:
+            return
+        config = resolve_variables(next_node.get("config") or {}, self.variables)
+        if not config.get("image_id"):
+            return
+        try:
+            handle = self.services.prefetch(
+                config["image_id"], float(config.get("confidence", 0.8)), config.get("region")
+            )
+        except Exception:
+            return
+        self._prefetched = (next_id, handle)
+
+    def _take_prefetched(self, node_id: str) -> Optional[MatchResult]:
+        """取用为该节点预取的匹配结果，画面已变化（或没有预取）时返回 None"""
+        if self._prefetched is None or self._prefetched[0] != node_id:
+            return None
+        handle = self._prefetched[1]
+        self._prefetched = None
+        result = handle.result()
+        if result is None:
+            self._log("info", "⚡ 预取结果已失效，重新匹配", {
+                "node_id": node_id, "reason": getattr(handle, "discard_reason", None)
+            })
+        else:
+            self._log("info", "⚡ 使用预取的匹配结果", {"node_id": node_id, "found": result[0]})
+        return result
+
+    def _click(self, x: int, y: int, button: str, clicks: int) -> None:
+        """点击（动作执行期间预取下一步）"""
+        self._prefetch_next()
+        self.services.click(x, y, button, clicks)
+
+    def _run_input(self, func: Callable, *args: Any, **kwargs: Any) -> Any:
+        """执行输入动作（动作执行期间预取下一步）"""
+        self._prefetch_next()
+        return self.services.run_input(func, *args, **kwargs)
+
+    # ------------------------------
+    # 节点实现
+    # ------------------------------
+    def _find(self, node_id: str, config: Dict) -> MatchResult:
+        """查找图片：优先使用预取结果，否则直接匹配；未找到时在超时内按重试次数分段等待图片出现"""
+        image_id = config.get("image_id")
+        if not image_id:
+            raise WorkflowError("缺少 image_id", "INVALID_PARAMETERS", node_id)
+        confidence = float(config.get("confidence", 0.8))
+        region = config.get("region")
+        result = self._take_prefetched(node_id)
+        if result is None:
+            result = self.services.find_image(image_id, confidence, region)
+        timeout = float(config.get("timeout", 10))
+        attempts = max(1, int(config.get("retry", 3)))
+        for _ in range(attempts):
+            if result[0] or timeout <= 0:
+                break
+            self._checkpoint()
+            result = self.services.wait_for_image(
+                image_id, confidence, timeout / attempts, float(config.get("check_interval", 0.5)), self._stop
+            )
+            if self._stop.is_set():
+                raise WorkflowStopped()
+        return result
+
+    def _node_find_and_click(self, node_id: str, config: Dict) -> None:
+        found, location, confidence, _ = self._find(node_id, config)
+        if not found or not location:
+            raise WorkflowError(
+                f"图片未找到: {config.get('image_id')} (最高匹配度: {confidence:.2%})", "IMAGE_NOT_FOUND", node_id
+            )
+        offset = config.get("offset") or {}
+        x = location["x"] + int(offset.get("x", 0))
+        y = location["y"] + int(offset.get("y", 0))
+        click_type = config.get("click_type", "left")
+        button = "right" if click_type == "right" else "left"
+        clicks = 2 if click_type == "double" else 1
+        self._click(x, y, button, clicks)
+        self._log("info", f"🖱️ 点击 ({x}, {y})", {"node_id": node_id, "confidence": confidence})
+
+    def _node_click(self, node_id: str, config: Dict) -> None:
+        if "x" not in config or "y" not in config:
+            raise WorkflowError("缺少点击坐标", "INVALID_PARAMETERS", node_id)
+        click_type = config.get("click_type", "left")
+        button = config.get("button") or ("right" if click_type == "right" else "left")
+        clicks = int(config.get("clicks", 2 if click_type == "double" else 1))
+        self._click(int(config["x"]), int(config["y"]), button, clicks)
+
+    def _node_type_text(self, node_id: str, config: Dict) -> None:
+        text = config.get("text")
+        if text is None:
+            raise WorkflowError("缺少输入文字", "INVALID_PARAMETERS", node_id)
+        gui = self.services.input
+        self._run_input(gui.write, str(text), interval=float(config.get("interval", 0.05)))
+        if config.get("press_enter"):
+            self._run_input(gui.press, "enter")
+
+    def _node_keyboard(self, node_id: str, config: Dict) -> None:
+        keys = config.get("keys")
+        if isinstance(keys, str):
+            keys = [keys]
+        if not keys:
+            raise WorkflowError("缺少按键", "INVALID_PARAMETERS", node_id)
+        keys = [normalize_key(key) for key in keys]
+        gui = self.services.input
+        if config.get("press_type", "hotkey") == "sequence":
+            self._run_input(gui.press, keys)
+        else:
+            self._run_input(gui.hotkey, *keys)
+
+    def _node_wait(self, node_id: str, config: Dict) -> None:
+        if "duration" not in config:
+            raise WorkflowError("缺少等待时间", "INVALID_PARAMETERS", node_id)
+        self._sleep(float(config["duration"]))
+
+    def _node_wait_for_image(self, node_id: str, config: Dict) -> None:
+        prefetched = self._take_prefetched(node_id)
+        if prefetched is not None and prefetched[0]:
+            return
+        found, _, confidence, _ = self.services.wait_for_image(
+            config.get("image_id"),
+            float(config.get("confidence", 0.8)),
+            float(config.get("timeout", 30)),
+            float(config.get("check_interval", 0.5)),
+            self._stop
+        )
+        if self._stop.is_set():
+            raise WorkflowStopped()
+        if not found:
+            raise WorkflowError(
+                f"等待超时: {config.get('image_id')} (最高匹配度: {confidence:.2%})", "TIMEOUT", node_id
+            )
+
+    def _node_scroll(self, node_id: str, config: Dict) -> None:
+        self._run_input(
+            self.services.input.scroll, int(config.get("amount", 0)), x=config.get("x"), y=config.get("y")
+        )
+
+    def _node_drag(self, node_id: str, config: Dict) -> None:
+        try:
+            from_x, from_y = int(config["from_x"]), int(config["from_y"])
+            to_x, to_y = int(config["to_x"]), int(config["to_y"])
+        except KeyError as e:
+            raise WorkflowError(f"缺少拖拽坐标: {e}", "INVALID_PARAMETERS", node_id)
+        gui = self.services.input
+
+        def drag():
+            gui.moveTo(from_x, from_y)
+            gui.dragTo(to_x, to_y, duration=float(config.get("duration", 0.5)), button=config.get("button", "left"))
+
+        self._run_input(drag)
+
+    def _node_screenshot(self, node_id: str, config: Dict) -> None:
+        if not config.get("path"):
+            raise WorkflowError("缺少截图保存路径", "INVALID_PARAMETERS", node_id)
+        path = self.services.save_screenshot(config["path"], config.get("region"))
+        self._log("info", f"📸 截图已保存: {path}", {"node_id": node_id})
+
+    def _evaluate(self, node_id: str, condition: Dict) -> bool:
+        """计算条件"""
+        condition_type = condition.get("condition_type")
+        if condition_type == "image_exists":
+            found, _, _, _ = self.services.find_image(
+                condition.get("image_id"), float(condition.get("confidence", 0.8)), condition.get("region")
+            )
+            return found
+        if condition_type == "variable_equals":
+            return self.variables.get(condition.get("variable")) == condition.get("value")
+        raise WorkflowError(f"不支持的条件类型: {condition_type}", "INVALID_PARAMETERS", node_id)
+
+    def _node_condition(self, node_id: str, config: Dict) -> Optional[str]:
+        result = self._evaluate(node_id, config)
+        self._log("info", f"🔀 条件结果: {result}", {"node_id": node_id})
+        target = config.get("true_path") if result else config.get("false_path")
+        if target is None:
+            # 未指定分支时没有后续节点
+            return self.graph["next"].get(node_id) if result else None
+        return target
+
+    def _node_loop(self, node_id: str, config: Dict) -> None:
+        body_start = config.get("body_start")
+        body_end = config.get("body_end")
+        if not body_start:
+            raise WorkflowError("缺少循环体起始节点", "INVALID_PARAMETERS", node_id)
+        max_iterations = int(config.get("max_iterations", 100))
+        if config.get("loop_type", "count") == "count":
+            iterations = min(int(config.get("times", 1)), max_iterations)
+            for _ in range(iterations):
+                self._run_from(body_start, body_end)
+            return
+        condition = config.get("condition")
+        if not isinstance(condition, dict):
+            raise WorkflowError("while 循环缺少条件", "INVALID_PARAMETERS", node_id)
+        for _ in range(max_iterations):
+            if not self._evaluate(node_id, condition):
+                return
+            self._run_from(body_start, body_end)
+
+
+# 节点类型 -> 处理函数（返回下一个节点 ID，None 表示沿连接继续）
+NODE_TYPES: Dict[str, Callable[[WorkflowExecution, str, Dict], Optional[str]]] = {
+    "find_and_click": WorkflowExecution._node_find_and_click,
+    "click": WorkflowExecution._node_click,
+    "type_text": WorkflowExecution._node_type_text,
+    "keyboard": WorkflowExecution._node_keyboard,
+    "wait": WorkflowExecution._node_wait,
+    "wait_for_image": WorkflowExecution._node_wait_for_image,
+    "scroll": WorkflowExecution._node_scroll,
+    "drag": WorkflowExecution._node_drag,
+    "condition": WorkflowExecution._node_condition,
+    "loop": WorkflowExecution._node_loop,
+    "screenshot": WorkflowExecution._node_screenshot,
+}
+
+
+class WorkflowEngine:
+    """
+    工作流引擎
+    管理所有执行，执行本身在专用执行器中运行
+    """
+
+    def __init__(self, services: WorkflowServices, executor: Executor, max_history: int = 50):
+        """
+        :param services: 外部服务
+        :param executor: 运行工作流的执行器
+        :param max_history: 保留的已结束执行数量
+        """
+        self.services = services
+        self.executor = executor
+        self.max_history = max_history
+        self._executions: Dict[str, WorkflowExecution] = {}
+        self._lock = threading.Lock()
+
+    def start(self, workflow: Dict, options: Optional[Dict] = None) -> WorkflowExecution:
+        """
+        校验并启动工作流
+        :return: 执行对象（结构错误时抛出 WorkflowError）
+        """
+        execution = WorkflowExecution(workflow, self.services, options)
+        with self._lock:
+            self._executions[execution.execution_id] = execution
+            self._trim()
+        self.executor.submit(execution.run)
+        return execution
+
+    def get(self, execution_id: str) -> Optional[WorkflowExecution]:
+        """获取执行对象"""
+        with self._lock:
+            return self._executions.get(execution_id)
+
+    def stop_all(self) -> None:
+        """停止全部执行（服务关闭时调用）"""
+        with self._lock:
+            executions = list(self._executions.values())
+        for execution in executions:
+            execution.stop()
+
+    def _trim(self) -> None:
+        """淘汰最早结束的执行记录（调用方持有锁）"""
+        finished = [
+            execution_id for execution_id, execution in self._executions.items()
+            if execution.status in (STATUS_COMPLETED, STATUS_FAILED, STATUS_STOPPED)
+        ]
+        for execution_id in finished[:max(0, len(finished) - self.max_history)]:
+            del self._executions[execution_id]
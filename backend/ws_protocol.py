@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+WebSocket 命令协议模块 - 事件驱动的双向控制通道
+连接建立后持续读取客户端消息：命令（如 match、click）在独立任务中执行，
+完成后立即推送结果；同一连接上可以同时有多个命令，按 id 取消。
+取消只中断尚未产生副作用的阶段：已经提交的点击会执行完毕，客户端收到的是 result 而不是 cancelled。
+服务端定期发送心跳 ping，根据客户端的 pong 计算往返时间；客户端的 ping 立即回复 pong
+
+客户端 → 服务端:
+    {"type": "<命令>", "id": "...", ...参数}
+    {"type": "cancel", "id": "..."}
+    {"type": "subscribe", "levels": ["warning", "error"]}
+    {"type": "ping", "id": "...", "t": 客户端时间}  /  {"type": "pong", "id": "..."}
+服务端 → 客户端:
+    {"type": "result", "id", "command", "elapsed_ms", "result": {...}}
+    {"type": "error", "id", "error", "error_code"}
+    {"type": "cancelled", "id"}  /  {"type": "subscribed", "levels"}
+    {"type": "ping", "id", "server_time"}  /  {"type": "pong", "id", "t", "server_time"}
+"""
+
+import asyncio
+import itertools
+import json
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+# 命令处理函数：参数为客户端消息，返回结果字典
+CommandHandler = Callable[[Dict], Awaitable[Dict]]
+
+# 协议内置的消息类型（不能注册为命令）
+BUILTIN_TYPES = ("ping", "pong", "cancel", "subscribe")
+
+
+class WebSocketSession:
+    """
+    单个连接的命令会话
+    receive 返回客户端发来的文本（连接断开时抛出异常），由会话解析 JSON；send 立即发送一条消息
+    """
+
+    def __init__(
+        self,
+        receive: Callable[[], Awaitable[str]],
+        send: Callable[[Dict], Awaitable[None]],
+        handlers: Dict[str, CommandHandler],
+        on_subscribe: Optional[Callable[[Any], Any]] = None,
+        close: Optional[Callable[[], Awaitable[None]]] = None,
+        heartbeat_interval: float = 15.0,
+        heartbeat_timeout: float = 0.0,
+        max_pending: int = 16
+    ):
+        """
+        :param receive: 读取一条客户端文本消息
+        :param send: 发送一条消息
+        :param handlers: 命令名 -> 处理函数
+        :param on_subscribe: 处理 subscribe 消息，参数为 levels，返回实际订阅的级别
+        :param close: 主动关闭连接（心跳超时时调用，之后 receive 应抛出异常）
+        :param heartbeat_interval: 服务端心跳间隔（秒），0 表示不发送
+        :param heartbeat_timeout: 超过该时间没有收到任何消息则断开（秒），0 表示不检查
+        :param max_pending: 同一连接上同时执行的命令数量上限
+        """
+        reserved = set(handlers) & set(BUILTIN_TYPES)
+        if reserved:
+            raise ValueError(f"命令名与内置消息类型冲突: {', '.join(sorted(reserved))}")
+        self.receive = receive
+        self.send = send
+        self.handlers = handlers
+        self.on_subscribe = on_subscribe
+        self.close = close
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.max_pending = max_pending
+        self.pending: Dict[str, asyncio.Task] = {}
+        self.last_received = time.monotonic()
+        self.rtt_ms: Optional[float] = None
+        self._pings: Dict[str, float] = {}
+        self._ids = itertools.count(1)
+        self.closed = asyncio.Event()
+
+    async def run(self) -> None:
+        """读取并分发消息，直到连接断开或心跳超时"""
+        heartbeat = asyncio.get_running_loop().create_task(self._heartbeat())
+        try:
+            while True:
+                text = await self.receive()
+                self.last_received = time.monotonic()
+                try:
+                    message = json.loads(text)
+                except ValueError:
+                    # 格式错误的消息只回复错误，连接保持
+                    await self._error(None, "消息不是有效的 JSON", "INVALID_PARAMETERS")
+                    continue
+                await self._dispatch(message)
+        finally:
+            self.closed.set()
+            heartbeat.cancel()
+            for task in list(self.pending.values()):
+                task.cancel()
+
+    async def _dispatch(self, message: Any) -> None:
+        """处理一条客户端消息"""
+        if not isinstance(message, dict) or not isinstance(message.get("type"), str):
+            await self._error(None, "消息格式无效", "INVALID_PARAMETERS")
+            return
+        kind = message["type"]
+        request_id = message.get("id")
+
+        if kind == "ping":
+            await self.send({"type": "pong", "id": request_id, "t": message.get("t"), "server_time": time.time()})
+        elif kind == "pong":
+            sent_at = self._pings.pop(str(request_id), None)
+            if sent_at is not None:
+                self.rtt_ms = round((time.monotonic() - sent_at) * 1000, 2)
+        elif kind == "cancel":
+            task = self.pending.get(str(request_id))
+            if task is None:
+                await self._error(request_id, "命令不存在或已完成", "NOT_FOUND")
+            else:
+                task.cancel()
+        elif kind == "subscribe":
+            if self.on_subscribe is None:
+                await self._error(request_id, "不支持订阅", "INVALID_PARAMETERS")
+                return
+            try:
+                levels = self.on_subscribe(message.get("levels"))
+            except ValueError as e:
+                await self._error(request_id, str(e), "INVALID_PARAMETERS")
+                return
+            await self.send({"type": "subscribed", "id": request_id, "levels": levels})
+        elif kind in self.handlers:
+            await self._start_command(kind, request_id, message)
+        else:
+            await self._error(request_id, f"不支持的命令: {kind}", "INVALID_PARAMETERS")
+
+    async def _start_command(self, kind: str, request_id: Any, message: Dict) -> None:
+        """在独立任务中执行命令，读取循环不等待其完成"""
+        key = str(request_id) if request_id is not None else f"auto-{next(self._ids)}"
+        if key in self.pending:
+            await self._error(request_id, f"命令 id 重复: {key}", "INVALID_PARAMETERS")
+            return
+        if len(self.pending) >= self.max_pending:
+            await self._error(request_id, "进行中的命令过多", "BUSY")
+            return
+        self.pending[key] = asyncio.get_running_loop().create_task(self._run_command(key, kind, request_id, message))
+
+    async def _run_command(self, key: str, kind: str, request_id: Any, message: Dict) -> None:
+        """执行命令并推送结果"""
+        start = time.perf_counter()
+        try:
+            result = await self.handlers[kind](message)
+            await self.send({
+                "type": "result",
+                "id": request_id if request_id is not None else key,
+                "command": kind,
+                "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+                "result": result
+            })
+        except asyncio.CancelledError:
+            if not self.closed.is_set():
+                await self._send_quietly({"type": "cancelled", "id": request_id, "command": kind})
+        except Exception as e:
+            await self._error(request_id, str(e), "EXECUTION_ERROR")
+        finally:
+            self.pending.pop(key, None)
+
+    async def _heartbeat(self) -> None:
+        """定期发送心跳，并检查客户端是否长时间没有消息"""
+        if self.heartbeat_interval <= 0:
+            return
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            if self.heartbeat_timeout > 0 and time.monotonic() - self.last_received > self.heartbeat_timeout:
+                await self._send_quietly({"type": "error", "error": "心跳超时", "error_code": "HEARTBEAT_TIMEOUT"})
+                if self.close is not None:
+                    try:
+                        await self.close()
+                    except Exception:
+                        pass
+                return
+            ping_id = f"hb-{next(self._ids)}"
+            # 只保留最近几次未回复的心跳
+            if len(self._pings) >= 8:
+                self._pings.pop(next(iter(self._pings)))
+            self._pings[ping_id] = time.monotonic()
+            await self._send_quietly({"type": "ping", "id": ping_id, "server_time": time.time(), "rtt_ms": self.rtt_ms})
+
+    async def _error(self, request_id: Any, error: str, code: str) -> None:
+        await self._send_quietly({"type": "error", "id": request_id, "error": error, "error_code": code})
+
+    async def _send_quietly(self, message: Dict) -> None:
+        """发送消息，连接已断开时忽略"""
+        try:
+            await self.send(message)
+        except Exception:
+            pass